@@ -1,28 +1,207 @@
-# This is a sample Python script.
+from __future__ import annotations
+
+import argparse
+import csv
+import re
+import sys
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Container, Iterable, Iterator, List
+from urllib.parse import urljoin
 
-# Press Shift+F10 to execute it or replace it with your code.
-# Press Double Shift to search everywhere for classes, files, tool windows, actions, and settings.
 import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
+from requests.adapters import HTTPAdapter
 
+from http_cache import DEFAULT_CACHE_DIR, HttpCache
 
-def fetch_alltagsdeutch_links(alltagsdeutsch_url):
-    response = requests.get(alltagsdeutsch_url)
-    soup = BeautifulSoup(response.content, "html.parser")
+ARCHIVE_URL = "https://learngerman.dw.com/de/alltagsdeutsch-archiv-2025/a-71187473"
+USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+    "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36"
+)
+# 他の年のアーカイブへのリンク（例: /de/alltagsdeutsch-archiv-2024/a-68000000）
+YEAR_LINK_PATTERN = re.compile(r'href="([^"]*alltagsdeutsch-archiv-(\d{4})/a-\d+)"')
+
+# エピソード一覧の部分だけをパースする（ページの残りは木にしない）
+ENTRY_SECTION = SoupStrainer("div", attrs={"class": "s1kcezzg"})
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = "lxml"
+except ImportError:
+    HTML_PARSER = "html.parser"
+
+OUTPUT_FORMATS = ("tsv", "csv")
+
+
+@dataclass
+class ArchiveEntry:
+    year: int | None
+    title: str
+    url: str
+
+    def hyperlink(self) -> str:
+        """Google Sheets formula; double quotes in the title are escaped."""
+        return '=HYPERLINK("{0}", "{1}")'.format(self.url, self.title.replace('"', '""'))
+
+
+@dataclass
+class ArchivePage:
+    year: int | None
+    url: str
+    not_modified: bool
+    entries: List[ArchiveEntry] = field(default_factory=list)
+    year_links: dict = field(default_factory=dict)
+
+
+def get_session(pool_size: int = 8) -> requests.Session:
+    session = requests.Session()
+    session.headers.update({"User-Agent": USER_AGENT, "Accept-Language": "de-DE,de;q=0.9"})
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def year_of(url: str) -> int | None:
+    m = re.search(r"alltagsdeutsch-archiv-(\d{4})", url)
+    return int(m.group(1)) if m else None
+
+
+def find_year_links(content: bytes, page_url: str) -> dict:
+    """{year: absolute archive URL} for every archive year linked from the page."""
+    links = {}
+    for href, year in YEAR_LINK_PATTERN.findall(content.decode("utf-8", errors="replace")):
+        links.setdefault(int(year), urljoin(page_url, href))
+    return links
+
+
+def parse_archive_entries(content: bytes, page_url: str, year: int | None = None) -> List[ArchiveEntry]:
+    soup = BeautifulSoup(content, HTML_PARSER, parse_only=ENTRY_SECTION)
     www_links_section = soup.find("div", attrs={"class": "s1kcezzg"})
-    www_links = www_links_section.find("div")
-    entries = www_links.find_all("a", attrs={"class": "s13pardp"}, href=True)
-    print("")
-    for entry in entries:
-        alltagsdeutsch_url = entry['href']
+    if www_links_section is None:
+        return []
+    www_links = www_links_section.find("div") or www_links_section
+    entries = []
+    for entry in www_links.find_all("a", attrs={"class": "s13pardp"}, href=True):
         title_tag = entry.find("h3", attrs={"class": "p13ybupf"})
-        title = title_tag.get_text().strip()
+        if title_tag is None:
+            continue
+        entries.append(ArchiveEntry(year, title_tag.get_text().strip(), urljoin(page_url, entry["href"])))
+    return entries
+
+
+def fetch_archive_page(session: requests.Session, url: str, cache: HttpCache | None = None,
+                       skip_unchanged: Container = ()) -> ArchivePage:
+    """Fetch and parse one archive page; a 304 for a URL in skip_unchanged is not parsed at all."""
+    if cache is not None:
+        response = cache.get(session, url)
+        content, not_modified = response.content, response.not_modified
+    else:
+        r = session.get(url, timeout=15)
+        r.raise_for_status()
+        content, not_modified = r.content, False
+    year = year_of(url)
+    if not_modified and url in skip_unchanged:
+        # 既に索引済みで変更もないページ: 年リンクだけ拾ってエントリは解析しない
+        return ArchivePage(year, url, True, [], find_year_links(content, url))
+    return ArchivePage(year, url, not_modified, parse_archive_entries(content, url, year), find_year_links(content, url))
+
+
+def crawl_archive(seed_url: str = ARCHIVE_URL, workers: int = 8, cache: HttpCache | None = None,
+                  follow_years: bool = True, session: requests.Session | None = None,
+                  skip_unchanged: Container = ()) -> Iterator[ArchivePage]:
+    """
+    Fetch the seed archive page and (follow_years) every other year it links to, concurrently.
+
+    Pages are yielded as soon as they are parsed, so output can be streamed; newly
+    discovered years are queued immediately instead of waiting for the current batch.
+    Pages in skip_unchanged that answer 304 come back without entries.
+    """
+    session = session or get_session(workers)
+    seen_years = {year_of(seed_url)}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = {pool.submit(fetch_archive_page, session, seed_url, cache, skip_unchanged): seed_url}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                url = pending.pop(future)
+                try:
+                    page = future.result()
+                except requests.RequestException as e:
+                    print(f"⚠️ 取得失敗: {url} ({e})", file=sys.stderr)
+                    continue
+                if follow_years:
+                    for year, link in page.year_links.items():
+                        if year not in seen_years:
+                            seen_years.add(year)
+                            pending[pool.submit(fetch_archive_page, session, link, cache, skip_unchanged)] = link
+                yield page
 
-        formatted_cell = '=HYPERLINK("{0}", "{1}")'
-        print(formatted_cell.format(alltagsdeutsch_url, title))
+
+def write_entries(pages: Iterable[ArchivePage], out, fmt: str = "tsv") -> int:
+    """Stream year / title / url / HYPERLINK rows as pages arrive; duplicates across years are dropped."""
+    if fmt not in OUTPUT_FORMATS:
+        raise ValueError(f"unknown format: {fmt} (choose from {', '.join(OUTPUT_FORMATS)})")
+    if fmt == "tsv":
+        # そのまま Google Sheets に貼り付けられるよう、数式を引用符で囲まない
+        writer = csv.writer(out, delimiter="\t", quoting=csv.QUOTE_NONE, quotechar=None, lineterminator="\n")
+    else:
+        writer = csv.writer(out, lineterminator="\n")
+    writer.writerow(["year", "title", "url", "link"])
+    seen = set()
+    for page in pages:
+        status = "304 キャッシュ" if page.not_modified else "取得"
+        print(f"📄 {page.year or '-'}: {len(page.entries)} 件 ({status})", file=sys.stderr)
+        for entry in page.entries:
+            if entry.url in seen:
+                continue
+            seen.add(entry.url)
+            row = [entry.year or "", entry.title, entry.url, entry.hyperlink()]
+            if fmt == "tsv":
+                row = [" ".join(str(v).split()) for v in row]
+            writer.writerow(row)
+        out.flush()
+    return len(seen)
+
+
+def fetch_alltagsdeutch_links(alltagsdeutsch_url):
+    page = fetch_archive_page(get_session(1), alltagsdeutsch_url)
+    print("")
+    for entry in page.entries:
+        print(entry.hyperlink())
 
 
-# Press the green button in the gutter to run the script.
 if __name__ == '__main__':
-    url = "https://learngerman.dw.com/de/alltagsdeutsch-archiv-2025/a-71187473"
-    fetch_alltagsdeutch_links(url)
+    from episode_index import DEFAULT_INDEX_PATH, EpisodeIndex
+
+    parser = argparse.ArgumentParser(description="Alltagsdeutsch のアーカイブから URL とタイトルを取得")
+    parser.add_argument("url", nargs="?", default=ARCHIVE_URL, help="起点にするアーカイブページ")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, default="tsv", help="出力形式")
+    parser.add_argument("--output", "-o", help="出力ファイル（省略時は標準出力）")
+    parser.add_argument("--workers", type=int, default=8, help="同時に取得するページ数")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help="HTTP キャッシュの保存先")
+    parser.add_argument("--no-cache", action="store_true", help="HTTP キャッシュを使わない")
+    parser.add_argument("--single", action="store_true", help="指定したページだけ取得（他の年をたどらない）")
+    parser.add_argument("--index", default=DEFAULT_INDEX_PATH, help="エピソード索引（SQLite）")
+    parser.add_argument("--no-index", action="store_true", help="索引を使わず、見つかった全件を出力")
+    parser.add_argument("--all", action="store_true", help="索引は更新するが、既知のエピソードも含めて全件出力")
+    parser.add_argument("--queue", metavar="MANIFEST", help="新しいエピソードをバッチ用 manifest に追加")
+    args = parser.parse_args()
+
+    cache = None if args.no_cache else HttpCache(args.cache_dir)
+    index = None if args.no_index else EpisodeIndex(args.index)
+    skip = index.known_pages() if index and not args.all else ()
+    pages = crawl_archive(args.url, args.workers, cache, follow_years=not args.single, skip_unchanged=skip)
+    if index:
+        pages = index.record_pages(pages, new_only=not args.all)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8", newline="") as f:
+            total = write_entries(pages, f, args.format)
+    else:
+        total = write_entries(pages, sys.stdout, args.format)
+    print(f"✅ {total} 件", file=sys.stderr)
+    if index:
+        if args.queue:
+            print(f"📥 {index.queue_to_manifest(args.queue, index.added)} 件を {args.queue} に追加", file=sys.stderr)
+        index.close()
@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+import argparse
+import configparser
+import os
+import re
+import sqlite3
+import sys
+from dataclasses import replace
+from datetime import datetime, timezone
+from typing import Iterable, Iterator, List
+
+from alltags_deutsch import ArchiveEntry, ArchivePage
+
+DEFAULT_INDEX_PATH = "episode_index.sqlite3"
+STATES = ("new", "queued", "done", "skipped")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS episodes (
+    url        TEXT PRIMARY KEY,
+    title      TEXT NOT NULL,
+    year       INTEGER,
+    first_seen TEXT NOT NULL,
+    state      TEXT NOT NULL DEFAULT 'new'
+);
+CREATE INDEX IF NOT EXISTS episodes_state_year ON episodes (state, year);
+CREATE TABLE IF NOT EXISTS pages (
+    url          TEXT PRIMARY KEY,
+    year         INTEGER,
+    entry_count  INTEGER NOT NULL,
+    last_crawled TEXT NOT NULL
+);
+"""
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+def slug_of(url: str) -> str:
+    """Manifest title from the URL: .../de/handy-aus-offline-sein/a-123 -> handy-aus-offline-sein"""
+    parts = [p for p in url.split("?")[0].rstrip("/").split("/") if p]
+    if len(parts) >= 2 and re.fullmatch(r"[a-z]+-\d+", parts[-1]):
+        return parts[-2]
+    return parts[-1] if parts else url
+
+
+class EpisodeIndex:
+    """
+    SQLite index of every episode seen in the archive, with its processing state.
+
+    New episodes start as "new", become "queued" once written to a batch manifest
+    and can be marked "done" / "skipped" afterwards. Archive pages whose entries
+    are already indexed are recorded too, so a 304 on re-crawl needs no parsing.
+    """
+
+    def __init__(self, path: str = DEFAULT_INDEX_PATH):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        self.added: List[ArchiveEntry] = []   # このインスタンスで新しく索引に入ったエピソード
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self) -> "EpisodeIndex":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def known_pages(self) -> set:
+        return {row[0] for row in self.conn.execute("SELECT url FROM pages")}
+
+    def add_page(self, page: ArchivePage) -> List[ArchiveEntry]:
+        """Insert the page's entries in one transaction and return only the ones not seen before."""
+        now = _now()
+        new = []
+        with self.conn:
+            for entry in page.entries:
+                cur = self.conn.execute(
+                    "INSERT OR IGNORE INTO episodes (url, title, year, first_seen) VALUES (?, ?, ?, ?)",
+                    (entry.url, entry.title, entry.year, now),
+                )
+                if cur.rowcount:
+                    new.append(entry)
+            if not page.not_modified or page.entries:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO pages (url, year, entry_count, last_crawled) VALUES (?, ?, ?, ?)",
+                    (page.url, page.year, len(page.entries), now),
+                )
+        self.added.extend(new)
+        return new
+
+    def record_pages(self, pages: Iterable[ArchivePage], new_only: bool = True) -> Iterator[ArchivePage]:
+        """Index pages as they stream past; with new_only each page keeps only its new entries."""
+        for page in pages:
+            new = self.add_page(page)
+            yield replace(page, entries=new) if new_only else page
+
+    def episodes(self, state: str | None = None, limit: int | None = None) -> List[ArchiveEntry]:
+        sql = "SELECT year, title, url FROM episodes"
+        params: list = []
+        if state:
+            sql += " WHERE state = ?"
+            params.append(state)
+        sql += " ORDER BY year DESC, first_seen, url"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return [ArchiveEntry(*row) for row in self.conn.execute(sql, params)]
+
+    def set_state(self, urls: Iterable[str], state: str) -> int:
+        if state not in STATES:
+            raise ValueError(f"unknown state: {state} (choose from {', '.join(STATES)})")
+        with self.conn:
+            cur = self.conn.executemany("UPDATE episodes SET state = ? WHERE url = ?", [(state, u) for u in urls])
+        return cur.rowcount
+
+    def counts(self) -> dict:
+        return dict(self.conn.execute("SELECT state, COUNT(*) FROM episodes GROUP BY state"))
+
+    def queue_to_manifest(self, manifest_path: str, entries: List[ArchiveEntry] | None = None,
+                          limit: int | None = None) -> int:
+        """
+        Append episodes (default: every "new" one) to a batch manifest
+        (see dictation_resolver/batch_pipeline.py) and mark them "queued".
+        Sections already in the manifest are left untouched. An episode whose slug is already
+        taken by another URL is skipped with a warning and stays "new".
+        Returns the number of episodes marked "queued".
+        """
+        manifest = configparser.ConfigParser(interpolation=None)
+        manifest.read(manifest_path, encoding="utf-8")
+        if entries is None:
+            entries = self.episodes("new", limit)
+        queued = []
+        for entry in entries:
+            title = slug_of(entry.url)
+            if not manifest.has_section(title):
+                manifest[title] = {"url": entry.url}
+            elif manifest[title].get("url") != entry.url:
+                # 同じ slug の別エピソード → 上書きすると output/{title} が混ざるので追加しない
+                print(f"⚠️ {title} は {manifest[title].get('url')} で使われているので追加しません: {entry.url}",
+                      file=sys.stderr)
+                continue
+            queued.append(entry.url)
+        if os.path.dirname(manifest_path):
+            os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+        with open(manifest_path, "w", encoding="utf-8") as f:
+            manifest.write(f)
+        self.set_state(queued, "queued")
+        return len(queued)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="エピソード索引の参照・状態変更")
+    parser.add_argument("--index", default=DEFAULT_INDEX_PATH, help="索引ファイル")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_list = sub.add_parser("list", help="エピソードを一覧表示")
+    p_list.add_argument("--state", choices=STATES)
+    p_list.add_argument("--limit", type=int)
+    p_mark = sub.add_parser("mark", help="状態を変更")
+    p_mark.add_argument("state", choices=STATES)
+    p_mark.add_argument("urls", nargs="+")
+    p_queue = sub.add_parser("queue", help="new のエピソードをバッチ用 manifest に追加")
+    p_queue.add_argument("manifest")
+    p_queue.add_argument("--limit", type=int)
+    sub.add_parser("stats", help="状態ごとの件数")
+    args = parser.parse_args()
+
+    with EpisodeIndex(args.index) as index:
+        if args.command == "list":
+            for e in index.episodes(args.state, args.limit):
+                print(f"{e.year or ''}\t{e.title}\t{e.url}")
+        elif args.command == "mark":
+            print(f"✅ {index.set_state(args.urls, args.state)} 件を {args.state} に変更")
+        elif args.command == "queue":
+            print(f"📥 {index.queue_to_manifest(args.manifest, limit=args.limit)} 件を {args.manifest} に追加")
+        else:
+            for state, n in sorted(index.counts().items()):
+                print(f"{state}\t{n}")
@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+from dataclasses import dataclass
+
+import requests
+
+DEFAULT_CACHE_DIR = "cache/http"
+
+
+@dataclass
+class CachedResponse:
+    url: str
+    content: bytes
+    not_modified: bool   # True: 304 が返り、キャッシュの本文をそのまま使った
+    etag: str | None = None
+    last_modified: str | None = None
+
+
+class HttpCache:
+    """
+    On-disk cache of GET responses revalidated with ETag / Last-Modified.
+
+    Each URL is stored as <sha256>.body plus <sha256>.json (validators); a repeat
+    request sends If-None-Match / If-Modified-Since so an unchanged page costs a 304.
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _paths(self, url: str) -> tuple:
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        stem = os.path.join(self.cache_dir, key)
+        return stem + ".body", stem + ".json"
+
+    def _load(self, url: str) -> tuple:
+        body_path, meta_path = self._paths(url)
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            with open(body_path, "rb") as f:
+                return meta, f.read()
+        except (FileNotFoundError, ValueError):
+            return None, None
+
+    def _store(self, url: str, meta: dict, content: bytes) -> None:
+        body_path, meta_path = self._paths(url)
+        # 同じ URL を別スレッドが同時に保存しても一時ファイルが重ならないように
+        suffix = f".{os.getpid()}-{threading.get_ident()}.tmp"
+        with open(body_path + suffix, "wb") as f:
+            f.write(content)
+        os.replace(body_path + suffix, body_path)
+        with open(meta_path + suffix, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(meta_path + suffix, meta_path)
+
+    def get(self, session: requests.Session, url: str, timeout: float = 15) -> CachedResponse:
+        meta, content = self._load(url)
+        headers = {}
+        if meta:
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+
+        response = session.get(url, headers=headers, timeout=timeout)
+        if response.status_code == 304 and content is not None:
+            return CachedResponse(url, content, True, meta.get("etag"), meta.get("last_modified"))
+        response.raise_for_status()
+
+        meta = {"url": url, "etag": response.headers.get("ETag"), "last_modified": response.headers.get("Last-Modified")}
+        if meta["etag"] or meta["last_modified"]:
+            self._store(url, meta, response.content)
+        return CachedResponse(url, response.content, False, meta["etag"], meta["last_modified"])
@@ -0,0 +1,39 @@
+import configparser
+
+from alltags_deutsch import ArchiveEntry, ArchivePage
+from episode_index import EpisodeIndex, slug_of
+
+BASE = "https://www.dw.com/de"
+
+
+def _index(tmp_path, urls):
+    index = EpisodeIndex(str(tmp_path / "episodes.sqlite3"))
+    index.add_page(ArchivePage(2024, f"{BASE}/archiv", False, [ArchiveEntry(2024, url, url) for url in urls]))
+    return index
+
+
+def _manifest(path):
+    manifest = configparser.ConfigParser(interpolation=None)
+    manifest.read(path, encoding="utf-8")
+    return {title: manifest[title]["url"] for title in manifest.sections()}
+
+
+def test_slug_of():
+    assert slug_of(f"{BASE}/handy-aus-offline-sein/a-123") == "handy-aus-offline-sein"
+    assert slug_of(f"{BASE}/handy-aus-offline-sein/a-123?maca=de") == "handy-aus-offline-sein"
+
+
+def test_slug_collision_is_skipped_and_stays_new(tmp_path, capsys):
+    first, second, other = f"{BASE}/wetter/a-1", f"{BASE}/wetter/a-2", f"{BASE}/stra%C3%9Fe/a-3"
+    path = str(tmp_path / "episodes.ini")
+    with _index(tmp_path, [first, second, other]) as index:
+        assert index.queue_to_manifest(path) == 2
+        assert _manifest(path) == {"wetter": first, "stra%C3%9Fe": other}
+        assert [e.url for e in index.episodes("new")] == [second]
+        assert [e.url for e in index.episodes("queued")] == sorted([first, other])
+        assert second in capsys.readouterr().err
+
+        # 同じ URL がすでに manifest にあれば、そのまま queued にする
+        index.set_state([first], "new")
+        assert index.queue_to_manifest(path, [ArchiveEntry(2024, "Wetter", first)]) == 1
+        assert _manifest(path)["wetter"] == first
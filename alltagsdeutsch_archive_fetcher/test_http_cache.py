@@ -0,0 +1,28 @@
+import threading
+
+from http_cache import HttpCache
+
+
+def test_concurrent_stores_of_one_url(tmp_path):
+    cache = HttpCache(str(tmp_path))
+    url = "https://learngerman.dw.com/de/alltagsdeutsch-archiv-2025/a-71187473"
+    start = threading.Barrier(8, timeout=5)
+    errors = []
+
+    def store(i):
+        start.wait()
+        try:
+            for _ in range(50):
+                cache._store(url, {"url": url, "etag": f'"{i}"', "last_modified": None}, b"<html></html>")
+        except OSError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=store, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
+    meta, content = cache._load(url)
+    assert content == b"<html></html>" and meta["url"] == url
+    assert sorted(p.suffix for p in tmp_path.iterdir()) == [".body", ".json"]
@@ -0,0 +1,94 @@
+"""Local HTTP server that stands in for learngerman.dw.com during offline benchmarks."""
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+CONTENT_TYPES = {".html": "text/html; charset=utf-8", ".mp3": "audio/mpeg", ".wav": "audio/wav"}
+
+
+class FixtureServer:
+    """
+    Serve recorded pages and generated audio on 127.0.0.1.
+
+      /episode/le, /episode/lm  -> fixtures/le.html, fixtures/lm.html
+      /archive                  -> fixtures/archive.html
+      /audio/<name>             -> files registered with add_file()
+
+    Responses carry ETag / Last-Modified and honour Range / If-Range / If-None-Match,
+    so the download manager's resume and 304 paths can be exercised too.
+    """
+
+    def __init__(self):
+        self.routes = {
+            "/episode/le": os.path.join(FIXTURE_DIR, "le.html"),
+            "/episode/lm": os.path.join(FIXTURE_DIR, "lm.html"),
+            "/archive": os.path.join(FIXTURE_DIR, "archive.html"),
+        }
+        self.requests = 0
+        self._httpd = None
+
+    def add_file(self, url_path: str, file_path: str) -> None:
+        self.routes[url_path] = file_path
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self._httpd.server_port}"
+
+    def __enter__(self) -> "FixtureServer":
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True  # ヘッダと本文の別送で 40ms 待たされないように
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                server.requests += 1
+                path = server.routes.get(self.path.split("?")[0])
+                if path is None or not os.path.exists(path):
+                    self.send_error(404)
+                    return
+                with open(path, "rb") as f:
+                    body = f.read()
+                st = os.stat(path)
+                etag = '"%s"' % hashlib.md5(body).hexdigest()
+                last_modified = formatdate(st.st_mtime, usegmt=True)
+
+                if self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+
+                status, start = 200, 0
+                rng = self.headers.get("Range", "")
+                if rng.startswith("bytes=") and self.headers.get("If-Range", etag) in (etag, last_modified):
+                    start = int(rng[len("bytes="):].split("-")[0])
+                    status = 206
+                payload = body[start:]
+                self.send_response(status)
+                self.send_header("Content-Type", CONTENT_TYPES.get(os.path.splitext(path)[1], "application/octet-stream"))
+                self.send_header("Content-Length", str(len(payload)))
+                self.send_header("ETag", etag)
+                self.send_header("Last-Modified", last_modified)
+                if status == 206:
+                    self.send_header("Content-Range", f"bytes {start}-{len(body) - 1}/{len(body)}")
+                self.end_headers()
+                self.wfile.write(payload)
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._httpd.shutdown()
+        self._httpd.server_close()
@@ -0,0 +1,503 @@
+"""
+Offline benchmark suite for the dictation pipeline and the archive fetcher.
+
+Everything runs against local fixtures: recorded DW pages served by a local HTTP
+server, synthetic audio with known silence gaps and canned Whisper word timestamps.
+Results are appended to benchmarks/results/history.jsonl and compared with the
+previous run so regressions show up immediately.
+
+    python benchmarks/run_benchmarks.py
+    python benchmarks/run_benchmarks.py -k align -k export --repeat 10
+"""
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, os.path.join(REPO_DIR, "dictation_resolver"))
+sys.path.insert(0, os.path.join(REPO_DIR, "alltagsdeutsch_archive_fetcher"))
+sys.path.insert(0, os.path.join(REPO_DIR, "offline_dictionary"))
+sys.path.insert(0, os.path.join(REPO_DIR, "dictation_resolver", "utils"))
+sys.path.insert(0, BENCH_DIR)
+
+from local_server import FIXTURE_DIR, FixtureServer  # noqa: E402
+from synthetic import build_fixtures  # noqa: E402
+
+RESULTS_FILE = os.path.join(BENCH_DIR, "results", "history.jsonl")
+WORK_DIR = os.path.join(BENCH_DIR, ".work")
+
+BENCHMARKS = []
+
+
+class Skip(Exception):
+    """Raised by a benchmark whose optional tool (ffmpeg, Chrome, punkt, ...) is missing."""
+
+
+def benchmark(name: str, repeat: int | None = None):
+    def register(fn):
+        BENCHMARKS.append((name, fn, repeat))
+        return fn
+    return register
+
+
+class Context:
+    def __init__(self, server: FixtureServer, fixtures: dict, work_dir: str):
+        self.server = server
+        self.fixtures = fixtures
+        self.work_dir = work_dir
+        with open(fixtures["json"], encoding="utf-8") as f:
+            self.transcript = json.load(f)
+        self.words = [w for seg in self.transcript["segments"] for w in seg["words"]]
+        self.full_text = "".join(w["word"] for w in self.words)
+
+    def tmpdir(self) -> str:
+        return tempfile.mkdtemp(dir=self.work_dir)
+
+    def sentences(self) -> list:
+        try:
+            from nltk.tokenize import sent_tokenize
+            return sent_tokenize(self.full_text, language="german")
+        except LookupError:
+            return re.split(r"(?<=[.?!])\s+", self.full_text.strip())
+
+
+# ---------- benchmarks ----------
+
+def _lm_raw_paragraphs() -> list:
+    from bs4 import BeautifulSoup
+    with open(os.path.join(FIXTURE_DIR, "lm.html"), encoding="utf-8") as f:
+        soup = BeautifulSoup(f.read(), "html.parser")
+    return [p.get_text() for p in soup.select("div.richtext-content-container p")]
+
+
+@benchmark("normalize_text")
+def bench_normalize_text(ctx: Context):
+    from subtitle_extractor import normalize_text
+    paras = _lm_raw_paragraphs() * 25
+    return lambda: [normalize_text(p) for p in paras]
+
+
+@benchmark("sentence_split_regex")
+def bench_split_regex(ctx: Context):
+    text = "\n".join(_lm_raw_paragraphs() * 25)
+    return lambda: re.split(r"(?<=[.?!:])\s+|\n+", text)
+
+
+@benchmark("sentence_split_punkt")
+def bench_split_punkt(ctx: Context):
+    try:
+        import nltk
+        nltk.data.find("tokenizers/punkt_tab")
+    except (ImportError, LookupError):
+        raise Skip("NLTK punkt_tab not installed")
+    from nltk.tokenize import sent_tokenize
+    return lambda: sent_tokenize(ctx.full_text, language="german")
+
+
+@benchmark("align_sentences")
+def bench_align(ctx: Context):
+    from sentence_aligner import align_sentences
+    sentences = ctx.sentences()
+    return lambda: align_sentences(ctx.words, sentences)
+
+
+@benchmark("transcript_correction_30min", repeat=3)
+def bench_correction(ctx: Context):
+    import random
+    from synthetic import make_transcript
+    from transcript_corrector import correct_transcript
+    # 30 分の放送に、置換・欠落・余分な語を約 10% 混ぜた公式スクリプトを突き合わせる
+    transcript = make_transcript(30, seed=7)
+    words = [w for seg in transcript["segments"] for w in seg["words"]]
+    rng = random.Random(7)
+    reference = []
+    for seg in transcript["segments"]:
+        tokens = []
+        for w in seg["words"]:
+            r = rng.random()
+            if r < 0.04:
+                tokens.append("Bundesregierung")
+            elif r < 0.07:
+                continue
+            else:
+                tokens.append(w["word"].strip())
+                if r > 0.97:
+                    tokens.append("eben")
+        reference.append(" ".join(tokens))
+    return lambda: correct_transcript(words, reference)
+
+
+@benchmark("boundary_refine_30min")
+def bench_refine(ctx: Context):
+    import numpy as np
+    from boundary_refiner import ClipSettings, padded_ranges, refine_cut_points
+    from synthetic import SAMPLE_RATE, make_transcript, render_audio
+    transcript = make_transcript(30, seed=2)
+    audio = render_audio(transcript, seed=2)
+    rng = np.random.default_rng(2)
+    # Whisper の境界を ±100ms 程度ずらしたものを補正させる
+    starts = np.array([seg["start"] * 1000 for seg in transcript["segments"]]) + rng.uniform(-50, 120, len(transcript["segments"]))
+    ends = np.array([seg["end"] * 1000 for seg in transcript["segments"]]) - rng.uniform(-50, 120, len(transcript["segments"]))
+    settings = ClipSettings()
+
+    def run():
+        s, e = refine_cut_points(audio, SAMPLE_RATE, starts, ends, settings)
+        return padded_ranges(s, e, settings)
+    return run
+
+
+@benchmark("chunk_plan_merge_30min")
+def bench_chunk_plan(ctx: Context):
+    from chunked_transcription import merge_chunk_results, plan_chunks
+    from synthetic import SAMPLE_RATE, make_transcript, render_audio
+    transcript = make_transcript(30, seed=2)
+    audio = render_audio(transcript, seed=2)
+    words = [w for seg in transcript["segments"] for w in seg["words"]]
+
+    def chunk_result(chunk):
+        # Whisper がチャンク内の単語をチャンク先頭からの時刻で返した形
+        inside = [{**w, "start": w["start"] - chunk.start, "end": w["end"] - chunk.start}
+                  for w in words if chunk.start <= w["start"] and w["end"] <= chunk.end]
+        return {"language": "de", "segments": [{"words": inside}]}
+
+    def run():
+        chunks = plan_chunks(audio, SAMPLE_RATE)
+        return merge_chunk_results(chunks, [chunk_result(c) for c in chunks])
+    return run
+
+
+@benchmark("subtitle_parse_30min")
+def bench_subtitle_parse(ctx: Context):
+    from synthetic import make_transcript, write_ttml
+    from ttml_subtitles import read_subtitle_sentences
+    path = os.path.join(ctx.tmpdir(), "subtitles.xml")
+    write_ttml(path, make_transcript(30, seed=2))
+    return lambda: read_subtitle_sentences(path)
+
+
+def _vocabulary_corpus(ctx: Context, episodes: int = 50) -> str:
+    """output/ with `episodes` folders of script.txt + manifest.json (the transcript's sentences, shuffled)."""
+    import random
+    sentences = ctx.sentences()
+    root = os.path.join(ctx.tmpdir(), "output")
+    for e in range(episodes):
+        lines = random.Random(e).sample(sentences, len(sentences))
+        episode_dir = os.path.join(root, f"episode-{e:03d}")
+        os.makedirs(episode_dir)
+        with open(os.path.join(episode_dir, "script.txt"), "w", encoding="utf-8") as f:
+            f.writelines(f"{line}\n" for line in lines)
+        with open(os.path.join(episode_dir, "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump({"version": 1, "clips": {f"sentence_{i:03d}.mp3": {} for i in range(len(lines))}}, f)
+    return root
+
+
+@benchmark("vocabulary_update_episode", repeat=3)
+def bench_vocabulary_update(ctx: Context):
+    from vocabulary_index import VocabularyIndex, update_vocabulary_index
+    root = _vocabulary_corpus(ctx)
+    with VocabularyIndex(os.path.join(root, "vocabulary.sqlite3")) as index:
+        index.update_all(root, os.path.join(root, "no-reference"))
+    script = os.path.join(root, "episode-000", "script.txt")
+    edits = iter(range(1000))
+
+    def run():
+        # 1エピソードの1行を直して再索引（スプリッター終了時の更新と同じ）
+        with open(script, "a", encoding="utf-8") as f:
+            f.write(f"Noch ein Satz {next(edits)}.\n")
+        update_vocabulary_index(os.path.dirname(script))
+    return run
+
+
+@benchmark("vocabulary_search")
+def bench_vocabulary_search(ctx: Context):
+    from vocabulary_index import VocabularyIndex
+    root = _vocabulary_corpus(ctx)
+    index = VocabularyIndex(os.path.join(root, "vocabulary.sqlite3"))
+    index.update_all(root, os.path.join(root, "no-reference"))
+
+    def run():
+        index.search(["Handy", "Freunde"], match_all=True, limit=100)
+        index.search(["stud*"], limit=100)
+        index.frequencies(limit=100)
+    return run
+
+
+@benchmark("checklist_export_all", repeat=3)
+def bench_checklist_export(ctx: Context):
+    from checklist_exporter import FORMATS, export_all
+    root = _vocabulary_corpus(ctx)
+
+    def run():
+        out = ctx.tmpdir()
+        with contextlib.redirect_stderr(io.StringIO()):
+            export_all(root, FORMATS, out, workers=4)
+            # 2回目は何も変わっていないので、記録を見るだけで終わるはず
+            exported, _, _ = export_all(root, FORMATS, out, workers=4)
+        if exported:
+            raise RuntimeError(f"{exported} unchanged episodes were exported again")
+        shutil.rmtree(out)
+    return run
+
+
+def _dictionary_index(ctx: Context, n_entries: int = 200_000) -> str:
+    from dictionary_index import READERS, build_index
+    from synthetic import write_dictionary_tsv
+    tmp = ctx.tmpdir()
+    write_dictionary_tsv(os.path.join(tmp, "dump.tsv"), n_entries)
+    build_index(READERS[".tsv"](os.path.join(tmp, "dump.tsv")), os.path.join(tmp, "dictionary.idx"))
+    return os.path.join(tmp, "dictionary.idx")
+
+
+@benchmark("dictionary_build_50k", repeat=3)
+def bench_dictionary_build(ctx: Context):
+    from dictionary_index import READERS, build_index
+    from synthetic import write_dictionary_tsv
+    tmp = ctx.tmpdir()
+    write_dictionary_tsv(os.path.join(tmp, "dump.tsv"), 50_000)
+    return lambda: build_index(READERS[".tsv"](os.path.join(tmp, "dump.tsv")), os.path.join(tmp, "dictionary.idx"))
+
+
+@benchmark("dictionary_cold_open")
+def bench_dictionary_cold_open(ctx: Context):
+    from dictionary_index import DictionaryIndex
+    path = _dictionary_index(ctx)
+
+    def run():
+        with DictionaryIndex(path) as index:
+            index.lookup("Handy")
+    return run
+
+
+@benchmark("dictionary_lookup_script")
+def bench_dictionary_lookup(ctx: Context):
+    from dictionary_index import DictionaryIndex, lookup_text
+    index = DictionaryIndex(_dictionary_index(ctx))
+    # キャッシュなしで script.txt 1本ぶん（全文の全単語）を引く
+    return lambda: [lookup_text(index, s) for s in ctx.sentences()]
+
+
+def _export_bench(mode: str):
+    def setup(ctx: Context):
+        if not shutil.which("ffmpeg"):
+            raise Skip("ffmpeg not found")
+        from clip_exporter import ClipSpec, export_clips
+        clips = [ClipSpec(i, int(seg["start"] * 1000), int(seg["end"] * 1000) + 300)
+                 for i, seg in enumerate(ctx.transcript["segments"][:40])]
+
+        def run():
+            out = ctx.tmpdir()
+            # WAV を入力にする（pydub が ffprobe なしで読め、デコード時間の揺れも小さい）
+            export_clips(ctx.fixtures["wav"], clips, out, mode=mode)
+            shutil.rmtree(out)
+        return run
+    return setup
+
+
+for _mode in ("serial", "pool", "ffmpeg", "pack"):
+    benchmark(f"clip_export_{_mode}", repeat=3)(_export_bench(_mode))
+
+
+# main.py の起動時（ステージに入る前）に読み込まれてはいけない重い依存
+HEAVY_MODULES = ("whisper", "torch", "selenium", "pydub", "nltk", "numpy")
+
+
+def _startup_bench(args: list, check_imports: str | None = None):
+    """A fresh interpreter per run, so the time includes interpreter startup and every import."""
+    def setup(ctx: Context):
+        cmd = [sys.executable, *args]
+        if check_imports:
+            cmd = [sys.executable, "-c", f"import sys, {check_imports}; "
+                   f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"]
+        cwd = os.path.join(REPO_DIR, "dictation_resolver")
+
+        def run():
+            out = subprocess.run(cmd, cwd=cwd, capture_output=True, text=True, check=True).stdout.strip()
+            if check_imports and out:
+                raise RuntimeError(f"heavy modules imported at startup: {out}")
+        return run
+    return setup
+
+
+benchmark("startup_main_help")(_startup_bench(["main.py", "--help"]))
+benchmark("startup_import_main")(_startup_bench([], check_imports="main"))
+benchmark("startup_import_download")(_startup_bench([], check_imports="main, audio_downloader"))
+
+
+@benchmark("le_discovery_http")
+def bench_le_discovery(ctx: Context):
+    from audio_downloader import find_audio_url_http, get_session
+    url = ctx.server.base_url + "/episode/le"
+    session = get_session()
+    return lambda: find_audio_url_http(url, session)
+
+
+@benchmark("audio_download", repeat=3)
+def bench_audio_download(ctx: Context):
+    from download_manager import DownloadManager
+    url = ctx.server.base_url + "/audio/synthetic.mp3"
+    manager = DownloadManager()
+
+    def run():
+        out = ctx.tmpdir()
+        dest = os.path.join(out, "a.mp3")
+        first = manager.download(url, dest)
+        second = manager.download(url, dest)
+        assert second.status == "not-modified", second
+        shutil.rmtree(out)
+        return first
+    return run
+
+
+@benchmark("lm_extraction_end_to_end", repeat=1)
+def bench_lm_extraction(ctx: Context):
+    from subtitle_extractor import fetch_topthema_transcript, setup_chrome_driver
+    try:
+        setup_chrome_driver(headless=True).quit()
+    except Exception as e:  # Chrome / chromedriver がない環境
+        raise Skip(f"Chrome not available ({type(e).__name__})")
+    url = ctx.server.base_url + "/episode"
+
+    def run():
+        out = os.path.join(ctx.tmpdir(), "reference.txt")
+        fetch_topthema_transcript(url, output_file=out, headless=True, max_wait=20)
+    return run
+
+
+@benchmark("archive_parse")
+def bench_archive(ctx: Context):
+    from alltags_deutsch import fetch_alltagsdeutch_links
+    url = ctx.server.base_url + "/archive"
+
+    def run():
+        with contextlib.redirect_stdout(io.StringIO()):
+            fetch_alltagsdeutch_links(url)
+    return run
+
+
+@benchmark("archive_crawl_revalidate")
+def bench_archive_crawl(ctx: Context):
+    from alltags_deutsch import crawl_archive, get_session, write_entries
+    from http_cache import HttpCache
+    url = ctx.server.base_url + "/archive"
+    cache = HttpCache(ctx.tmpdir())
+    session = get_session()
+
+    def run():
+        # 2 回目以降は 304 + キャッシュ本文のパースになる
+        with contextlib.redirect_stderr(io.StringIO()):
+            write_entries(crawl_archive(url, cache=cache, follow_years=False, session=session), io.StringIO())
+    return run
+
+
+# ---------- runner ----------
+
+def git_revision() -> str | None:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True, text=True)
+        return out.stdout.strip() or None
+    except OSError:
+        return None
+
+
+def time_runs(fn, repeat: int) -> dict:
+    fn()  # warm-up（import やキャッシュの初回コストを除く）
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        runs.append(time.perf_counter() - start)
+    return {"median": statistics.median(runs), "min": min(runs), "runs": len(runs)}
+
+
+def load_previous() -> dict | None:
+    if not os.path.exists(RESULTS_FILE):
+        return None
+    last = None
+    with open(RESULTS_FILE, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                last = json.loads(line)
+    return last
+
+
+def run(selected: list, repeat: int, minutes: float, threshold: float, save: bool) -> int:
+    os.makedirs(WORK_DIR, exist_ok=True)
+    fixtures = build_fixtures(os.path.join(WORK_DIR, "fixtures"), minutes=minutes)
+    previous = load_previous()
+    results = {}
+    regressions = []
+
+    with FixtureServer() as server:
+        if fixtures["mp3"]:
+            server.add_file("/audio/synthetic.mp3", fixtures["mp3"])
+        else:
+            server.add_file("/audio/synthetic.mp3", fixtures["wav"])
+        ctx = Context(server, fixtures, WORK_DIR)
+
+        print(f"{'benchmark':32} {'median':>10} {'min':>10} {'prev':>10}  change")
+        for name, setup, bench_repeat in BENCHMARKS:
+            if selected and not any(k in name for k in selected):
+                continue
+            try:
+                fn = setup(ctx)
+                stats = time_runs(fn, bench_repeat or repeat)
+            except Skip as e:
+                print(f"{name:32} {'skipped':>10}  ({e})")
+                results[name] = {"skipped": str(e)}
+                continue
+            except Exception as e:
+                print(f"{name:32} {'error':>10}  ❌ {type(e).__name__}: {e}")
+                results[name] = {"error": f"{type(e).__name__}: {e}"}
+                continue
+            results[name] = stats
+            prev = ((previous or {}).get("results", {}).get(name) or {}).get("median")
+            change = ""
+            if prev:
+                ratio = stats["median"] / prev - 1
+                change = f"{ratio:+.1%}"
+                if ratio > threshold:
+                    change += "  ⚠️ REGRESSION"
+                    regressions.append(name)
+            prev_s = f"{prev * 1000:.2f}ms" if prev else "-"
+            print(f"{name:32} {stats['median'] * 1000:>8.2f}ms {stats['min'] * 1000:>8.2f}ms {prev_s:>10}  {change}")
+
+    if save:
+        os.makedirs(os.path.dirname(RESULTS_FILE), exist_ok=True)
+        entry = {
+            "time": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "revision": git_revision(),
+            "python": sys.version.split()[0],
+            "audio_minutes": minutes,
+            "results": results,
+        }
+        with open(RESULTS_FILE, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        print(f"\n💾 結果を保存: {RESULTS_FILE}")
+    if regressions:
+        print(f"⚠️ 前回より {threshold:.0%} 以上遅くなったベンチマーク: {', '.join(regressions)}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="オフラインのベンチマークを実行")
+    parser.add_argument("-k", action="append", default=[], help="名前にこの文字列を含むベンチマークだけ実行（複数可）")
+    parser.add_argument("--repeat", type=int, default=5, help="各ベンチマークの繰り返し回数")
+    parser.add_argument("--minutes", type=float, default=5.0, help="合成音声の長さ（分）")
+    parser.add_argument("--threshold", type=float, default=0.2, help="この割合以上遅くなったら回帰とみなす")
+    parser.add_argument("--no-save", action="store_true", help="結果を history.jsonl に保存しない")
+    args = parser.parse_args()
+
+    sys.exit(run(args.k, args.repeat, args.minutes, args.threshold, not args.no_save))
@@ -0,0 +1,121 @@
+"""Deterministic synthetic audio and canned Whisper output for offline benchmarks."""
+from __future__ import annotations
+
+import json
+import os
+import random
+import shutil
+import subprocess
+import wave
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+WORD_SECONDS = 0.30
+WORD_GAP_SECONDS = 0.08
+SENTENCE_GAP_SECONDS = 0.70   # 文の間の無音（既知の区切り）
+
+VOCAB = ("Handy Freunde Zeit Stunden Tag Leben Menschen digital offline Trend Studie Jugendliche "
+         "Nachrichten Bildschirm Ruhe Pause Natur Gespräch Arbeit Familie Wochenende Internet "
+         "z. B. Dr. Müller sagt dass viele immer öfter").split()
+
+
+def make_transcript(minutes: float, seed: int = 1) -> dict:
+    """A Whisper-like result ({"text", "segments": [{"words": [...]}]}) filling `minutes` of audio."""
+    rng = random.Random(seed)
+    t = 0.5
+    segments = []
+    total = minutes * 60
+    while t < total:
+        words = []
+        n = rng.randint(5, 18)
+        for i in range(n):
+            token = rng.choice(VOCAB)
+            if i == 0:
+                token = token.capitalize()
+            if i == n - 1:
+                token += rng.choice(".....?!")
+            words.append({"word": " " + token, "start": round(t, 2), "end": round(t + WORD_SECONDS, 2),
+                          "probability": 0.9})
+            t += WORD_SECONDS + WORD_GAP_SECONDS
+        t += SENTENCE_GAP_SECONDS
+        segments.append({"id": len(segments), "start": words[0]["start"], "end": words[-1]["end"],
+                         "text": "".join(w["word"] for w in words), "words": words})
+    return {"text": "".join(s["text"] for s in segments), "language": "de", "segments": segments}
+
+
+def render_audio(transcript: dict, seed: int = 1) -> np.ndarray:
+    """Tone bursts where the words are, silence (plus faint noise) everywhere else."""
+    rng = np.random.default_rng(seed)
+    end = transcript["segments"][-1]["end"] + 1.0
+    audio = rng.normal(0, 0.002, int(end * SAMPLE_RATE)).astype(np.float32)
+    for seg in transcript["segments"]:
+        for w in seg["words"]:
+            a, b = int(w["start"] * SAMPLE_RATE), int(w["end"] * SAMPLE_RATE)
+            t = np.arange(b - a) / SAMPLE_RATE
+            freq = 180 + 40 * (len(w["word"]) % 7)
+            audio[a:b] += (0.3 * np.sin(2 * np.pi * freq * t) * np.hanning(b - a)).astype(np.float32)
+    return audio
+
+
+def _smpte(seconds: float, frame_rate: int = 25, start_hour: int = 10) -> str:
+    frames = int(round((seconds + start_hour * 3600) * frame_rate))
+    s, f = divmod(frames, frame_rate)
+    return f"{s // 3600:02d}:{s // 60 % 60:02d}:{s % 60:02d}:{f:02d}"
+
+
+def write_ttml(path: str, transcript: dict, words_per_cue: int = 7) -> None:
+    """
+    Tagesschau-style EBU-TT subtitles for the transcript: SMPTE time code from 10:00:00:00,
+    two <span> lines per cue, cues running across sentence boundaries.
+    """
+    words = [w for seg in transcript["segments"] for w in seg["words"]]
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                '<tt xmlns="http://www.w3.org/ns/ttml" xmlns:ttp="http://www.w3.org/ns/ttml#parameter" '
+                'ttp:timeBase="smpte" ttp:frameRate="25"><head/><body><div>\n')
+        for i in range(0, len(words), words_per_cue):
+            cue = words[i:i + words_per_cue]
+            half = len(cue) // 2
+            lines = ["".join(w["word"] for w in part).strip() for part in (cue[:half], cue[half:])]
+            f.write(f'<p begin="{_smpte(cue[0]["start"])}" end="{_smpte(cue[-1]["end"])}">'
+                    f'<span>{lines[0]}</span><br/><span>{lines[1]}</span></p>\n')
+        f.write("</div></body></tt>\n")
+
+
+def write_dictionary_tsv(path: str, n_entries: int, seed: int = 1) -> None:
+    """A dictionary dump (lemma, gloss, pos, forms) holding VOCAB plus `n_entries` random lemmas."""
+    rng = random.Random(seed)
+    letters = "abcdefghijklmnopqrstuvwxyzäöüß"
+    with open(path, "w", encoding="utf-8") as f:
+        for word in sorted(set(VOCAB)):
+            f.write(f"{word}\tgloss of {word}\tnoun\t{word}e,{word}en,{word}s\n")
+        for i in range(n_entries):
+            word = "".join(rng.choice(letters) for _ in range(rng.randint(4, 14)))
+            f.write(f"{word.capitalize()}\tgloss {i}\tnoun\t{word}e,{word}en,{word}s\n")
+
+
+def write_wav(path: str, audio: np.ndarray) -> None:
+    pcm = (np.clip(audio, -1, 1) * 32767).astype("<i2")
+    with wave.open(path, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(SAMPLE_RATE)
+        w.writeframes(pcm.tobytes())
+
+
+def build_fixtures(out_dir: str, minutes: float = 5.0, seed: int = 1) -> dict:
+    """Create (once) transcript JSON, WAV and — if ffmpeg exists — MP3 under out_dir."""
+    os.makedirs(out_dir, exist_ok=True)
+    stem = os.path.join(out_dir, f"synthetic_{minutes:g}min_{seed}")
+    paths = {"json": stem + ".json", "wav": stem + ".wav", "mp3": None}
+    if not os.path.exists(paths["json"]):
+        transcript = make_transcript(minutes, seed)
+        with open(paths["json"], "w", encoding="utf-8") as f:
+            json.dump(transcript, f, ensure_ascii=False)
+        write_wav(paths["wav"], render_audio(transcript, seed))
+    if shutil.which("ffmpeg"):
+        paths["mp3"] = stem + ".mp3"
+        if not os.path.exists(paths["mp3"]):
+            subprocess.run(["ffmpeg", "-y", "-loglevel", "error", "-i", paths["wav"], paths["mp3"]], check=True)
+    return paths
@@ -1,50 +1,150 @@
+from __future__ import annotations
+
+import html
 import os
-import time
+import re
 import configparser
+from urllib.parse import urljoin
 import requests
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
+from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+
+import profiling
+from download_manager import DownloadManager
+
+USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+    "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36"
+)
+# 埋め込み JSON 内の mp3 URL（"https:\/\/..." や \u002F のエスケープも対象）
+MP3_URL_PATTERN = re.compile(r"https?:(?:\\?/|\\u002[fF]){2}[^\s\"'<>]+?\.mp3")
+
+_session = None
+
+
+def get_session() -> requests.Session:
+    """Shared requests.Session with a connection pool (reused across episodes)."""
+    global _session
+    if _session is None:
+        _session = requests.Session()
+        _session.headers.update({"User-Agent": USER_AGENT, "Accept-Language": "de-DE,de;q=0.9"})
+        adapter = HTTPAdapter(pool_connections=8, pool_maxsize=16)
+        _session.mount("https://", adapter)
+        _session.mount("http://", adapter)
+    return _session
+
+
+def _unescape_url(raw: str) -> str:
+    return html.unescape(raw.replace("\\u002F", "/").replace("\\u002f", "/").replace("\\/", "/"))
+
+
+def find_mp3_url_in_html(page: str, base_url: str = "") -> str | None:
+    """Find the first MP3 link in static HTML: <a>/<audio>/<source> first, then embedded JSON."""
+    soup = BeautifulSoup(page, "html.parser")
+    for tag, attr in (("a", "href"), ("source", "src"), ("audio", "src")):
+        for el in soup.find_all(tag, attrs={attr: True}):
+            if el[attr].split("?")[0].endswith(".mp3"):
+                return urljoin(base_url, el[attr])
+    m = MP3_URL_PATTERN.search(page)
+    return _unescape_url(m.group(0)) if m else None
+
+
+def find_audio_url_http(le_url: str, session: requests.Session | None = None, timeout: float = 15) -> str | None:
+    """Fast path: one HTTP GET of the /le page, no browser."""
+    session = session or get_session()
+    response = session.get(le_url, timeout=timeout)
+    response.raise_for_status()
+    return find_mp3_url_in_html(response.text, base_url=response.url)
+
 
+def find_audio_url_selenium(le_url: str, driver_pool=None) -> str | None:
+    """Slow path: render the page in headless Chrome and read the <a href="...mp3"> links."""
+    if driver_pool is not None:
+        with driver_pool.borrow() as driver:
+            return _find_mp3_link_in_browser(driver, le_url)
 
-def download_topthema_audio(title_: str, url_: str, output_folder="input/audio"):
-    # -- Seleniumの設定 --
+    # selenium は HTTP で見つからなかった時だけ読み込む（import だけで時間がかかる）
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
     options = Options()
     options.add_argument('--headless')
-    driver = webdriver.Chrome(options=options)
+    with profiling.span("browser_startup"):
+        driver = profiling.instrument_driver(webdriver.Chrome(options=options))
+    try:
+        return _find_mp3_link_in_browser(driver, le_url)
+    finally:
+        driver.quit()
+
+
+def _find_mp3_link_in_browser(driver, le_url: str) -> str | None:
+    from selenium.webdriver.common.by import By
+    driver.get(le_url)
+    profiling.sleep(5)  # JSの読み込み待機
+
+    # <a href="...mp3"> を探す
+    links = driver.find_elements(By.TAG_NAME, "a")
+    mp3_links = [a.get_attribute("href") for a in links if a.get_attribute("href") and a.get_attribute("href").endswith(".mp3")]
+    return mp3_links[0] if mp3_links else None  # 最初のmp3リンクを使用
+
 
+def find_topthema_audio_url(url_: str, session: requests.Session | None = None,
+                            driver_pool=None) -> tuple[str, str]:
+    """
+    Return (mp3_url, method) where method is "http" (static HTML) or "selenium" (fallback).
+    Raises ValueError if neither finds an MP3 link.
+    """
+    le_url = url_.strip("/") + "/le"
     try:
-        # leページにアクセス
-        le_url = url_.strip("/") + "/le"
-        driver.get(le_url)
-        time.sleep(5)  # JSの読み込み待機
+        with profiling.span("discover_http"):
+            audio_url = find_audio_url_http(le_url, session)
+        if audio_url:
+            return audio_url, "http"
+        print("ℹ️ 静的 HTML に MP3 リンクがないため Selenium で再取得します")
+    except requests.RequestException as e:
+        print(f"ℹ️ HTTP での取得に失敗 ({e})。Selenium で再取得します")
 
-        # <a href="...mp3"> を探す
-        links = driver.find_elements(By.TAG_NAME, "a")
-        mp3_links = [a.get_attribute("href") for a in links if a.get_attribute("href") and a.get_attribute("href").endswith(".mp3")]
+    with profiling.span("discover_selenium"):
+        audio_url = find_audio_url_selenium(le_url, driver_pool)
+    if not audio_url:
+        raise ValueError("MP3 リンクが見つかりませんでした。")
+    return audio_url, "selenium"
 
-        if not mp3_links:
-            raise ValueError("MP3 リンクが見つかりませんでした。")
 
-        audio_url = mp3_links[0]  # 最初のmp3リンクを使用
+def download_topthema_audio(title_: str, url_: str, output_folder="input/audio", driver_pool=None):
+    """
+    Download the Top Thema MP3; returns the saved path, or None if it failed.
+    `driver_pool` (driver_pool.DriverPool) is only used if the Selenium fallback is needed.
+    """
+    with profiling.span("download"):
+        return _download_topthema_audio(title_, url_, output_folder, driver_pool)
+
+
+def _download_topthema_audio(title_: str, url_: str, output_folder: str, driver_pool) -> str | None:
+    try:
+        session = get_session()
+        audio_url, method = find_topthema_audio_url(url_, session, driver_pool)
+        profiling.count(f"discovery_{method}")
+        print(f"🔎 MP3 リンク取得 ({method}): {audio_url}")
 
         # ファイル名として使えない文字を除去
         safe_title = "".join(c for c in title_ if c.isalnum() or c in " _-").rstrip()
         os.makedirs(output_folder, exist_ok=True)
         output_path = os.path.join(output_folder, f"{safe_title}.mp3")
 
-        # 音声をダウンロード
+        # 音声をダウンロード（ストリーミング・再開可能・未変更ならスキップ）
         print(f"🎧 ダウンロード中: {audio_url}")
-        response = requests.get(audio_url)
-        with open(output_path, "wb") as f:
-            f.write(response.content)
-        print(f"✅ 保存完了: {output_path}")
+        with profiling.span("fetch_audio"):
+            result = DownloadManager(session).download(audio_url, output_path)
+        profiling.count("bytes_downloaded", result.bytes_received)
+        if result.status == "not-modified":
+            print(f"✅ 変更なし（ダウンロード済み）: {output_path}")
+        else:
+            print(f"✅ 保存完了 ({result.status}, {result.size / 1e6:.1f} MB): {output_path}")
+        return output_path
 
     except Exception as e:
         print(f"⚠️ エラー: {e}")
-
-    finally:
-        driver.quit()
+        return None
 
 
 if __name__ == "__main__":
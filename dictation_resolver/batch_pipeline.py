@@ -0,0 +1,288 @@
+from __future__ import annotations
+
+import configparser
+import cProfile
+import json
+import os
+import queue
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from typing import List
+
+import profiling
+
+# main.py と同じく、重い依存（selenium, pydub, nltk, numpy, whisper/torch）はステージの中でだけ import する
+STAGES = ("download", "transcribe", "scrape", "correct")
+DEFAULT_STATUS_FILE = "output/batch_status.json"
+# プロファイラはプロセスに1つしか有効にできないので、同時に測るステージは1つだけ
+_PROFILER_LOCK = threading.Lock()
+
+
+@dataclass
+class Episode:
+    title: str
+    url: str
+    status: dict = field(default_factory=lambda: {s: "pending" for s in STAGES})
+    seconds: dict = field(default_factory=dict)
+    errors: dict = field(default_factory=dict)
+    audio_path: str | None = None
+
+    @property
+    def ok(self) -> bool:
+        return all(v == "done" for v in self.status.values())
+
+
+def load_manifest(path: str) -> List[Episode]:
+    """
+    Read a manifest of episodes. Each section is one episode (section name = title):
+
+        [handy-aus-offline-sein]
+        url = https://learngerman.dw.com/de/handy-aus-offline-sein-ist-im-trend/l-72709529
+    """
+    # URL の %C3%9F などを補間の書式と見なさないように
+    manifest = configparser.ConfigParser(interpolation=None)
+    if not manifest.read(path, encoding="utf-8"):
+        raise FileNotFoundError(f"manifest not found: {path}")
+    return [Episode(title, manifest[title]["url"]) for title in manifest.sections()]
+
+
+class BatchPipeline:
+    """
+    Pipelined scheduler for many episodes.
+
+      - download:   I/O bound, `downloads` run concurrently
+      - transcribe: CPU bound, `whisper_jobs` warm Whisper workers (one process each)
+      - scrape:     browser bound, at most `browsers` pooled Chrome sessions at a time
+
+    An episode is handed to the Whisper stage as soon as its download finishes, so
+    episode B downloads while episode A is being transcribed. Scraping only needs the
+    URL and runs in parallel with both. With sentence_source="reference" an episode is
+    transcribed only after its reference is scraped, since the clips are cut on the official
+    sentences; if scraping failed, transcription is skipped. Once an episode has both its transcript and
+    its reference, the Whisper script is corrected against the reference (cheap, so it
+    runs on whichever thread finished last). A failing stage marks only that episode.
+    """
+
+    def __init__(self, episodes: List[Episode], downloads: int = 4, whisper_jobs: int = 1, browsers: int = 2,
+                 status_file: str = DEFAULT_STATUS_FILE, remote_worker=None, split_options: dict | None = None,
+                 max_pages_per_browser: int = 25, profile: bool = False, sentence_source: str = "whisper"):
+        self.episodes = episodes
+        self.downloads = downloads
+        self.whisper_jobs = whisper_jobs
+        self.browsers = browsers
+        self.status_file = status_file
+        self.remote_worker = remote_worker
+        self.split_options = split_options or {}
+        self.profile = profile
+        self.sentence_source = sentence_source
+        self._reports = {ep.title: profiling.Report(ep.title) for ep in episodes}
+        self._lock = threading.Lock()
+        self._workers: queue.Queue = queue.Queue()
+        self._whisper_pool: ThreadPoolExecutor | None = None
+        # ダウンロードの Selenium フォールバックと字幕取得で同じブラウザを使い回す
+        from driver_pool import DriverPool
+        self._drivers = DriverPool(size=browsers, max_pages=max_pages_per_browser)
+
+    # ---------- status ----------
+
+    def _set(self, ep: Episode, stage: str, state: str, seconds: float | None = None, error: str | None = None):
+        with self._lock:
+            ep.status[stage] = state
+            if seconds is not None:
+                ep.seconds[stage] = round(seconds, 2)
+            if error is not None:
+                ep.errors[stage] = error
+            self._write_status()
+
+    def _write_status(self) -> None:
+        if not self.status_file:
+            return
+        os.makedirs(os.path.dirname(self.status_file) or ".", exist_ok=True)
+        tmp_path = self.status_file + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump([asdict(ep) for ep in self.episodes], f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.status_file)
+
+    @contextmanager
+    def _stage_profile(self, ep: Episode, stage: str):
+        """
+        cProfile one stage into output/{title}/profile_{stage}.pstats. Only one profiler can be
+        active at a time (Python 3.12+ raises on a second enable()), so a stage that overlaps a
+        profiled one runs unprofiled. Profiling never fails the stage.
+        """
+        if not self.profile or not _PROFILER_LOCK.acquire(blocking=False):
+            yield
+            return
+        try:
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:   # デバッガなど別のプロファイラが動いている
+                profiler = None
+            try:
+                yield
+            finally:
+                if profiler:
+                    profiler.disable()
+                    try:
+                        os.makedirs(f"output/{ep.title}", exist_ok=True)
+                        profiler.dump_stats(f"output/{ep.title}/profile_{stage}.pstats")
+                    except OSError as e:
+                        print(f"⚠️ [{ep.title}] {stage} のプロファイルを保存できません: {e}")
+        finally:
+            _PROFILER_LOCK.release()
+
+    def _run_stage(self, ep: Episode, stage: str, fn) -> bool:
+        self._set(ep, stage, "running")
+        start = time.time()
+        try:
+            with self._reports[ep.title].attach(), profiling.span(stage), self._stage_profile(ep, stage):
+                fn()
+        except Exception as e:  # 1エピソードの失敗でバッチ全体を止めない
+            print(f"⚠️ [{ep.title}] {stage} 失敗: {e}")
+            self._set(ep, stage, "failed", time.time() - start, f"{type(e).__name__}: {e}\n{traceback.format_exc()}")
+            return False
+        self._set(ep, stage, "done", time.time() - start)
+        print(f"✅ [{ep.title}] {stage} 完了 ({time.time() - start:.1f}s)")
+        return True
+
+    # ---------- stages ----------
+
+    def _download(self, ep: Episode) -> None:
+        from audio_downloader import download_topthema_audio
+        ep.audio_path = download_topthema_audio(ep.title, ep.url, driver_pool=self._drivers)
+        if ep.audio_path is None:
+            raise RuntimeError("audio download failed")
+
+    def _transcribe(self, ep: Episode) -> None:
+        from whisper_audio_splitter import split_audio_and_generate_transcript
+        # parallel_jobs > 1 ならチャンク分割の専用プロセスプールで文字起こしするのでワーカーは使わない
+        worker = self.remote_worker if self._chunked else (self.remote_worker or self._workers.get())
+        try:
+            reference = f"input/reference/{ep.title}.txt" if self.sentence_source == "reference" else None
+            split_audio_and_generate_transcript(ep.title, worker=worker, input_file=ep.audio_path,
+                                                reference_file=reference, **self.split_options)
+        finally:
+            if worker is not None and worker is not self.remote_worker:
+                self._workers.put(worker)
+
+    def _scrape(self, ep: Episode) -> None:
+        from subtitle_extractor import fetch_topthema_transcript
+        os.makedirs("input/reference", exist_ok=True)
+        fetch_topthema_transcript(ep.url, output_file=f"input/reference/{ep.title}.txt", driver_pool=self._drivers)
+
+    def _transcribe_when_ready(self, ep: Episode) -> None:
+        """Queue the episode for Whisper once its audio (and, for reference sentences, the scrape) is done."""
+        with self._lock:
+            if ep.status["transcribe"] != "pending" or ep.status["download"] in ("pending", "running"):
+                return
+            if self.sentence_source == "reference" and ep.status["scrape"] in ("pending", "running"):
+                return
+            # 公式スクリプトが取れなかったら Whisper の文には戻さない（NLTK の確認をしていないので）
+            ready = ep.status["download"] == "done" and (
+                self.sentence_source != "reference" or ep.status["scrape"] == "done")
+            ep.status["transcribe"] = "queued" if ready else "skipped"
+        if ready:
+            self._whisper_pool.submit(self._transcribe_stage, ep)
+        else:
+            self._set(ep, "transcribe", "skipped")
+            self._correct_when_ready(ep)
+
+    def _correct(self, ep: Episode) -> None:
+        from transcript_corrector import correct_episode
+        correct_episode(ep.title, f"input/reference/{ep.title}.txt")
+
+    def _correct_when_ready(self, ep: Episode) -> None:
+        """Start the correct stage once transcribe and scrape are both finished (only once)."""
+        with self._lock:
+            states = (ep.status["transcribe"], ep.status["scrape"])
+            if ep.status["correct"] != "pending" or any(s in ("pending", "running") for s in states):
+                return
+            ready = all(s == "done" for s in states)
+            ep.status["correct"] = "queued" if ready else "skipped"
+        if ready:
+            self._run_stage(ep, "correct", lambda: self._correct(ep))
+        else:
+            self._set(ep, "correct", "skipped")
+
+    def _transcribe_stage(self, ep: Episode) -> None:
+        self._run_stage(ep, "transcribe", lambda: self._transcribe(ep))
+        self._correct_when_ready(ep)
+
+    def _download_stage(self, ep: Episode) -> None:
+        self._run_stage(ep, "download", lambda: self._download(ep))
+        self._transcribe_when_ready(ep)
+
+    def _scrape_stage(self, ep: Episode) -> None:
+        self._run_stage(ep, "scrape", lambda: self._scrape(ep))
+        self._transcribe_when_ready(ep)
+        self._correct_when_ready(ep)
+
+    # ---------- scheduler ----------
+
+    @property
+    def _chunked(self) -> bool:
+        return self.split_options.get("parallel_jobs", 1) > 1
+
+    def run(self) -> List[Episode]:
+        from whisper_audio_splitter import ensure_punkt
+        from whisper_worker import WhisperWorker
+
+        # 文分割モデルがないと全エピソードが文字起こしの後で失敗するので、先に確認する
+        if self.sentence_source == "whisper":
+            ensure_punkt()
+        local_workers = []
+        if self.remote_worker is None and not self._chunked:
+            local_workers = [WhisperWorker().start() for _ in range(self.whisper_jobs)]
+            for w in local_workers:
+                self._workers.put(w)
+        self._write_status()
+
+        try:
+            with ThreadPoolExecutor(self.downloads, thread_name_prefix="download") as download_pool, \
+                    ThreadPoolExecutor(self.whisper_jobs, thread_name_prefix="whisper") as whisper_pool, \
+                    ThreadPoolExecutor(self.browsers, thread_name_prefix="scrape") as scrape_pool:
+                # ダウンロード/字幕取得の完了側から Whisper のジョブを投入する
+                self._whisper_pool = whisper_pool
+                downloads = [download_pool.submit(self._download_stage, ep) for ep in self.episodes]
+                scrapes = [scrape_pool.submit(self._scrape_stage, ep) for ep in self.episodes]
+                # Whisper のジョブは上の2つからしか投入されないので、先にこれらを待ってから
+                # whisper_pool の終了（with を抜ける時）で残りの文字起こしを待つ
+                wait(downloads + scrapes)
+        finally:
+            for w in local_workers:
+                w.close()
+            self._drivers.close()
+
+        for title, report in self._reports.items():
+            report.write(f"output/{title}/profile.json")
+
+        done = sum(1 for ep in self.episodes if ep.ok)
+        print(f"📋 バッチ完了: {done}/{len(self.episodes)} エピソード成功 (状態: {self.status_file})")
+        return self.episodes
+
+
+def run_batch_from_config(manifest_path: str, config: configparser.ConfigParser,
+                          profile: bool = False) -> List[Episode]:
+    """Build a BatchPipeline from `[BATCH]` settings in config.ini and run it."""
+    from whisper_audio_splitter import sentence_source_from_config, split_options_from_config
+    from whisper_worker import worker_from_config
+
+    batch = config["BATCH"] if config.has_section("BATCH") else {}
+    pipeline = BatchPipeline(
+        load_manifest(manifest_path),
+        downloads=int(batch.get("downloads", 4)),
+        whisper_jobs=int(batch.get("whisper_jobs", 1)),
+        browsers=int(batch.get("browsers", 2)),
+        max_pages_per_browser=int(batch.get("max_pages_per_browser", 25)),
+        profile=profile,
+        status_file=batch.get("status_file", DEFAULT_STATUS_FILE),
+        remote_worker=worker_from_config(config),
+        sentence_source=sentence_source_from_config(config),
+        split_options=split_options_from_config(config),
+    )
+    return pipeline.run()
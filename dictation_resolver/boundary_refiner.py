@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import configparser
+from dataclasses import dataclass
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+
+@dataclass
+class ClipSettings:
+    """Cut-point refinement and padding, read from the `[CLIPS]` section of config.ini."""
+    refine: bool = True
+    tolerance_ms: int = 200        # 境界をこの範囲内で無音側へ寄せる
+    lead_silence_ms: int = 500     # 各クリップの先頭に足す無音
+    start_padding_ms: int = 50     # 寄せた開始位置よりさらに前に残す音
+    end_padding_ms: int = 150      # 寄せた終了位置よりさらに後に残す音
+    window_ms: int = 20            # RMS の窓
+    hop_ms: int = 5                # RMS の刻み（= 境界の分解能）
+
+    @classmethod
+    def from_config(cls, config: configparser.ConfigParser) -> "ClipSettings":
+        if not config.has_section("CLIPS"):
+            return cls()
+        section = config["CLIPS"]
+        defaults = cls()
+        return cls(
+            refine=section.getboolean("refine", defaults.refine),
+            tolerance_ms=section.getint("tolerance_ms", defaults.tolerance_ms),
+            lead_silence_ms=section.getint("lead_silence_ms", defaults.lead_silence_ms),
+            start_padding_ms=section.getint("start_padding_ms", defaults.start_padding_ms),
+            end_padding_ms=section.getint("end_padding_ms", defaults.end_padding_ms),
+            window_ms=section.getint("window_ms", defaults.window_ms),
+            hop_ms=section.getint("hop_ms", defaults.hop_ms),
+        )
+
+
+def frame_rms(samples: np.ndarray, sample_rate: int, window_ms: int = 20,
+              hop_ms: int = 5) -> Tuple[np.ndarray, float]:
+    """
+    Short-window RMS every hop_ms over the whole signal, without a Python loop:
+    energy is summed per hop-sized block, then window sums come from a cumulative
+    sum over the (few) blocks instead of over every sample.
+
+    Returns the RMS frames and the real hop in ms: the hop is a whole number of samples,
+    so at e.g. 44100 Hz 5 ms becomes 220 samples (4.989 ms).
+    """
+    hop = max(1, sample_rate * hop_ms // 1000)
+    real_hop_ms = hop * 1000 / sample_rate
+    blocks_per_window = max(1, round(window_ms / hop_ms))
+    n_blocks = len(samples) // hop
+    if n_blocks < blocks_per_window:
+        return np.zeros(1, dtype=np.float32), real_hop_ms
+    blocks = np.asarray(samples[:n_blocks * hop], dtype=np.float32).reshape(n_blocks, hop)
+    block_energy = np.einsum("ij,ij->i", blocks, blocks, dtype=np.float64)
+    power = np.concatenate(([0.0], np.cumsum(block_energy)))
+    energy = (power[blocks_per_window:] - power[:-blocks_per_window]) / (blocks_per_window * hop)
+    return np.sqrt(np.maximum(energy, 0.0)).astype(np.float32), real_hop_ms
+
+
+def silence_threshold(rms: np.ndarray) -> float:
+    """Energy below which a frame counts as a pause: a little above the noise floor."""
+    floor = float(np.percentile(rms, 10))
+    loud = float(np.percentile(rms, 90))
+    return floor + 0.1 * (loud - floor)
+
+
+def snap_to_silence(rms: np.ndarray, hop_ms: float, times_ms: Sequence[float], before_ms: int, after_ms: int,
+                    threshold: float, window_ms: int = 0) -> np.ndarray:
+    """
+    Move every time to the centre of the nearest frame below `threshold` within
+    [t - before_ms, t + after_ms]; if the window has no such frame, to its quietest frame.
+    All boundaries at once: the candidate frames form a (boundaries x window) matrix.
+    `hop_ms` is the real hop returned by frame_rms, `window_ms` the RMS window the frames
+    were measured over.
+    """
+    times = np.asarray(times_ms, dtype=np.float64)
+    if times.size == 0:
+        return times
+    # フレーム i は [i*hop, i*hop + window) なので、中心の時刻は i*hop + window/2（quietest_points と同じ）
+    offsets = np.arange(-int(before_ms // hop_ms), int(after_ms // hop_ms) + 1)
+    centers = np.rint((times - window_ms / 2) / hop_ms).astype(np.int64)
+    idx = np.clip(centers[:, None] + offsets[None, :], 0, len(rms) - 1)
+    values = rms[idx]
+
+    quiet = values <= threshold
+    distance = np.where(quiet, np.abs(offsets)[None, :], np.iinfo(np.int64).max)
+    nearest = np.argmin(distance, axis=1)
+    quietest = np.argmin(values, axis=1)
+    best = np.where(quiet.any(axis=1), nearest, quietest)
+    return idx[np.arange(len(idx)), best] * hop_ms + window_ms / 2
+
+
+def quietest_points(samples: np.ndarray, sample_rate: int, times_ms: Sequence[float], search_ms: int,
+                    window_ms: int = 150, hop_ms: int = 10) -> np.ndarray:
+    """
+    Move every time to the quietest point within ±search_ms, measured over a long window so
+    that a pause between sentences wins over a short gap between words. For boundaries that
+    are only known roughly (e.g. interpolated inside a subtitle line).
+    """
+    times = np.asarray(times_ms, dtype=np.float64)
+    if times.size == 0:
+        return times
+    rms, hop = frame_rms(samples, sample_rate, window_ms, hop_ms)
+    # フレーム i は [i*hop, i*hop + window) なので、中心の時刻は i*hop + window/2
+    offsets = np.arange(-int(search_ms // hop), int(search_ms // hop) + 1)
+    centers = np.rint((times - window_ms / 2) / hop).astype(np.int64)
+    idx = np.clip(centers[:, None] + offsets[None, :], 0, len(rms) - 1)
+    best = idx[np.arange(len(idx)), np.argmin(rms[idx], axis=1)]
+    return best * hop + window_ms / 2
+
+
+def refine_cut_points(samples: np.ndarray, sample_rate: int, starts_ms: Sequence[float], ends_ms: Sequence[float],
+                      settings: ClipSettings) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Snap sentence starts/ends (word timestamps, ms) into the pauses around them.
+
+    Starts may move mostly earlier and ends mostly later (a quarter of the tolerance the
+    other way), so a snapped point never lands deep inside the sentence's own words.
+    """
+    rms, hop_ms = frame_rms(samples, sample_rate, settings.window_ms, settings.hop_ms)
+    threshold = silence_threshold(rms)
+    tol = settings.tolerance_ms
+    starts = snap_to_silence(rms, hop_ms, starts_ms, tol, tol // 4, threshold, settings.window_ms)
+    ends = snap_to_silence(rms, hop_ms, ends_ms, tol // 4, tol, threshold, settings.window_ms)
+    return starts, ends
+
+
+def padded_ranges(starts_ms: Sequence[float], ends_ms: Sequence[float], settings: ClipSettings,
+                  duration_ms: float | None = None) -> List[Tuple[int, int]]:
+    """
+    Add start/end padding, without reaching into the neighbouring sentences
+    (a clip never starts before the previous sentence's end or ends after the next one's start).
+    """
+    starts = np.asarray(starts_ms, dtype=np.float64)
+    ends = np.asarray(ends_ms, dtype=np.float64)
+    if starts.size == 0:
+        return []
+    prev_end = np.concatenate(([0.0], ends[:-1]))
+    next_start = np.concatenate((starts[1:], [np.inf if duration_ms is None else duration_ms]))
+    # 文どうしが重なっている（対応付けの誤り等）ときは制限しない
+    lo = np.where(prev_end <= starts, prev_end, 0.0)
+    hi = np.where(next_start >= ends, next_start, np.inf)
+
+    padded_start = np.maximum(starts - settings.start_padding_ms, lo)
+    padded_end = np.minimum(ends + settings.end_padding_ms, hi)
+    if duration_ms is not None:
+        padded_end = np.minimum(padded_end, duration_ms)
+    padded_end = np.maximum(padded_end, padded_start + 1)
+    return [(int(s), int(e)) for s, e in zip(padded_start, padded_end)]
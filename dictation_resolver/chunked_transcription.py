@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import atexit
+import multiprocessing as mp
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import List, Sequence
+
+import numpy as np
+
+from boundary_refiner import frame_rms
+from whisper_worker import DEFAULT_MODEL, get_model, run_job
+
+WHISPER_SAMPLE_RATE = 16000
+DEFAULT_CHUNK_SECONDS = 120
+DEFAULT_OVERLAP_SECONDS = 1.0
+SEARCH_SECONDS = 15        # チャンク末尾のこの範囲で一番静かな所で切る
+
+
+@dataclass
+class Chunk:
+    index: int
+    start: float         # Whisper に渡す範囲（前後の重なりを含む, 秒）
+    end: float
+    core_start: float    # この範囲に中心がある単語だけを採用する
+    core_end: float
+
+
+def plan_chunks(samples: np.ndarray, sample_rate: int, max_seconds: float = DEFAULT_CHUNK_SECONDS,
+                overlap_seconds: float = DEFAULT_OVERLAP_SECONDS, search_seconds: float = SEARCH_SECONDS) -> List[Chunk]:
+    """
+    Split at the quietest point of the last `search_seconds` before every `max_seconds`,
+    so chunks stay bounded and cuts fall into pauses rather than words.
+    """
+    duration = len(samples) / sample_rate
+    rms, hop_ms = frame_rms(samples, sample_rate, window_ms=30, hop_ms=10)
+    frames_per_second = 1000 / hop_ms
+
+    cuts = [0.0]
+    while duration - cuts[-1] > max_seconds:
+        target = cuts[-1] + max_seconds
+        lo = int(max(cuts[-1] + 1.0, target - search_seconds) * frames_per_second)
+        hi = min(int(target * frames_per_second), len(rms))
+        cut = (lo + int(np.argmin(rms[lo:hi]))) / frames_per_second if hi > lo else target
+        cuts.append(cut)
+    cuts.append(duration)
+
+    chunks = []
+    for i in range(len(cuts) - 1):
+        core_start, core_end = cuts[i], cuts[i + 1]
+        last = i == len(cuts) - 2
+        chunks.append(Chunk(
+            i,
+            max(0.0, core_start - overlap_seconds),
+            min(duration, core_end + overlap_seconds),
+            core_start,
+            float("inf") if last else core_end,
+        ))
+    return chunks
+
+
+def merge_chunk_results(chunks: Sequence[Chunk], results: Sequence[dict]) -> dict:
+    """
+    Shift every word onto the global timeline and keep it only in the chunk whose core
+    contains its midpoint, so words heard twice in an overlap appear once.
+    """
+    segments = []
+    for chunk, result in zip(chunks, results):
+        for seg in result.get("segments", []):
+            words = []
+            for w in seg.get("words", []):
+                start, end = w["start"] + chunk.start, w["end"] + chunk.start
+                if chunk.core_start <= (start + end) / 2 < chunk.core_end:
+                    words.append({**w, "start": round(start, 3), "end": round(end, 3)})
+            if not words:
+                continue
+            segments.append({"id": len(segments), "start": words[0]["start"], "end": words[-1]["end"],
+                             "text": "".join(w["word"] for w in words), "words": words})
+    language = next((r.get("language") for r in results if r.get("language")), None)
+    return {"text": "".join(s["text"] for s in segments), "language": language, "segments": segments}
+
+
+def _init_worker(model_name: str, threads: int) -> None:
+    # コア数をワーカーで分け合う（各プロセスが全コアを使おうとすると逆に遅くなる）
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    get_model(model_name)
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(model_name: str, jobs: int) -> ProcessPoolExecutor:
+    """Process pool with `model_name` preloaded in every worker; kept for later episodes."""
+    with _pools_lock:
+        key = (model_name, jobs)
+        if key not in _pools:
+            threads = max(1, (os.cpu_count() or jobs) // jobs)
+            _pools[key] = ProcessPoolExecutor(max_workers=jobs, mp_context=mp.get_context("spawn"),
+                                              initializer=_init_worker, initargs=(model_name, threads))
+        return _pools[key]
+
+
+@atexit.register
+def shutdown_pools() -> None:
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.shutdown(cancel_futures=True)
+        _pools.clear()
+
+
+def transcribe_chunked(samples: np.ndarray, sample_rate: int, model_name: str = DEFAULT_MODEL,
+                       options: dict | None = None, jobs: int = 2, max_seconds: float = DEFAULT_CHUNK_SECONDS,
+                       overlap_seconds: float = DEFAULT_OVERLAP_SECONDS) -> dict:
+    """Transcribe 16 kHz mono samples chunk by chunk on `jobs` warm worker processes."""
+    if sample_rate != WHISPER_SAMPLE_RATE:
+        raise ValueError(f"Whisper expects {WHISPER_SAMPLE_RATE} Hz audio, got {sample_rate} Hz")
+    chunks = plan_chunks(samples, sample_rate, max_seconds, overlap_seconds)
+    print(f"🧩 {len(chunks)} チャンクに分割して {jobs} プロセスで文字起こし")
+    job_list = [{
+        "audio": np.ascontiguousarray(samples[int(c.start * sample_rate):int(c.end * sample_rate)], dtype=np.float32),
+        "model": model_name,
+        "options": options,
+    } for c in chunks]
+    results = list(get_pool(model_name, jobs).map(run_job, job_list))
+    return merge_chunk_results(chunks, results)
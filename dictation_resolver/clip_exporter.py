@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import os
+import subprocess
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, List, Sequence
+
+if TYPE_CHECKING:
+    from pydub import AudioSegment
+
+EXPORT_MODES = ("serial", "pool", "ffmpeg", "pack")
+DEFAULT_LEAD_SILENCE_MS = 500
+
+
+@dataclass
+class ClipSpec:
+    index: int
+    start_ms: int
+    end_ms: int
+    text: str = ""    # pack の索引に入れる文
+
+    @property
+    def filename(self) -> str:
+        return f"sentence_{self.index:03d}.mp3"
+
+
+def _encode_clip(raw: bytes, frame_rate: int, sample_width: int, channels: int,
+                 lead_silence_ms: int, out_path: str) -> str:
+    """Pool worker: rebuild the slice from raw PCM, prepend silence and encode to MP3."""
+    from pydub import AudioSegment
+    segment = AudioSegment(data=raw, sample_width=sample_width, frame_rate=frame_rate, channels=channels)
+    clip = AudioSegment.silent(duration=lead_silence_ms) + segment
+    clip.export(out_path, format="mp3")
+    return out_path
+
+
+def _export_serial(cut, clips: Sequence[ClipSpec], output_dir: str, lead_silence_ms: int) -> List[str]:
+    from pydub import AudioSegment
+    silence = AudioSegment.silent(duration=lead_silence_ms)
+    paths = []
+    for c in clips:
+        path = os.path.join(output_dir, c.filename)
+        (silence + cut(c.start_ms, c.end_ms)).export(path, format="mp3")
+        paths.append(path)
+    return paths
+
+
+def _export_pool(cut, clips: Sequence[ClipSpec], output_dir: str, lead_silence_ms: int,
+                 workers: int | None) -> List[str]:
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = []
+        for c in clips:
+            piece = cut(c.start_ms, c.end_ms)
+            futures.append(pool.submit(
+                _encode_clip, piece.raw_data, piece.frame_rate, piece.sample_width, piece.channels,
+                lead_silence_ms, os.path.join(output_dir, c.filename),
+            ))
+        return [f.result() for f in futures]
+
+
+def build_ffmpeg_filter(clips: Sequence[ClipSpec], lead_silence_ms: int) -> str:
+    """One filter graph that splits the decoded input into every clip (trim + leading silence)."""
+    labels = "".join(f"[s{i}]" for i in range(len(clips)))
+    parts = [f"[0:a]asplit={len(clips)}{labels}" if len(clips) > 1 else "[0:a]anull[s0]"]
+    for i, c in enumerate(clips):
+        parts.append(
+            f"[s{i}]atrim=start={c.start_ms / 1000:.3f}:end={c.end_ms / 1000:.3f},"
+            f"asetpts=PTS-STARTPTS,adelay={lead_silence_ms}:all=1,asetpts=N/SR/TB[o{i}]"
+        )
+    return ";\n".join(parts)
+
+
+def _export_ffmpeg(input_args: list, clips: Sequence[ClipSpec], output_dir: str, lead_silence_ms: int) -> List[str]:
+    paths = [os.path.join(output_dir, c.filename) for c in clips]
+    # 文が多いとコマンドラインが長くなるのでフィルタはファイル経由で渡す
+    with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False, encoding="utf-8") as f:
+        f.write(build_ffmpeg_filter(clips, lead_silence_ms))
+        filter_path = f.name
+    cmd = ["ffmpeg", "-y", "-hide_banner", "-loglevel", "error", *input_args,
+           "-filter_complex_script", filter_path]
+    for i, path in enumerate(paths):
+        cmd += ["-map", f"[o{i}]", "-c:a", "libmp3lame", "-f", "mp3", path]
+    try:
+        subprocess.run(cmd, check=True)
+    finally:
+        os.remove(filter_path)
+    return paths
+
+
+def export_clips(input_file: str, clips: Sequence[ClipSpec], output_dir: str, mode: str = "pool",
+                 lead_silence_ms: int = DEFAULT_LEAD_SILENCE_MS, workers: int | None = None,
+                 audio: AudioSegment | None = None, pcm=None) -> List[str]:
+    """
+    Write sentence_XXX.mp3 for every clip.
+
+      - serial: one pydub export after another (previous behaviour)
+      - pool:   the same pydub encode fanned out over a process pool (one worker per core)
+      - ffmpeg: all cut points in one filter graph, a single ffmpeg run writes every file
+      - pack:   no per-sentence files; one clips.mp3 + clips.json index (see clip_pack.py)
+
+    `audio` can be passed to reuse an already decoded AudioSegment (serial/pool only).
+    `pcm` (a pcm_audio.PcmAudio) slices the shared decoded buffer instead of decoding
+    input_file again; in ffmpeg mode its memmap file is read as raw f32le.
+    """
+    if mode not in EXPORT_MODES:
+        raise ValueError(f"unknown export mode: {mode} (choose from {', '.join(EXPORT_MODES)})")
+    if not clips:
+        return []
+    if mode == "pack":
+        from clip_pack import export_pack
+        return export_pack(input_file, clips, output_dir, lead_silence_ms, pcm=pcm)
+    if mode == "ffmpeg":
+        if pcm is not None and pcm.path is not None:
+            input_args = ["-f", "f32le", "-ar", str(pcm.sample_rate), "-ac", "1", "-i", pcm.path]
+        else:
+            input_args = ["-i", input_file]
+        return _export_ffmpeg(input_args, clips, output_dir, lead_silence_ms)
+
+    if pcm is not None:
+        cut = pcm.to_segment
+    else:
+        if audio is None:
+            from pydub import AudioSegment
+            audio = AudioSegment.from_file(input_file)
+        cut = lambda start_ms, end_ms: audio[start_ms:end_ms]
+    if mode == "pool":
+        return _export_pool(cut, clips, output_dir, lead_silence_ms, workers)
+    return _export_serial(cut, clips, output_dir, lead_silence_ms)
@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+import json
+import mmap
+import os
+import subprocess
+from typing import List, Sequence
+
+import numpy as np
+
+PACK_FILE = "clips.mp3"
+INDEX_FILE = "clips.json"
+PACK_VERSION = 1
+
+# 固定ビットレート (CBR) でパディングが入らない組み合わせなら、1 フレームが常に同じバイト数になる。
+# 24 kHz (MPEG-2 Layer III) 64 kbps mono なら 576 サンプル = 24 ms ごとに 192 バイト。
+# ビットリザーバを切るとフレーム同士が独立するので、フレーム境界でバイト列を切り出せばそのまま再生できる
+PACK_SAMPLE_RATE = 24000
+PACK_BITRATE = 64000
+# エンコーダ遅延（約 1100 サンプル）で文の末尾が次のフレームにずれ込むので、各文の後ろに無音フレームを置く
+GUARD_FRAMES = 2
+
+
+def frame_layout(sample_rate: int, bitrate: int) -> tuple:
+    """(samples, bytes) per MP3 frame; the byte count must not depend on the padding bit."""
+    samples = 1152 if sample_rate >= 32000 else 576      # MPEG-1 / MPEG-2
+    size, rem = divmod(samples // 8 * bitrate, sample_rate)
+    if rem:
+        raise ValueError(f"{bitrate} bps at {sample_rate} Hz gives frames of varying size")
+    return samples, size
+
+
+FRAME_SAMPLES, FRAME_BYTES = frame_layout(PACK_SAMPLE_RATE, PACK_BITRATE)
+
+
+def _frames_for(n_samples: int, samples_per_frame: int) -> int:
+    return -(-n_samples // samples_per_frame) + GUARD_FRAMES
+
+
+def _open_encoder(sample_rate: int, out_path: str) -> subprocess.Popen:
+    cmd = ["ffmpeg", "-y", "-hide_banner", "-loglevel", "error",
+           "-f", "f32le", "-ar", str(sample_rate), "-ac", "1", "-i", "pipe:0",
+           "-ar", str(PACK_SAMPLE_RATE), "-c:a", "libmp3lame", "-b:a", str(PACK_BITRATE), "-reservoir", "0",
+           "-write_xing", "0", "-id3v2_version", "0", "-f", "mp3", out_path]
+    return subprocess.Popen(cmd, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+
+
+def export_pack(input_file: str, clips: Sequence, output_dir: str, lead_silence_ms: int, pcm=None) -> List[str]:
+    """
+    Encode every clip (leading silence + sentence) into one MP3 and write an index of
+    byte/time offsets and text next to it; see ClipPack for reading a clip back.
+
+    Each clip is padded to whole MP3 frames, so a clip is a contiguous run of frames
+    and the encoder runs once per episode instead of once per sentence.
+    """
+    own_pcm = pcm is None or (pcm.sample_rate * FRAME_SAMPLES) % PACK_SAMPLE_RATE != 0
+    if own_pcm:
+        from pcm_audio import decode_audio
+        pcm = decode_audio(input_file, sample_rate=PACK_SAMPLE_RATE)
+    try:
+        sr = pcm.sample_rate
+        per_frame = sr * FRAME_SAMPLES // PACK_SAMPLE_RATE   # 入力側のサンプル数で 1 フレーム
+        lead = np.zeros(sr * lead_silence_ms // 1000, dtype=np.float32)
+
+        pack_path = os.path.join(output_dir, PACK_FILE)
+        tmp_path = pack_path + ".tmp"
+        entries = []
+        frame = 0
+        encoder = _open_encoder(sr, tmp_path)
+        try:
+            for c in clips:
+                audio = pcm.slice_ms(c.start_ms, c.end_ms).astype(np.float32, copy=False)
+                n_frames = _frames_for(len(lead) + len(audio), per_frame)
+                tail = np.zeros(n_frames * per_frame - len(lead) - len(audio), dtype=np.float32)
+                for part in (lead, audio, tail):
+                    encoder.stdin.write(part.tobytes())
+                entries.append({
+                    "index": c.index,
+                    "text": getattr(c, "text", ""),
+                    "start_ms": c.start_ms,
+                    "end_ms": c.end_ms,
+                    "offset": frame * FRAME_BYTES,
+                    "length": n_frames * FRAME_BYTES,
+                    "pack_start_ms": frame * FRAME_SAMPLES * 1000 // PACK_SAMPLE_RATE,
+                    "duration_ms": n_frames * FRAME_SAMPLES * 1000 // PACK_SAMPLE_RATE,
+                })
+                frame += n_frames
+            encoder.stdin.close()
+        except BrokenPipeError:
+            pass  # ffmpeg が先に終了した（理由は下で表示）
+        except BaseException:
+            encoder.kill()
+            encoder.wait()
+            raise
+        if encoder.wait() != 0:
+            raise RuntimeError(f"ffmpeg failed: {encoder.stderr.read().decode(errors='replace').strip()}")
+
+        # 最後にエンコーダのフラッシュ分のフレームが付くが、それより前の配置は固定のはず
+        size = os.path.getsize(tmp_path)
+        if size % FRAME_BYTES or size < frame * FRAME_BYTES:
+            os.remove(tmp_path)
+            raise RuntimeError(f"unexpected MP3 layout in {pack_path}: {size} bytes for {frame} frames")
+        os.replace(tmp_path, pack_path)
+
+        index_path = os.path.join(output_dir, INDEX_FILE)
+        with open(index_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "version": PACK_VERSION,
+                "audio": PACK_FILE,
+                "sample_rate": PACK_SAMPLE_RATE,
+                "bitrate": PACK_BITRATE,
+                "frame_bytes": FRAME_BYTES,
+                "frame_samples": FRAME_SAMPLES,
+                "lead_silence_ms": lead_silence_ms,
+                "clips": entries,
+            }, f, ensure_ascii=False, indent=1)
+        return [pack_path, index_path]
+    finally:
+        if own_pcm:
+            pcm.close()
+
+
+class ClipPack:
+    """
+    Read-only access to clips.mp3 / clips.json: any sentence comes back as the bytes of
+    a standalone MP3 (a slice of the memory-mapped file), nothing else is read or decoded.
+
+        with ClipPack("output/title") as pack:
+            data = pack.clip_bytes(12)    # sentence 012
+            pack.write_clip(12, "s12.mp3")
+    """
+
+    def __init__(self, directory: str):
+        with open(os.path.join(directory, INDEX_FILE), encoding="utf-8") as f:
+            self.index = json.load(f)
+        if self.index.get("version") != PACK_VERSION:
+            raise ValueError(f"unsupported clip pack version: {self.index.get('version')}")
+        self._by_index = {c["index"]: c for c in self.index["clips"]}
+        self._file = open(os.path.join(directory, self.index["audio"]), "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+    def close(self) -> None:
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+        self._file.close()
+
+    def __enter__(self) -> "ClipPack":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self._by_index)
+
+    def indices(self) -> List[int]:
+        return list(self._by_index)
+
+    def entry(self, index: int) -> dict:
+        """Index entry of sentence `index` (text, original start/end, byte and pack offsets)."""
+        try:
+            return self._by_index[index]
+        except KeyError:
+            raise IndexError(f"no clip {index} in pack") from None
+
+    def text(self, index: int) -> str:
+        return self.entry(index)["text"]
+
+    def clip_bytes(self, index: int) -> bytes:
+        e = self.entry(index)
+        return self._map[e["offset"]:e["offset"] + e["length"]]
+
+    def write_clip(self, index: int, path: str) -> str:
+        """Write one sentence as its own MP3 file (e.g. sentence_XXX.mp3 for another tool)."""
+        with open(path, "wb") as f:
+            f.write(self.clip_bytes(index))
+        return path
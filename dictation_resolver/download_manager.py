@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Iterable, List, Tuple
+
+import requests
+from urllib3.exceptions import HTTPError as Urllib3Error
+
+META_SUFFIX = ".meta.json"
+PART_SUFFIX = ".part"
+
+
+@dataclass
+class DownloadResult:
+    url: str
+    path: str
+    status: str         # "downloaded" | "resumed" | "not-modified"
+    bytes_received: int
+    size: int
+
+
+class DownloadError(Exception):
+    pass
+
+
+def _read_meta(path: str) -> dict:
+    try:
+        with open(path + META_SUFFIX, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def _write_meta(path: str, meta: dict) -> None:
+    tmp_path = path + META_SUFFIX + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path + META_SUFFIX)
+
+
+def _validators(response: requests.Response) -> dict:
+    return {"etag": response.headers.get("ETag"), "last_modified": response.headers.get("Last-Modified")}
+
+
+def _total_from_content_range(response: requests.Response) -> int | None:
+    """Full length from "Content-Range: bytes 0-99/1234" (or "bytes */1234"); None when it is "*"."""
+    total = response.headers.get("Content-Range", "").rsplit("/", 1)[-1].strip()
+    return int(total) if total.isdigit() else None
+
+
+class DownloadManager:
+    """
+    Streaming downloader on top of one shared requests.Session.
+
+      - the body is streamed in chunks to `<dest>.part` and renamed atomically when complete
+      - an interrupted `.part` is resumed with an HTTP Range request (If-Range guards against changes)
+      - ETag / Last-Modified are kept in `<dest>.meta.json`; an unchanged file costs one 304
+      - the final size is checked against Content-Length / Content-Range
+      - bodies are requested uncompressed; a gzip/deflate body is decoded before saving (and not resumed)
+    """
+
+    def __init__(self, session: requests.Session | None = None, max_workers: int = 4,
+                 timeout: Tuple[float, float] = (10, 60), retries: int = 3, chunk_size: int = 256 * 1024):
+        self.session = session or requests.Session()
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.retries = retries
+        self.chunk_size = chunk_size
+
+    def download(self, url: str, dest: str) -> DownloadResult:
+        """Download url to dest, retrying (and resuming) on network errors."""
+        os.makedirs(os.path.dirname(dest) or ".", exist_ok=True)
+        last_error = None
+        for attempt in range(self.retries + 1):
+            try:
+                return self._download_once(url, dest)
+            except (requests.RequestException, Urllib3Error, DownloadError) as e:
+                last_error = e
+                if attempt < self.retries:
+                    wait = 2 ** attempt
+                    print(f"🔁 再試行 {attempt + 1}/{self.retries} ({wait}s後): {e}")
+                    time.sleep(wait)
+        raise DownloadError(f"download failed after {self.retries + 1} attempts: {url}") from last_error
+
+    def download_many(self, items: Iterable[Tuple[str, str]]) -> List[DownloadResult | Exception]:
+        """Download (url, dest) pairs concurrently over the same connection pool."""
+        def one(item):
+            try:
+                return self.download(*item)
+            except DownloadError as e:
+                return e
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            return list(pool.map(one, items))
+
+    def _download_once(self, url: str, dest: str) -> DownloadResult:
+        meta = _read_meta(dest)
+        same_url = meta.get("url") == url
+        part_path = dest + PART_SUFFIX
+
+        # 圧縮されて届くと Range の位置がずれるので、そのままのバイト列を頼む
+        headers = {"Accept-Encoding": "identity"}
+
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) and same_url else 0
+        if offset and meta.get("resumable", True) and (meta.get("etag") or meta.get("last_modified")):
+            # 途中までのファイルがある → 続きから
+            headers["Range"] = f"bytes={offset}-"
+            headers["If-Range"] = meta.get("etag") or meta.get("last_modified")
+        else:
+            offset = 0
+            complete = same_url and meta.get("complete") and os.path.exists(dest)
+            if complete and os.path.getsize(dest) == meta.get("size"):
+                # 取得済み → 変更がなければ 304
+                if meta.get("etag"):
+                    headers["If-None-Match"] = meta["etag"]
+                if meta.get("last_modified"):
+                    headers["If-Modified-Since"] = meta["last_modified"]
+
+        with self.session.get(url, headers=headers, stream=True, timeout=self.timeout) as response:
+            if response.status_code == 304:
+                return DownloadResult(url, dest, "not-modified", 0, meta["size"])
+            if response.status_code == 416 and offset:
+                # .part がすでに最後まである（前回は名前を変える前に止まった）
+                if _total_from_content_range(response) == offset:
+                    return self._finish(url, dest, meta, response, "resumed", 0, offset)
+                os.remove(part_path)   # サーバー側のファイルの方が短い → 次の試行で最初から
+                raise DownloadError(f"range not satisfiable for {url} at {offset} bytes, restarting")
+            response.raise_for_status()
+
+            encoded = response.headers.get("Content-Encoding", "identity").lower() not in ("", "identity")
+            if response.status_code == 206:
+                total = _total_from_content_range(response)
+                mode, status = "ab", "resumed"
+            else:
+                # 200: Range が無視された / ファイルが変わった → 最初から
+                length = response.headers.get("Content-Length")
+                # 圧縮されて届いた場合 Content-Length は圧縮後の長さなので比べない（続きからも取れない）
+                total = int(length) if length is not None and not encoded else None
+                offset, mode, status = 0, "wb", "downloaded"
+                _write_meta(dest, {"url": url, **_validators(response), "size": total, "complete": False,
+                                   "resumable": not encoded})
+
+            received = 0
+            with open(part_path, mode) as f:
+                # identity ならそのまま、gzip/deflate で届いたら解いて保存する
+                for chunk in response.raw.stream(self.chunk_size, decode_content=True):
+                    f.write(chunk)
+                    received += len(chunk)
+
+        size = offset + received
+        if total is not None and size != total:
+            raise DownloadError(f"size mismatch for {url}: got {size} of {total} bytes")
+        return self._finish(url, dest, meta, response, status, received, size)
+
+    def _finish(self, url: str, dest: str, meta: dict, response: requests.Response, status: str, received: int,
+                size: int) -> DownloadResult:
+        os.replace(dest + PART_SUFFIX, dest)
+        validators = {k: v or meta.get(k) for k, v in _validators(response).items()}
+        _write_meta(dest, {"url": url, **validators, "size": size, "complete": True})
+        return DownloadResult(url, dest, status, received, size)
@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, List
+from urllib.parse import urlparse
+
+from selenium.common.exceptions import WebDriverException
+
+
+def _default_factory(headless: bool):
+    from subtitle_extractor import setup_chrome_driver
+    return setup_chrome_driver(headless=headless)
+
+
+def site_of(url: str) -> str:
+    """Registrable-ish site key for consent state (learngerman.dw.com -> dw.com)."""
+    host = urlparse(url).hostname or ""
+    return ".".join(host.split(".")[-2:])
+
+
+class DriverPool:
+    """
+    Pool of reusable Chrome WebDriver sessions shared by the downloader and the extractor.
+
+      - at most `size` browsers exist at once; borrow() blocks until one is free
+      - a borrowed driver is health-checked first and replaced if it stopped responding
+      - each driver is recycled (quit + recreated) after `max_pages` borrows
+      - cookies saved after a consent click are injected into every driver (new ones, and
+        pooled ones the next time they are borrowed), so the consent banner is handled
+        once per site, not once per page
+    """
+
+    def __init__(self, size: int = 2, max_pages: int = 25, headless: bool = True,
+                 factory: Callable[[], object] | None = None):
+        self.size = size
+        self.max_pages = max_pages
+        self.factory = factory or (lambda: _default_factory(headless))
+        self._idle: List = []
+        self._pages: Dict[int, int] = {}
+        self._consent: Dict[str, List[dict]] = {}
+        self._consent_version = 0
+        self._consent_seen: Dict[int, int] = {}   # ドライバごとに、どの版の Cookie まで入れたか
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._closed = False
+
+    # ---------- lifecycle ----------
+
+    def _create(self):
+        driver = self.factory()
+        with self._lock:
+            self._pages[id(driver)] = 0
+        self._sync_consent(driver)
+        return driver
+
+    def _discard(self, driver) -> None:
+        with self._lock:
+            self._pages.pop(id(driver), None)
+            self._consent_seen.pop(id(driver), None)
+        try:
+            driver.quit()
+        except WebDriverException:
+            pass
+
+    @staticmethod
+    def is_healthy(driver) -> bool:
+        try:
+            return driver.execute_script("return 1;") == 1
+        except WebDriverException:
+            return False
+
+    def _acquire(self):
+        while True:
+            with self._lock:
+                driver = self._idle.pop() if self._idle else None
+            if driver is None:
+                return self._create()
+            if self.is_healthy(driver):
+                # 貸し出し中に同意した Cookie があれば、このドライバにも入れる
+                self._sync_consent(driver)
+                return driver
+            self._discard(driver)
+
+    def _release(self, driver, broken: bool) -> None:
+        with self._lock:
+            pages = self._pages[id(driver)] = self._pages.get(id(driver), 0) + 1
+        if broken or self._closed or pages >= self.max_pages:
+            self._discard(driver)
+            return
+        try:
+            driver.get("about:blank")  # 前のページの JS を止めておく
+        except WebDriverException:
+            self._discard(driver)
+            return
+        with self._lock:
+            self._idle.append(driver)
+
+    @contextmanager
+    def borrow(self):
+        """Lend a driver for one page; it goes back to the pool afterwards."""
+        if self._closed:
+            raise RuntimeError("DriverPool is closed")
+        self._slots.acquire()
+        driver = None
+        broken = False
+        try:
+            driver = self._acquire()
+            yield driver
+        except WebDriverException:
+            broken = True
+            raise
+        finally:
+            if driver is not None:
+                self._release(driver, broken)
+            self._slots.release()
+
+    def close(self) -> None:
+        self._closed = True
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for driver in idle:
+            self._discard(driver)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    # ---------- consent cookies ----------
+
+    def has_consent(self, url: str) -> bool:
+        with self._lock:
+            return site_of(url) in self._consent
+
+    def record_consent(self, driver, url: str) -> None:
+        """Remember the cookies set by a consent click so new drivers start with them."""
+        try:
+            cookies = driver.get_cookies()
+        except WebDriverException:
+            return
+        with self._lock:
+            self._consent[site_of(url)] = cookies
+            self._consent_version += 1
+            # 同意したドライバ自身はもう Cookie を持っている
+            if self._consent_seen.get(id(driver)) == self._consent_version - 1:
+                self._consent_seen[id(driver)] = self._consent_version
+
+    def _sync_consent(self, driver) -> None:
+        """Inject the consent cookies recorded since this driver last got them."""
+        with self._lock:
+            if self._consent_seen.get(id(driver)) == self._consent_version:
+                return
+            self._consent_seen[id(driver)] = self._consent_version
+            consent = list(self._consent.values())
+        for cookies in consent:
+            self._inject_cookies(driver, cookies)
+
+    @staticmethod
+    def _inject_cookies(driver, cookies: List[dict]) -> None:
+        # CDP なら対象ドメインを開かずに Cookie を設定できる
+        for c in cookies:
+            params = {k: c[k] for k in ("name", "value", "domain", "path", "secure", "httpOnly", "sameSite") if k in c}
+            if "expiry" in c:
+                params["expires"] = c["expiry"]
+            try:
+                driver.execute_cdp_cmd("Network.setCookie", params)
+            except (WebDriverException, AttributeError):
+                return
@@ -1,26 +1,129 @@
+from __future__ import annotations
+
+import argparse
 import configparser
+import os
+from contextlib import contextmanager
 
-from audio_downloader import download_topthema_audio
-from whisper_audio_splitter import split_audio_and_generate_transcript
-from subtitle_extractor import fetch_topthema_transcript
+import profiling
 
+# 重い依存（selenium, pydub, nltk, numpy, whisper/torch）は必要なステージの中でだけ import する
+COMMANDS = ("download", "transcribe", "scrape", "all")
+REFERENCE_FILE = "input/reference.txt"
 
-def get_top_thema_material(title_: str, url_: str):
-    # 1. Top Thema の音声をダウンロード
-    download_topthema_audio(title_, url_)
 
-    # 2. Whisper を使って音声をチャンクに分割し、スクリプトと音声ファイルを保存
-    split_audio_and_generate_transcript(title_)
+def download_stage(title_: str, url_: str):
+    """Download input/audio/{title}.mp3 (selenium is only loaded if the HTTP lookup fails)."""
+    from audio_downloader import download_topthema_audio
+    return download_topthema_audio(title_, url_)
+
 
-    # 3. DW サイトから字幕スクリプトを抽出して reference.txt に保存
+def scrape_stage(url_: str) -> None:
+    """Save the official transcript to input/reference.txt (headless Chrome)."""
+    from subtitle_extractor import fetch_topthema_transcript
     fetch_topthema_transcript(url_)
 
 
+def transcribe_stage(title_: str, worker=None, sentence_source: str = "whisper",
+                     split_options: dict | None = None, correct: bool = True) -> None:
+    """Transcribe and cut input/audio/{title}.mp3; then correct the script against input/reference.txt if present."""
+    from whisper_audio_splitter import split_audio_and_generate_transcript
+
+    reference = None
+    if sentence_source == "reference":
+        if not os.path.exists(REFERENCE_FILE):
+            raise SystemExit(f"❌ {REFERENCE_FILE} がありません。先に `python main.py scrape` を実行してください")
+        reference = REFERENCE_FILE
+    split_audio_and_generate_transcript(title_, worker=worker, reference_file=reference, **(split_options or {}))
+
+    if correct and os.path.exists(REFERENCE_FILE):
+        from transcript_corrector import correct_episode
+        correct_episode(title_, REFERENCE_FILE)
+
+
+def get_top_thema_material(title_: str, url_: str, worker=None, sentence_source: str = "whisper",
+                           split_options: dict | None = None):
+    # 1. Top Thema の音声をダウンロード
+    download_stage(title_, url_)
+
+    if sentence_source == "reference":
+        # 公式スクリプトの文で区切るので、先に字幕を取得する
+        scrape_stage(url_)
+        transcribe_stage(title_, worker, sentence_source, split_options, correct=False)
+    else:
+        # 2. Whisper を使って音声をチャンクに分割し、スクリプトと音声ファイルを保存
+        transcribe_stage(title_, worker, sentence_source, split_options, correct=False)
+
+        # 3. DW サイトから字幕スクリプトを抽出して reference.txt に保存
+        scrape_stage(url_)
+
+    # 4. Whisper のスクリプトを公式スクリプトと突き合わせて修正（タイムスタンプは Whisper のまま）
+    from transcript_corrector import correct_episode
+    correct_episode(title_, REFERENCE_FILE)
+
+
+@contextmanager
+def whisper_worker_for(config: configparser.ConfigParser, split_options: dict):
+    """
+    Yield the resident worker from config.ini, or a child-process worker for this run.
+    Yields None when parallel_jobs > 1 (the chunked mode brings its own process pool).
+    """
+    from whisper_worker import WhisperWorker, worker_from_config
+
+    # 常駐ワーカー (`python whisper_worker.py`) があれば使い、なければ子プロセスで起動する
+    remote = worker_from_config(config)
+    if remote is not None or split_options["parallel_jobs"] > 1:
+        yield remote
+        return
+    with profiling.span("whisper_worker_startup"):
+        local_worker = WhisperWorker().start()
+    try:
+        yield local_worker
+    finally:
+        local_worker.close()
+
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Top Thema のディクテーション教材を作成")
+    parser.add_argument("command", nargs="?", choices=COMMANDS, default="all",
+                        help="download: 音声のみ / transcribe: 文字起こしと切り出し / scrape: 公式スクリプトのみ / "
+                             "all: すべて（既定）")
+    parser.add_argument("--batch", metavar="MANIFEST",
+                        help="複数エピソードをまとめて処理（セクション名=タイトル, url=... の ini ファイル）")
+    parser.add_argument("--profile", action="store_true",
+                        help="cProfile の結果も output/{title}/ に保存する（計測レポート profile.json は常に出力）")
+    args = parser.parse_args()
+
     # read config
     config = configparser.ConfigParser()
     config.read('config.ini')
+
+    if args.batch:
+        from batch_pipeline import run_batch_from_config
+        episodes = run_batch_from_config(args.batch, config, profile=args.profile)
+        raise SystemExit(0 if all(ep.ok for ep in episodes) else 1)
+
     title = config['TOP_THEMA']['title']
     url = config['TOP_THEMA']['url']
 
-    get_top_thema_material(title, url)
+    # ステージ単体の実行では all の計測結果を上書きしない
+    suffix = "" if args.command == "all" else f"_{args.command}"
+    report_path = f"output/{title}/profile{suffix}.json"
+    cprofile_path = f"output/{title}/profile{suffix}.pstats" if args.profile else None
+    with profiling.profile_episode(title, report_path, cprofile_path):
+        if args.command == "download":
+            download_stage(title, url)
+        elif args.command == "scrape":
+            scrape_stage(url)
+        else:
+            from whisper_audio_splitter import ensure_punkt, sentence_source_from_config, split_options_from_config
+            sentence_source = sentence_source_from_config(config)
+            if sentence_source == "whisper":
+                ensure_punkt()  # ダウンロードやモデル読み込みの前に確認する
+            split_options = split_options_from_config(config)
+            with whisper_worker_for(config, split_options) as worker:
+                if args.command == "transcribe":
+                    transcribe_stage(title, worker, sentence_source, split_options)
+                else:
+                    get_top_thema_material(title, url, worker=worker, sentence_source=sentence_source,
+                                           split_options=split_options)
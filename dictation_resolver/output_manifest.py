@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import tempfile
+import sys
+from typing import Dict, Iterator, List, Tuple
+
+MANIFEST_FILE = "manifest.json"
+MANIFEST_VERSION = 1
+# 出力フォルダのうち、このモジュールが管理する（古くなったら消してよい）ファイル
+MANAGED_FILE_PATTERN = re.compile(r"sentence_\d{3,}\.mp3|clips\.mp3|clips\.json")
+
+# 同じ区間でも書き出し方が違えば別の音声になる（serial と pool は同じ pydub のエンコード）
+ENCODERS = {"serial": "pydub", "pool": "pydub", "ffmpeg": "ffmpeg-filter", "pack": "pack"}
+CLIP_PATTERN = re.compile(r"sentence_(\d{3,})\.mp3")
+# 以前の add_todo_for_notion が script.txt に直接付けていた「- [ ] 12. 」（二重に付いたものも）
+CHECKBOX_PREFIX = re.compile(r"^(?:- \[[ xX]\] \d+\.\s*)+")
+
+
+def atomic_write_text(path: str, text: str) -> None:
+    """Write via a temp file in the same directory + rename, so readers never see half a file."""
+    fd, tmp = tempfile.mkstemp(prefix=".tmp-", dir=os.path.dirname(path) or ".")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp, path)
+    except BaseException:
+        os.remove(tmp)
+        raise
+
+
+def text_sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def clip_fingerprint(source_sha: str, start_ms: int, end_ms: int, lead_silence_ms: int, encoder: str,
+                     decode: str) -> str:
+    """Everything that determines a clip's audio: source content, cut range, padding, encoder and decode path."""
+    payload = json.dumps([source_sha, start_ms, end_ms, lead_silence_ms, encoder, decode])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:20]
+
+
+class OutputManifest:
+    """
+    output/{title}/manifest.json: the fingerprint of every exported clip and the hash of the
+    script.txt that was last written, so a re-split only re-encodes what changed and can
+    tell a hand-edited script.txt from its own.
+    """
+
+    def __init__(self, output_dir: str):
+        self.path = os.path.join(output_dir, MANIFEST_FILE)
+        self.clips: Dict[str, dict] = {}
+        self.script_sha: str | None = None
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return   # 初回 or 壊れている → 全部書き出し直す
+        if data.get("version") == MANIFEST_VERSION:
+            self.clips = data.get("clips", {})
+            self.script_sha = data.get("script_sha256")
+
+    def is_current(self, filename: str, fingerprint: str, output_dir: str) -> bool:
+        entry = self.clips.get(filename)
+        return (entry is not None and entry.get("fingerprint") == fingerprint
+                and os.path.exists(os.path.join(output_dir, filename)))
+
+    def save(self) -> None:
+        atomic_write_text(self.path, json.dumps({
+            "version": MANIFEST_VERSION,
+            "script_sha256": self.script_sha,
+            "clips": self.clips,
+        }, ensure_ascii=False, indent=1))
+
+
+# ---------- 出力の読み込み（チェックリストの書き出しと単語索引で共通） ----------
+
+def iter_script_sentences(script_path: str) -> Iterator[Tuple[int, str]]:
+    """(number from 1, sentence) for each non-empty line, read line by line; old checkbox prefixes are dropped."""
+    with open(script_path, encoding="utf-8") as f:
+        number = 0
+        for line in f:
+            text = CHECKBOX_PREFIX.sub("", line.strip())
+            if text:
+                number += 1
+                yield number, text
+
+
+def episode_clips(output_dir: str) -> List[str] | None:
+    """Clips of output/{title} in sentence order, from the split's manifest.json / clips.json; None without either."""
+    from clip_pack import INDEX_FILE, PACK_FILE
+    try:
+        with open(os.path.join(output_dir, INDEX_FILE), encoding="utf-8") as f:
+            pack = json.load(f)
+        return [f"{os.path.join(output_dir, PACK_FILE)}#{c['index']}" for c in pack["clips"]]
+    except (FileNotFoundError, ValueError, KeyError):
+        pass
+    try:
+        with open(os.path.join(output_dir, MANIFEST_FILE), encoding="utf-8") as f:
+            clips = json.load(f).get("clips", {})
+    except (FileNotFoundError, ValueError):
+        return None
+    return [os.path.join(output_dir, name) for name in clips if CLIP_PATTERN.fullmatch(name)]
+
+
+def sentence_clips(output_dir: str, count: int) -> List[str] | None:
+    """
+    Clip of each of the `count` sentences of script.txt (see iter_script_sentences): sentence N
+    is the N-th clip. None without clips, or when the counts differ (script.txt edited by hand)
+    and the pairing would be off.
+    """
+    clips = episode_clips(output_dir)
+    if clips is not None and len(clips) != count:
+        title = os.path.basename(os.path.normpath(output_dir))
+        print(f"⚠️ [{title}] script.txt の行数と音声の数が違うので、音声は付けません", file=sys.stderr)
+        return None
+    return clips
@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import os
+import subprocess
+import tempfile
+from dataclasses import dataclass
+
+import numpy as np
+
+WHISPER_SAMPLE_RATE = 16000
+# 共有デコードなしでクリップを切り出す時のサンプルレート（16 kHz より音質を落とさない）
+CLIP_SAMPLE_RATE = 44100
+_READ_CHUNK = 1 << 20  # 1 MB (ffmpeg の出力を読む単位)
+
+
+@dataclass
+class PcmAudio:
+    """Mono float32 PCM decoded once and shared by Whisper and the clip exporter."""
+    samples: np.ndarray
+    sample_rate: int
+    path: str | None = None  # memmap の場合、裏付けの raw f32le ファイル
+
+    @property
+    def duration_ms(self) -> int:
+        return int(len(self.samples) * 1000 / self.sample_rate)
+
+    def slice_ms(self, start_ms: int, end_ms: int) -> np.ndarray:
+        """Zero-copy view of [start_ms, end_ms)."""
+        start = max(0, start_ms * self.sample_rate // 1000)
+        end = min(len(self.samples), end_ms * self.sample_rate // 1000)
+        return self.samples[start:end]
+
+    def to_segment(self, start_ms: int, end_ms: int):
+        """Wrap a slice as a pydub AudioSegment (only the slice is converted to 16-bit)."""
+        from pydub import AudioSegment
+        pcm16 = (np.clip(self.slice_ms(start_ms, end_ms), -1.0, 1.0) * 32767).astype("<i2")
+        return AudioSegment(data=pcm16.tobytes(), sample_width=2, frame_rate=self.sample_rate, channels=1)
+
+    def descriptor(self) -> dict | None:
+        """Picklable reference to the memmap file, so another process can map it without copying."""
+        if self.path is None:
+            return None
+        return {"pcm": self.path, "sample_rate": self.sample_rate, "samples": len(self.samples)}
+
+    def close(self) -> None:
+        if self.path is not None:
+            self.samples = np.zeros(0, dtype=np.float32)
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+            self.path = None
+
+
+def open_descriptor(desc: dict) -> np.ndarray:
+    """Map the PCM file described by PcmAudio.descriptor() read-only."""
+    return np.memmap(desc["pcm"], dtype=np.float32, mode="r", shape=(desc["samples"],))
+
+
+def _ffmpeg_decode_cmd(path: str, sample_rate: int) -> list:
+    # whisper.audio.load_audio と同じ変換（mono / 16bit / 指定サンプルレート）
+    return ["ffmpeg", "-nostdin", "-loglevel", "error", "-threads", "0", "-i", path,
+            "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(sample_rate), "-"]
+
+
+def decode_audio(path: str, sample_rate: int = WHISPER_SAMPLE_RATE, use_mmap: bool = False,
+                 tmp_dir: str | None = None) -> PcmAudio:
+    """
+    Decode any audio file once into mono float32 PCM.
+
+    With use_mmap=True the samples are streamed into a temp file and memory-mapped,
+    so peak RSS stays small and other processes (the Whisper worker) can share them.
+    """
+    proc = subprocess.Popen(_ffmpeg_decode_cmd(path, sample_rate), stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if not use_mmap:
+        out, err = proc.communicate()
+        if proc.returncode != 0:
+            raise RuntimeError(f"Failed to decode audio: {err.decode(errors='replace')}")
+        samples = np.frombuffer(out, np.int16).flatten().astype(np.float32) / 32768.0
+        return PcmAudio(samples, sample_rate)
+
+    fd, pcm_path = tempfile.mkstemp(suffix=".f32", dir=tmp_dir)
+    count = 0
+    try:
+        with os.fdopen(fd, "wb") as f:
+            pending = b""
+            for chunk in iter(lambda: proc.stdout.read(_READ_CHUNK), b""):
+                chunk = pending + chunk
+                usable = len(chunk) - len(chunk) % 2
+                pending = chunk[usable:]
+                block = np.frombuffer(chunk[:usable], np.int16).astype(np.float32) / 32768.0
+                f.write(block.tobytes())
+                count += len(block)
+        err = proc.stderr.read()
+        if proc.wait() != 0:
+            raise RuntimeError(f"Failed to decode audio: {err.decode(errors='replace')}")
+    except BaseException:
+        proc.kill()
+        os.remove(pcm_path)
+        raise
+    samples = np.memmap(pcm_path, dtype=np.float32, mode="r", shape=(count,)) if count else np.zeros(0, np.float32)
+    return PcmAudio(samples, sample_rate, pcm_path)
@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import cProfile
+import json
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List
+
+# 現在のレポートと、その中で開いている span（スレッド/コンテキストごと）
+_report: ContextVar["Report | None"] = ContextVar("profiling_report", default=None)
+_span: ContextVar["Span | None"] = ContextVar("profiling_span", default=None)
+
+
+class Span:
+    def __init__(self, name: str, origin: float):
+        self.name = name
+        self.start = time.perf_counter() - origin
+        self.seconds: float | None = None
+        self.counters: Counter = Counter()
+        self.children: List[Span] = []
+
+    def to_dict(self) -> dict:
+        d = {"name": self.name, "start": round(self.start, 4), "seconds": None if self.seconds is None else round(self.seconds, 4)}
+        if self.counters:
+            d["counters"] = {k: round(v, 4) if isinstance(v, float) else v for k, v in self.counters.items()}
+        if self.children:
+            d["children"] = [c.to_dict() for c in self.children]
+        return d
+
+
+class Report:
+    """Timing report for one episode: a tree of spans plus counters (totals and per span)."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.origin = time.perf_counter()
+        self.root = Span(name, self.origin)
+        self.counters: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def add_span(self, parent: Span | None, name: str) -> Span:
+        span = Span(name, self.origin)
+        with self._lock:
+            (parent or self.root).children.append(span)
+        return span
+
+    def count(self, span: Span | None, name: str, n: float) -> None:
+        with self._lock:
+            self.counters[name] += n
+            if span is not None:
+                span.counters[name] += n
+
+    @contextmanager
+    def attach(self):
+        """Make this report current in the calling thread (e.g. inside a thread pool task)."""
+        token_r = _report.set(self)
+        token_s = _span.set(self.root)
+        try:
+            yield self
+        finally:
+            _span.reset(token_s)
+            _report.reset(token_r)
+
+    def to_dict(self) -> dict:
+        self.root.seconds = time.perf_counter() - self.origin
+        return {
+            "name": self.name,
+            "seconds": round(self.root.seconds, 4),
+            "counters": {k: round(v, 4) if isinstance(v, float) else v for k, v in self.counters.items()},
+            "spans": [c.to_dict() for c in self.root.children],
+        }
+
+    def write(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._lock:
+            data = self.to_dict()
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+
+
+@contextmanager
+def profile_episode(name: str, report_path: str | None = None, cprofile_path: str | None = None):
+    """
+    Collect spans/counters for one episode; write the JSON report (and a cProfile dump) on exit.
+    """
+    report = Report(name)
+    profiler = cProfile.Profile() if cprofile_path else None
+    with report.attach():
+        if profiler:
+            profiler.enable()
+        try:
+            yield report
+        finally:
+            if profiler:
+                profiler.disable()
+                os.makedirs(os.path.dirname(cprofile_path) or ".", exist_ok=True)
+                profiler.dump_stats(cprofile_path)
+            if report_path:
+                report.write(report_path)
+                print(f"⏱️ 計測結果: {report_path}")
+
+
+@contextmanager
+def span(name: str):
+    """Time a block as a child of the current span; a no-op when no report is active."""
+    report = _report.get()
+    if report is None:
+        yield
+        return
+    current = report.add_span(_span.get(), name)
+    token = _span.set(current)
+    start = time.perf_counter()
+    try:
+        yield current
+    finally:
+        current.seconds = time.perf_counter() - start
+        _span.reset(token)
+
+
+def count(name: str, n: float = 1) -> None:
+    """Add to a counter of the current report (and the innermost span)."""
+    report = _report.get()
+    if report is not None:
+        report.count(_span.get(), name, n)
+
+
+def sleep(seconds: float) -> None:
+    """time.sleep that is accounted as `sleep_seconds`."""
+    count("sleep_seconds", seconds)
+    time.sleep(seconds)
+
+
+def current_report() -> Report | None:
+    return _report.get()
+
+
+def instrument_driver(driver):
+    """Count every WebDriver command (one HTTP round trip to chromedriver) as `webdriver_round_trips`."""
+    if getattr(driver, "_profiling_instrumented", False):
+        return driver
+    execute = driver.execute
+
+    def counted_execute(driver_command, params=None):
+        count("webdriver_round_trips")
+        return execute(driver_command, params)
+
+    driver.execute = counted_execute
+    driver._profiling_instrumented = True
+    return driver
@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import re
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+from typing import List, Optional, Sequence
+
+_WS = re.compile(r"\s+")
+
+
+@dataclass
+class AlignedSentence:
+    index: int
+    text: str
+    first_word: Optional[int]   # 先頭単語の index（対応なしなら None）
+    last_word: Optional[int]    # 末尾単語の index（inclusive）
+    start: Optional[float]      # 秒
+    end: Optional[float]        # 秒
+    confidence: float           # 0.0 - 1.0
+
+
+class WordOffsetIndex:
+    """
+    Character-offset index over the concatenated word stream.
+
+    Whitespace is dropped before indexing, so sentence spans match even when the
+    tokenizer re-spaces the text (e.g. " z. B." vs "z.B.").
+    """
+
+    def __init__(self, words: Sequence[dict]):
+        self.words = words
+        pieces = []
+        self.offsets: List[int] = []
+        pos = 0
+        for w in words:
+            piece = _WS.sub("", w["word"])
+            self.offsets.append(pos)
+            pieces.append(piece)
+            pos += len(piece)
+        self.text = "".join(pieces)
+
+    def word_range(self, char_start: int, char_end: int) -> tuple[int, int] | None:
+        """Map a half-open character span to an inclusive (first, last) word range."""
+        if char_end <= char_start or not self.offsets:
+            return None
+        first = max(bisect_right(self.offsets, char_start) - 1, 0)
+        last = bisect_left(self.offsets, char_end) - 1
+        if last < first:
+            return None
+        return first, last
+
+
+def _positional_match_ratio(a: str, b: str) -> float:
+    if not a:
+        return 0.0
+    same = sum(1 for x, y in zip(a, b) if x == y)
+    return same / len(a)
+
+
+def align_sentences(words: Sequence[dict], sentences: Sequence[str], search_slack: int = 64) -> List[AlignedSentence]:
+    """
+    Map each sentence onto the Whisper word timeline in one forward pass.
+
+    Each sentence is looked up only in a window just after the previous match, so the
+    total work is O(words + sentences) character comparisons plus one bisection per
+    sentence. Confidence is 1.0 for an exact contiguous match; it drops when characters
+    had to be skipped, or when no exact match was found and the span was assumed.
+    """
+    index = WordOffsetIndex(words)
+    stream = index.text
+    cursor = 0
+    aligned: List[AlignedSentence] = []
+
+    for i, sentence in enumerate(sentences):
+        needle = _WS.sub("", sentence)
+        if not needle or cursor >= len(stream):
+            aligned.append(AlignedSentence(i, sentence, None, None, None, None, 0.0))
+            continue
+
+        window_end = min(len(stream), cursor + 2 * len(needle) + search_slack)
+        pos = stream.find(needle, cursor, window_end)
+        if pos >= 0:
+            span_start, span_end = pos, pos + len(needle)
+            confidence = len(needle) / (len(needle) + (pos - cursor))
+        else:
+            # 完全一致しない（トークナイズで文字が変わった等）→ 同じ長さだけ進めたとみなす
+            span_start, span_end = cursor, min(len(stream), cursor + len(needle))
+            confidence = _positional_match_ratio(needle, stream[span_start:span_end])
+        cursor = span_end
+
+        rng = index.word_range(span_start, span_end)
+        if rng is None:
+            aligned.append(AlignedSentence(i, sentence, None, None, None, None, 0.0))
+            continue
+        first, last = rng
+        aligned.append(AlignedSentence(
+            i, sentence, first, last, words[first]["start"], words[last]["end"], round(confidence, 3)
+        ))
+    return aligned
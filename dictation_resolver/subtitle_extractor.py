@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import argparse
 import configparser
 import re
 from typing import List
@@ -14,6 +15,8 @@ from selenium.webdriver.common.action_chains import ActionChains
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.ui import WebDriverWait
 
+import profiling
+
 RICH_CONTAINER_SEL = "div.richtext-content-container"
 PARAGRAPH_SEL = f"{RICH_CONTAINER_SEL} p"
 
@@ -37,7 +40,9 @@ def setup_chrome_driver(headless: bool = True) -> webdriver.Chrome:
     # slightly reduce automation fingerprints
     options.add_experimental_option("excludeSwitches", ["enable-automation"])
     options.add_experimental_option("useAutomationExtension", False)
-    return webdriver.Chrome(options=options)
+    with profiling.span("browser_startup"):
+        driver = webdriver.Chrome(options=options)
+    return profiling.instrument_driver(driver)
 
 
 def normalize_text(s: str) -> str:
@@ -88,7 +93,7 @@ def _try_click_element(el):
     """Helper function to attempt clicking an element"""
     try:
         el.click()
-        time.sleep(0.2)
+        profiling.sleep(0.2)
         return True
     except (ElementClickInterceptedException, ElementNotInteractableException, WebDriverException):
         return False
@@ -104,7 +109,7 @@ def try_reveal_buttons(driver: webdriver.Chrome) -> int:
                 if b.is_displayed():
                     try:
                         b.click()
-                        time.sleep(0.2)
+                        profiling.sleep(0.2)
                         clicks += 1
                     except (ElementClickInterceptedException, ElementNotInteractableException, WebDriverException):
                         continue
@@ -182,7 +187,7 @@ def ensure_paragraph_filled(
         if stable >= 2:
             break
 
-        time.sleep(poll)
+        profiling.sleep(poll)
 
 
 def extract_paragraph_texts(driver: webdriver.Chrome) -> List[str]:
@@ -378,106 +383,280 @@ def accept_cookies_and_reload(driver, url: str, pause: float = 0.3) -> bool:
         clicked = True
 
     if clicked:
-        time.sleep(pause)
+        profiling.sleep(pause)
         try:
             driver.get(url)   # refresh by reloading the same URL (より確実)
         except WebDriverException:
             pass
-        time.sleep(pause)
+        profiling.sleep(pause)
     return clicked
 
+# ---------- in-page extraction (single execute_async_script) ----------
+
+REVEAL_KEYWORDS = ["lösung", "lösungen", "anzeigen", "einblenden", "mehr", "weiterlesen"]
+# click_consent_if_any と同じボタン（小文字）
+CONSENT_LABELS = ["alle akzeptieren", "akzeptieren", "zustimmen", "einverstanden"]
+
+# Runs entirely inside the page: visible consent and reveal buttons are clicked once, every paragraph is
+# scrolled into view one tick at a time, and a MutationObserver tracks the last change
+# to the container. Once everything was visited and the DOM was quiet for `quietMs`
+# (or `maxMs` passed), all paragraph texts are returned in one round trip.
+EXTRACT_PARAGRAPHS_JS = r"""
+const [containerSel, quietMs, maxMs, tickMs, keywords, consentLabels, done] = arguments;
+const container = document.querySelector(containerSel);
+if (!container) { done(null); return; }
+
+let lastChange = Date.now();
+const observer = new MutationObserver(() => { lastChange = Date.now(); });
+observer.observe(container, {childList: true, subtree: true, characterData: true});
+
+const visible = el => !!(el.offsetWidth || el.offsetHeight || el.getClientRects().length);
+for (const b of document.querySelectorAll('button')) {
+  const t = (b.innerText || '').trim().toLowerCase();
+  const consent = consentLabels.some(k => t.includes(k)) || b.getAttribute('aria-label') === 'Zustimmen';
+  if ((consent || keywords.some(k => t.includes(k))) && visible(b)) { try { b.click(); } catch (e) {} }
+}
+
+const started = Date.now();
+let next = 0;
+const timer = setInterval(() => {
+  const ps = container.querySelectorAll('p');
+  if (next < ps.length) {
+    try { ps[next].scrollIntoView({block: 'center'}); } catch (e) {}
+    next += 1;
+    return;
+  }
+  const now = Date.now();
+  if (now - lastChange >= quietMs || now - started >= maxMs) {
+    clearInterval(timer);
+    observer.disconnect();
+    window.scrollTo(0, 0);
+    done(Array.from(container.querySelectorAll('p')).map(p => p.textContent || ''));
+  }
+}, tickMs);
+"""
+
+
+def extract_paragraphs_in_page(
+    driver: webdriver.Chrome,
+    max_wait: float,
+    quiet: float = 1.5,
+    tick: float = 0.05,
+) -> List[str] | None:
+    """
+    Scroll, wait for the DOM to go quiet and read every paragraph in one execute_async_script call.
+    Returns None if the container is missing or the script fails. The driver's script timeout
+    is restored afterwards (pooled drivers are reused for other pages).
+    """
+    try:
+        previous_timeout = driver.timeouts.script
+        driver.set_script_timeout(max_wait + 10)
+    except WebDriverException:
+        return None
+    try:
+        raw = driver.execute_async_script(
+            EXTRACT_PARAGRAPHS_JS, RICH_CONTAINER_SEL, int(quiet * 1000), int(max_wait * 1000),
+            int(tick * 1000), REVEAL_KEYWORDS, CONSENT_LABELS,
+        )
+    except WebDriverException:
+        return None
+    finally:
+        try:
+            if previous_timeout is not None:   # None は無制限（set_script_timeout では戻せない）
+                driver.set_script_timeout(previous_timeout)
+        except WebDriverException:
+            pass
+    if raw is None:
+        return None
+    return [t for t in (normalize_text(r) for r in raw) if t]
+
+
+def extract_paragraphs_by_polling(
+    driver: webdriver.Chrome,
+    actions: ActionChains,
+    max_wait: int,
+    per_para_wait: float,
+    poll: float,
+) -> List[str]:
+    """Previous extraction loop: per-paragraph fill wait plus a slow scroll pass (many round trips)."""
+    # Ensure we have some paragraphs (poll until present or timeout)
+    start = time.time()
+    paragraphs = get_paragraph_elements(driver)
+    while not paragraphs and (time.time() - start) < max_wait:
+        profiling.sleep(0.25)
+        paragraphs = get_paragraph_elements(driver)
+
+    # Pass 1: per-paragraph 'fill' (scroll + stability wait)
+    for p in paragraphs:
+        ensure_paragraph_filled(driver, actions, p, per_para_wait=per_para_wait, poll=poll)
+
+    # Pass 2: slow page scroll down/up to trigger any late injections
+    for _ in range(8):
+        try:
+            driver.execute_script("window.scrollBy(0, 500);")
+        except WebDriverException:
+            break
+        click_consent_if_any(driver)
+        try_reveal_buttons(driver)
+        profiling.sleep(0.2)
+    for _ in range(8):
+        try:
+            driver.execute_script("window.scrollBy(0, -500);")
+        except WebDriverException:
+            break
+        profiling.sleep(0.1)
+
+    # Extract final text per paragraph
+    return extract_paragraph_texts(driver)
+
+
 # ---------- main API ----------
 
+EXTRACT_MODES = ("script", "poll")
+
+
 def fetch_topthema_transcript(
     url_: str,
     output_file: str = "input/reference.txt",
     headless: bool = False,
     max_wait: int = 60,          # overall wait cap (seconds)
     per_para_wait: float = 6.0,  # per-paragraph wait cap (seconds)
-    poll: float = 0.25           # polling interval (seconds)
+    poll: float = 0.25,          # polling interval (seconds)
+    extract_mode: str = "script",
+    driver_pool=None,
 ) -> None:
     """
     Fetch manuscript from DW Top Thema /lm reliably:
 
       - Always use /lm (no fallback; no reconstruction).
-      - For each <p>, scroll into view and wait for its text to 'fill':
+      - extract_mode="script": one injected script scrolls through the container, waits
+        until a MutationObserver sees no more changes and returns every paragraph at once.
+      - extract_mode="poll" (also used if the script returns nothing): for each <p>,
+        scroll into view and wait for its text to 'fill':
           * placeholders often fill only when in viewport.
           * wait until text length grows and stabilizes.
       - Never abort on timeouts: always extract what is present at the end.
       - Sentence split by (.?!:) or newline (no dash splitting).
+      - With a driver_pool.DriverPool the browser is borrowed (and kept warm) instead
+        of started and quit for this one page.
     """
-    driver = setup_chrome_driver(headless=headless)
+    if extract_mode not in EXTRACT_MODES:
+        raise ValueError(f"unknown extract mode: {extract_mode} (choose from {', '.join(EXTRACT_MODES)})")
+    lm_url = url_.rstrip("/") + "/lm"
+
+    with profiling.span("scrape"):
+        if driver_pool is not None:
+            with driver_pool.borrow() as driver:
+                para_texts = _extract_manuscript(driver, lm_url, max_wait, per_para_wait, poll, extract_mode,
+                                                 driver_pool)
+        else:
+            driver = setup_chrome_driver(headless=headless)
+            try:
+                para_texts = _extract_manuscript(driver, lm_url, max_wait, per_para_wait, poll, extract_mode)
+            finally:
+                try:
+                    driver.quit()
+                except WebDriverException:
+                    # Driver already closed or unreachable; nothing else to do
+                    pass
+    profiling.count("paragraphs", len(para_texts))
+
+    # Join paragraphs; then split sentences by (.?!:) or newline
+    script_text = "\n".join(para_texts)
+    sentences = re.split(r"(?<=[.?!:])\s+|\n+", script_text)
+
+    # Write output
+    with open(output_file, "w", encoding="utf-8") as f:
+        for s in sentences:
+            s = s.strip()
+            if s:
+                f.write(s + "\n")
+
+
+def _extract_manuscript(
+    driver: webdriver.Chrome,
+    lm_url: str,
+    max_wait: int,
+    per_para_wait: float,
+    poll: float,
+    extract_mode: str,
+    driver_pool=None,
+) -> List[str]:
+    """Open the /lm page on the given driver and return the normalized paragraph texts."""
     actions = ActionChains(driver)
 
-    try:
-        # Navigate to /lm page
-        lm_url = url_.rstrip("/") + "/lm"
+    # Navigate to /lm page
+    with profiling.span("navigate"):
         driver.get(lm_url)
 
-        # click cookie consent once and reload the same page
-        accept_cookies_and_reload(driver, lm_url)
+    # click cookie consent once and reload the same page
+    # (pooled drivers already carry the consent cookies after the first page of the site)
+    with profiling.span("consent"):
+        if driver_pool is None or not driver_pool.has_consent(lm_url):
+            if accept_cookies_and_reload(driver, lm_url) and driver_pool is not None:
+                driver_pool.record_consent(driver, lm_url)
 
-        # Wait for container; raise TimeoutError if truly absent
+    # Wait for container; raise TimeoutError if truly absent
+    with profiling.span("wait_container"):
         wait_for_container(driver, max_wait=max_wait)
 
-        # Initial interactions to unlock content
-        click_consent_if_any(driver)
-        try_reveal_buttons(driver)
-
-        # Ensure we have some paragraphs (poll until present or timeout)
-        start = time.time()
-        paragraphs = get_paragraph_elements(driver)
-        while not paragraphs and (time.time() - start) < max_wait:
-            time.sleep(0.25)
-            paragraphs = get_paragraph_elements(driver)
-
-        # Pass 1: per-paragraph 'fill' (scroll + stability wait)
-        for p in paragraphs:
-            ensure_paragraph_filled(driver, actions, p, per_para_wait=per_para_wait, poll=poll)
-
-        # Pass 2: slow page scroll down/up to trigger any late injections
-        for _ in range(8):
-            try:
-                driver.execute_script("window.scrollBy(0, 500);")
-            except WebDriverException:
-                break
+    para_texts = None
+    if extract_mode == "script":
+        # 同意ボタンと「Lösung」などの表示ボタンはスクリプトの中で押す（往復を増やさない）
+        with profiling.span("extract_script"):
+            para_texts = extract_paragraphs_in_page(driver, max_wait=max_wait)
+        if not para_texts:
+            print("ℹ️ スクリプトでの抽出に失敗したため、段落ごとのポーリングに切り替えます")
+    if not para_texts:
+        with profiling.span("extract_poll"):
+            # Initial interactions to unlock content
             click_consent_if_any(driver)
             try_reveal_buttons(driver)
-            time.sleep(0.2)
-        for _ in range(8):
-            try:
-                driver.execute_script("window.scrollBy(0, -500);")
-            except WebDriverException:
-                break
-            time.sleep(0.1)
+            para_texts = extract_paragraphs_by_polling(driver, actions, max_wait, per_para_wait, poll)
+    return para_texts
 
-        # Extract final text per paragraph
-        para_texts = extract_paragraph_texts(driver)
 
-        # Join paragraphs; then split sentences by (.?!:) or newline
-        script_text = "\n".join(para_texts)
-        sentences = re.split(r"(?<=[.?!:])\s+|\n+", script_text)
-
-        # Write output
-        with open(output_file, "w", encoding="utf-8") as f:
-            for s in sentences:
-                s = s.strip()
-                if s:
-                    f.write(s + "\n")
+def fetch_tagesschau_transcript(source: str, output_file: str = "input/reference.txt",
+                                offset: float | None = None) -> list:
+    """
+    Write the sentences of a Tagesschau subtitle file (EBU-TT / TTML .xml; path or URL)
+    to output_file, one per line. No browser: the XML is streamed through
+    ttml_subtitles.iter_cues. Returns the timed sentences (start/end in seconds),
+    which whisper_audio_splitter.split_audio_from_subtitles can cut without Whisper.
+    """
+    from ttml_subtitles import read_subtitle_sentences
 
-    finally:
-        try:
-            driver.quit()
-        except WebDriverException:
-            # Driver already closed or unreachable; nothing else to do
-            pass
+    with profiling.span("parse_subtitles"):
+        sentences = read_subtitle_sentences(source, offset)
+    profiling.count("sentences", len(sentences))
+    with open(output_file, "w", encoding="utf-8") as f:
+        for s in sentences:
+            f.write(s.text + "\n")
+    return sentences
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="公式スクリプトの抽出（引数なしなら config.ini の Top Thema）")
+    parser.add_argument("subtitle", nargs="?", help="Tagesschau の字幕 (EBU-TT / TTML .xml、パスまたは URL)")
+    parser.add_argument("audio", nargs="?", help="放送の音声ファイル。指定すると字幕の時刻で文ごとに切り出す（Whisper なし）")
+    parser.add_argument("--title", help="切り出しの出力先 output/{title}（audio を指定した時は必須）")
+    parser.add_argument("--offset", type=float, help="字幕の時刻から引く秒数（既定: 1時間以上なら時の部分を引く）")
+    args = parser.parse_args()
+
     # read config
     config = configparser.ConfigParser()
     config.read('config.ini')
-    url = config['TOP_THEMA']['url']
-
-    fetch_topthema_transcript(url)
 
+    if args.audio:
+        if not args.title:
+            parser.error("audio を指定した時は --title が必要です")
+        from whisper_audio_splitter import split_audio_from_subtitles, split_options_from_config
+        options = split_options_from_config(config)
+        for key in ("parallel_jobs", "chunk_seconds"):
+            options.pop(key)
+        split_audio_from_subtitles(args.title, args.subtitle, args.audio, offset=args.offset, **options)
+    elif args.subtitle:
+        print(f"📜 {len(fetch_tagesschau_transcript(args.subtitle, offset=args.offset))} 文を input/reference.txt に保存")
+    else:
+        url = config['TOP_THEMA']['url']
+        fetch_topthema_transcript(url)
@@ -0,0 +1,78 @@
+import os
+import subprocess
+import sys
+import threading
+
+import batch_pipeline
+from batch_pipeline import BatchPipeline, Episode, load_manifest
+
+
+class _StrictProfile:
+    """Stand-in for cProfile on Python 3.12+: a second enable() in the process raises."""
+    active = 0
+
+    def enable(self):
+        if _StrictProfile.active:
+            raise ValueError("Another profiling tool is already active")
+        _StrictProfile.active += 1
+
+    def disable(self):
+        _StrictProfile.active -= 1
+
+    def dump_stats(self, path):
+        open(path, "w").close()
+
+
+def test_overlapping_profiled_stages_do_not_fail(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(batch_pipeline.cProfile, "Profile", _StrictProfile)
+    episodes = [Episode("a", "http://a"), Episode("b", "http://b")]
+    pipeline = BatchPipeline(episodes, status_file=str(tmp_path / "status.json"), profile=True)
+    both_running = threading.Barrier(2, timeout=5)
+    results = {}
+
+    def run(ep):
+        results[ep.title] = pipeline._run_stage(ep, "download", both_running.wait)
+
+    threads = [threading.Thread(target=run, args=(ep,)) for ep in episodes]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert results == {"a": True, "b": True}
+    assert len(list(tmp_path.glob("output/*/profile_download.pstats"))) == 1
+
+
+def test_profiler_already_active_does_not_fail_stage(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(batch_pipeline.cProfile, "Profile", _StrictProfile)
+    _StrictProfile.active = 1   # 例えばデバッガが動いている
+    try:
+        ep = Episode("a", "http://a")
+        pipeline = BatchPipeline([ep], status_file=str(tmp_path / "status.json"), profile=True)
+        assert pipeline._run_stage(ep, "download", lambda: None)
+        assert ep.status["download"] == "done"
+    finally:
+        _StrictProfile.active = 0
+
+
+def test_load_manifest_keeps_percent_encoded_urls(tmp_path):
+    manifest = tmp_path / "episodes.ini"
+    manifest.write_text("[strasse]\nurl = https://learngerman.dw.com/de/stra%C3%9Fe/l-1\n", encoding="utf-8")
+    assert load_manifest(str(manifest))[0].url == "https://learngerman.dw.com/de/stra%C3%9Fe/l-1"
+
+
+def test_reference_mode_skips_transcribe_when_scrape_failed(tmp_path):
+    ep = Episode("a", "http://a")
+    pipeline = BatchPipeline([ep], status_file=str(tmp_path / "status.json"), sentence_source="reference")
+    ep.status.update(download="done", scrape="failed")
+    pipeline._transcribe_when_ready(ep)   # Whisper の文に戻すなら _whisper_pool (None) に投入して落ちる
+    assert ep.status["transcribe"] == "skipped"
+    assert ep.status["correct"] == "skipped"
+
+
+def test_import_stays_light():
+    code = "import sys, batch_pipeline; print(sorted({'selenium', 'whisper_audio_splitter'} & set(sys.modules)))"
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                         cwd=os.path.dirname(os.path.abspath(batch_pipeline.__file__)))
+    assert out.stdout.strip() == "[]"
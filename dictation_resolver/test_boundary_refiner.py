@@ -0,0 +1,45 @@
+import numpy as np
+
+from boundary_refiner import ClipSettings, frame_rms, padded_ranges, quietest_points, silence_threshold, snap_to_silence
+
+SAMPLE_RATE = 16000
+
+
+def _speech_with_pause(pause_ms=(1000, 1300), total_ms=2500, sample_rate=SAMPLE_RATE):
+    samples = np.random.default_rng(0).uniform(-0.5, 0.5, total_ms * sample_rate // 1000).astype(np.float32)
+    samples[pause_ms[0] * sample_rate // 1000:pause_ms[1] * sample_rate // 1000] = 0.0
+    return samples
+
+
+def test_snap_to_silence_returns_frame_centres():
+    rms, hop_ms = frame_rms(_speech_with_pause(), SAMPLE_RATE, window_ms=20, hop_ms=5)
+    threshold = silence_threshold(rms)
+    # 無音 [1000, 1300) の両端に一番近い、全体が無音のフレームの中心
+    start, = snap_to_silence(rms, hop_ms, [990.0], 200, 50, threshold, window_ms=20)
+    end, = snap_to_silence(rms, hop_ms, [1310.0], 50, 200, threshold, window_ms=20)
+    assert start == 1010.0
+    assert end == 1290.0
+
+
+def test_snap_and_quietest_agree_on_time_axis():
+    samples = _speech_with_pause()
+    rms, hop_ms = frame_rms(samples, SAMPLE_RATE, window_ms=20, hop_ms=5)
+    snapped, = snap_to_silence(rms, hop_ms, [1150.0], 0, 0, silence_threshold(rms), window_ms=20)
+    quietest, = quietest_points(samples, SAMPLE_RATE, [1150.0], search_ms=0, window_ms=20, hop_ms=5)
+    assert snapped == quietest == 1150.0
+
+
+def test_no_drift_when_hop_is_not_whole_samples():
+    # 44100 Hz では 5 ms = 220 サンプル（4.989 ms）。数分後でも無音の中に寄せる
+    samples = _speech_with_pause((240000, 240150), 240500, sample_rate=44100)
+    rms, hop_ms = frame_rms(samples, 44100, window_ms=20, hop_ms=5)
+    assert hop_ms == 220 * 1000 / 44100
+    snapped, = snap_to_silence(rms, hop_ms, [240075.0], 200, 200, silence_threshold(rms), window_ms=20)
+    assert 240000 <= snapped - 10 and snapped + 10 <= 240150
+    quietest, = quietest_points(samples, 44100, [240075.0], search_ms=200, window_ms=100, hop_ms=10)
+    assert 240000 <= quietest - 50 and quietest + 50 <= 240150
+
+
+def test_padding_stays_out_of_neighbours():
+    settings = ClipSettings(start_padding_ms=50, end_padding_ms=150)
+    assert padded_ranges([0.0, 1000.0], [900.0, 2000.0], settings, duration_ms=2100) == [(0, 1000), (950, 2100)]
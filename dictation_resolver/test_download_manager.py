@@ -0,0 +1,120 @@
+import gzip
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import download_manager
+from download_manager import META_SUFFIX, PART_SUFFIX, DownloadManager
+
+BODY = bytes(range(256)) * 400
+ETAG = '"v1"'
+
+
+@pytest.fixture
+def server():
+    """Local file server with ETag / 304, Range / If-Range and 416 like a CDN; `options` switches odd behaviour on."""
+    options = {"unknown_total": False, "gzip": False}
+    seen = []
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            seen.append(dict(self.headers))
+            if self.headers.get("If-None-Match") == ETAG:
+                self.send_response(304)
+                self.send_header("ETag", ETAG)
+                self.end_headers()
+                return
+            body, start = BODY, 0
+            rng = self.headers.get("Range", "")
+            if rng.startswith("bytes=") and self.headers.get("If-Range", ETAG) == ETAG:
+                start = int(rng[len("bytes="):].split("-")[0])
+                if start >= len(body):
+                    self.send_response(416)
+                    self.send_header("Content-Range", f"bytes */{len(body)}")
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+            payload = gzip.compress(body) if options["gzip"] else body[start:]
+            self.send_response(206 if start else 200)
+            self.send_header("ETag", ETAG)
+            self.send_header("Content-Length", str(len(payload)))
+            if options["gzip"]:
+                self.send_header("Content-Encoding", "gzip")
+            if start:
+                total = "*" if options["unknown_total"] else len(body)
+                self.send_header("Content-Range", f"bytes {start}-{len(body) - 1}/{total}")
+            self.end_headers()
+            self.wfile.write(payload)
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=httpd.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_port}/audio.mp3", options, seen
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _interrupted(dest, url, received: int) -> None:
+    """State left behind by a download that stopped after `received` bytes."""
+    with open(dest + PART_SUFFIX, "wb") as f:
+        f.write(BODY[:received])
+    with open(dest + META_SUFFIX, "w", encoding="utf-8") as f:
+        json.dump({"url": url, "etag": ETAG, "last_modified": None, "size": len(BODY), "complete": False}, f)
+
+
+def test_download_then_not_modified(server, tmp_path):
+    url, _, _ = server
+    dest = str(tmp_path / "audio.mp3")
+    manager = DownloadManager()
+    assert manager.download(url, dest).status == "downloaded"
+    assert manager.download(url, dest).status == "not-modified"
+    assert open(dest, "rb").read() == BODY
+
+
+@pytest.mark.parametrize("unknown_total", [False, True])
+def test_resume_with_range(server, tmp_path, unknown_total):
+    url, options, seen = server
+    options["unknown_total"] = unknown_total
+    dest = str(tmp_path / "audio.mp3")
+    _interrupted(dest, url, 1000)
+    result = DownloadManager().download(url, dest)
+    assert (result.status, result.bytes_received, result.size) == ("resumed", len(BODY) - 1000, len(BODY))
+    assert seen[-1]["Range"] == "bytes=1000-"
+    assert open(dest, "rb").read() == BODY
+
+
+def test_complete_part_file_gets_416_and_is_finished(server, tmp_path):
+    url, _, seen = server
+    dest = str(tmp_path / "audio.mp3")
+    _interrupted(dest, url, len(BODY))
+    result = DownloadManager(retries=0).download(url, dest)
+    assert (result.status, result.bytes_received, result.size) == ("resumed", 0, len(BODY))
+    assert len(seen) == 1
+    assert open(dest, "rb").read() == BODY
+    assert json.load(open(dest + META_SUFFIX))["complete"]
+
+
+def test_part_longer_than_file_restarts(server, tmp_path, monkeypatch):
+    monkeypatch.setattr(download_manager.time, "sleep", lambda s: None)
+    url, _, _ = server
+    dest = str(tmp_path / "audio.mp3")
+    _interrupted(dest, url, len(BODY))
+    with open(dest + PART_SUFFIX, "ab") as f:
+        f.write(b"stale")
+    assert DownloadManager(retries=1).download(url, dest).status == "downloaded"
+    assert open(dest, "rb").read() == BODY
+
+
+def test_gzip_body_is_decoded(server, tmp_path):
+    url, options, seen = server
+    options["gzip"] = True
+    dest = str(tmp_path / "audio.mp3")
+    assert DownloadManager().download(url, dest).size == len(BODY)
+    assert seen[-1]["Accept-Encoding"] == "identity"
+    assert open(dest, "rb").read() == BODY
@@ -0,0 +1,70 @@
+import threading
+
+from driver_pool import DriverPool
+
+URL = "https://learngerman.dw.com/de/handy-aus-offline-sein/l-72709529"
+CONSENT = [{"name": "consent", "value": "yes", "domain": ".dw.com", "path": "/"}]
+
+
+class FakeDriver:
+    def __init__(self):
+        self.cookies = []
+        self.quit_called = False
+
+    def execute_script(self, script):
+        return 1
+
+    def execute_cdp_cmd(self, cmd, params):
+        self.cookies.append(params["name"])
+
+    def get_cookies(self):
+        return CONSENT
+
+    def get(self, url):
+        pass
+
+    def quit(self):
+        self.quit_called = True
+
+
+def test_pooled_driver_gets_consent_recorded_later():
+    pool = DriverPool(size=2, factory=FakeDriver)
+    first_in, consent_done = threading.Event(), threading.Event()
+
+    def borrow_early():
+        with pool.borrow() as driver:
+            first_in.set()
+            consent_done.wait(5)
+        return driver
+
+    early = {}
+    t = threading.Thread(target=lambda: early.setdefault("driver", borrow_early()))
+    t.start()
+    first_in.wait(5)
+    # もう1台のブラウザで同意 → 先に作られた1台は Cookie を持っていない
+    with pool.borrow() as clicked:
+        pool.record_consent(clicked, URL)
+    consent_done.set()
+    t.join()
+    assert early["driver"].cookies == []
+
+    with pool.borrow() as a, pool.borrow() as b:
+        assert pool.has_consent(URL)
+        borrowed = {a, b}
+    # 2台とも次の貸し出しで Cookie が入り、同意した1台には二重に入れない
+    assert borrowed == {early["driver"], clicked}
+    assert early["driver"].cookies == ["consent"]
+    assert clicked.cookies == []
+    pool.close()
+
+
+def test_driver_recycled_after_max_pages():
+    pool = DriverPool(size=1, max_pages=2, factory=FakeDriver)
+    with pool.borrow() as first:
+        pass
+    with pool.borrow() as again:
+        assert again is first
+    with pool.borrow() as fresh:
+        assert fresh is not first
+    assert first.quit_called
+    pool.close()
@@ -0,0 +1,42 @@
+import json
+import os
+
+from output_manifest import MANIFEST_FILE, OutputManifest, iter_script_sentences, sentence_clips
+from vocabulary_index import read_episode
+
+
+def _episode(tmp_path, script: str, clips: int):
+    out = tmp_path / "folge-1"
+    out.mkdir()
+    (out / "script.txt").write_text(script, encoding="utf-8")
+    (out / MANIFEST_FILE).write_text(json.dumps({"version": 1, "script_sha256": None, "clips": {
+        f"sentence_{i:03d}.mp3": {"fingerprint": "x"} for i in range(clips)}}), encoding="utf-8")
+    return str(out)
+
+
+def test_blank_lines_and_checkbox_prefixes_are_skipped(tmp_path):
+    script = tmp_path / "script.txt"
+    script.write_text("- [ ] 1. - [ ] 1. Eins.\n\n  \nZwei.\n", encoding="utf-8")
+    assert list(iter_script_sentences(str(script))) == [(1, "Eins."), (2, "Zwei.")]
+
+
+def test_clips_pair_with_sentences_not_lines(tmp_path):
+    out = _episode(tmp_path, "Eins.\n\nZwei.\n", clips=2)
+    assert read_episode(out) == [(1, "Eins.", os.path.join(out, "sentence_000.mp3")),
+                                 (2, "Zwei.", os.path.join(out, "sentence_001.mp3"))]
+
+
+def test_no_clips_when_counts_differ(tmp_path, capsys):
+    out = _episode(tmp_path, "Eins.\nZwei.\nDrei.\n", clips=2)
+    assert sentence_clips(out, 3) is None
+    assert [clip for _, _, clip in read_episode(out)] == [None, None, None]
+    assert "音声は付けません" in capsys.readouterr().err
+
+
+def test_manifest_round_trip(tmp_path):
+    manifest = OutputManifest(str(tmp_path))
+    manifest.clips = {"sentence_000.mp3": {"fingerprint": "abc"}}
+    manifest.script_sha = "sha"
+    manifest.save()
+    loaded = OutputManifest(str(tmp_path))
+    assert (loaded.clips, loaded.script_sha) == (manifest.clips, "sha")
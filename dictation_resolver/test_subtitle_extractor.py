@@ -0,0 +1,52 @@
+from types import SimpleNamespace
+
+import subtitle_extractor
+
+
+class FakeDriver:
+    """Records the WebDriver commands the script-mode extraction sends."""
+
+    def __init__(self):
+        self.commands = []
+        self.script_timeout = 30
+
+    @property
+    def timeouts(self):
+        self.commands.append("get_timeouts")
+        return SimpleNamespace(script=self.script_timeout)
+
+    def set_script_timeout(self, seconds):
+        self.commands.append("set_script_timeout")
+        self.script_timeout = seconds
+
+    def get(self, url):
+        self.commands.append("get")
+
+    def find_element(self, by, value):
+        self.commands.append("find_element")
+        return object()
+
+    def find_elements(self, by, value):
+        self.commands.append("find_elements")
+        return []
+
+    def execute_async_script(self, script, *args):
+        self.commands.append("execute_async_script")
+        assert self.script_timeout > args[2] / 1000   # maxMs までは打ち切られない
+        return ["Erster Absatz.", "  ", "Zweiter Absatz."]
+
+
+class FakePool:
+    def has_consent(self, url):
+        return True
+
+
+def test_script_mode_restores_timeout_and_skips_extra_round_trips():
+    driver = FakeDriver()
+    texts = subtitle_extractor._extract_manuscript(driver, "https://example.com/lm", 60, 6.0, 0.25, "script",
+                                                   FakePool())
+    assert texts == ["Erster Absatz.", "Zweiter Absatz."]
+    assert driver.script_timeout == 30
+    # 同意・表示ボタンはスクリプトの中で押すので find_elements の往復はない
+    assert "find_elements" not in driver.commands
+    assert driver.commands.count("execute_async_script") == 1
@@ -0,0 +1,66 @@
+import io
+
+from ttml_subtitles import SubtitleCue, _split_sentences, cues_to_sentences, iter_cues, read_subtitle_sentences
+
+
+def test_year_ends_sentence():
+    assert _split_sentences("Die Wahl war im Jahr 2024. Danach kam die Koalition.") == [
+        "Die Wahl war im Jahr 2024.", "Danach kam die Koalition."]
+
+
+def test_ordinals_do_not_end_sentence():
+    assert _split_sentences("Am 3. Oktober ist Feiertag.") == ["Am 3. Oktober ist Feiertag."]
+    assert _split_sentences("Das ist der 12. große Streik.") == ["Das ist der 12. große Streik."]
+
+
+def test_number_before_capitalised_word_ends_sentence():
+    assert _split_sentences("Es waren 12. Dann kamen mehr.") == ["Es waren 12.", "Dann kamen mehr."]
+
+
+def test_abbreviations_do_not_end_sentence():
+    assert _split_sentences("Das gilt z.B. für Dr. Müller.") == ["Das gilt z.B. für Dr. Müller."]
+    assert _split_sentences("Das gilt z. B. für uns, d. h. für alle.") == ["Das gilt z. B. für uns, d. h. für alle."]
+
+
+def test_single_letter_before_capitalised_word_ends_sentence():
+    assert _split_sentences("Wir brauchen einen Plan B. Dann geht es weiter.") == [
+        "Wir brauchen einen Plan B.", "Dann geht es weiter."]
+    assert _split_sentences("Orangen haben viel Vitamin C. Das ist gesund.") == [
+        "Orangen haben viel Vitamin C.", "Das ist gesund."]
+
+
+def test_ordinal_across_cues():
+    cues = [SubtitleCue(0.0, 1.0, "Am 3."), SubtitleCue(1.0, 2.0, "Oktober feiern wir."),
+            SubtitleCue(2.0, 3.0, "Seit 1990."), SubtitleCue(3.0, 4.0, "Das ist lange her.")]
+    sentences = list(cues_to_sentences(cues, offset=0.0))
+    assert [(s.text, s.start, s.end) for s in sentences] == [
+        ("Am 3. Oktober feiern wir.", 0.0, 2.0),
+        ("Seit 1990.", 2.0, 3.0),
+        ("Das ist lange her.", 3.0, 4.0),
+    ]
+
+
+def test_read_subtitle_sentences_from_ttml():
+    ttml = b"""<?xml version="1.0" encoding="UTF-8"?>
+<tt xmlns="http://www.w3.org/ns/ttml"><body><div>
+<p begin="10:00:01.000" end="10:00:03.000">Die Wahl war im Jahr 2024.</p>
+<p begin="10:00:03.000" end="10:00:05.000">Danach kam die Koalition.</p>
+</div></body></tt>"""
+    sentences = read_subtitle_sentences(io.BytesIO(ttml))
+    assert [(s.text, s.start, s.end) for s in sentences] == [
+        ("Die Wahl war im Jahr 2024.", 1.0, 3.0), ("Danach kam die Koalition.", 3.0, 5.0)]
+
+
+def _tick_cue(root_attributes):
+    ttml = f"""<tt xmlns="http://www.w3.org/ns/ttml" xmlns:ttp="http://www.w3.org/ns/ttml#parameter"
+{root_attributes}><body><div><p begin="50t" end="100t">Hallo.</p></div></body></tt>""".encode("utf-8")
+    cue, = iter_cues(io.BytesIO(ttml))
+    return cue.begin
+
+
+def test_tick_rate_defaults_follow_ttml():
+    # tickRate がなければ、frameRate なしなら 1 tick = 1 秒、ありなら 1 tick = 1 サブフレーム
+    assert _tick_cue("") == 50.0
+    assert _tick_cue('ttp:frameRate="25" ttp:subFrameRate="2"') == 1.0
+    assert _tick_cue('ttp:frameRate="30" ttp:frameRateMultiplier="1000 1001"') == round(50 / (30000 / 1001), 3)
+    assert _tick_cue('ttp:frameRate="25" ttp:tickRate="10"') == 5.0
@@ -0,0 +1,48 @@
+import sqlite3
+
+import whisper_audio_splitter
+from vocabulary_index import VocabularyIndex
+
+
+def _tree(tmp_path):
+    (tmp_path / "output" / "folge-1").mkdir(parents=True)
+    (tmp_path / "output" / "folge-1" / "script.txt").write_text("Wir hätten gern Kaffee.\n", encoding="utf-8")
+    (tmp_path / "input" / "reference").mkdir(parents=True)
+    (tmp_path / "input" / "reference" / "folge-2.txt").write_text("Das Haus ist alt.\n", encoding="utf-8")
+    (tmp_path / "input" / "reference.txt").write_text("Wir hätten gern Tee.\n", encoding="utf-8")
+
+
+def test_update_all_twice_changes_nothing(tmp_path):
+    _tree(tmp_path)
+    extra = [("folge-1", str(tmp_path / "input" / "reference.txt"))]
+    with VocabularyIndex(str(tmp_path / "vocabulary.sqlite3")) as index:
+        first = index.update_all(str(tmp_path / "output"), str(tmp_path / "input" / "reference"), extra)
+        second = index.update_all(str(tmp_path / "output"), str(tmp_path / "input" / "reference"), extra)
+        assert first == (3, 0)
+        assert second == (0, 0)
+        assert {(h.title, h.source) for h in index.search(["hätten"])} == {("folge-1", "script"),
+                                                                           ("folge-1", "reference")}
+
+
+def test_update_all_removes_deleted_episodes(tmp_path):
+    _tree(tmp_path)
+    with VocabularyIndex(str(tmp_path / "vocabulary.sqlite3")) as index:
+        index.update_all(str(tmp_path / "output"), str(tmp_path / "input" / "reference"))
+        (tmp_path / "input" / "reference" / "folge-2.txt").unlink()
+        assert index.update_all(str(tmp_path / "output"), str(tmp_path / "input" / "reference")) == (0, 1)
+        assert index.search(["Haus"]) == []
+
+
+def test_split_survives_broken_index(tmp_path, monkeypatch, capsys):
+    def broken(output_dir):
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(whisper_audio_splitter, "update_vocabulary_index", broken)
+    monkeypatch.setattr(whisper_audio_splitter, "_export_changed_clips", lambda *args: 0)
+    out = tmp_path / "output" / "folge-1"
+    out.mkdir(parents=True)
+    whisper_audio_splitter._export_timed_sentences([(0, "Hallo.", 0.0, 1.0, 1.0)], "audio.mp3", str(out),
+                                                   "script.txt", whisper_audio_splitter.ClipSettings(refine=False),
+                                                   "serial")
+    assert (out / "script.txt").read_text(encoding="utf-8") == "Hallo.\n"
+    assert "database is locked" in capsys.readouterr().out
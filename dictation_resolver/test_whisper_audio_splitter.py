@@ -0,0 +1,78 @@
+import configparser
+import shutil
+import wave
+
+import numpy as np
+import pytest
+
+import whisper_audio_splitter
+from boundary_refiner import ClipSettings
+from ttml_subtitles import SubtitleCue
+
+
+def _write_wav(path, seconds=3.0, sample_rate=16000):
+    samples = np.random.default_rng(0).uniform(-0.3, 0.3, int(seconds * sample_rate))
+    samples[int(1.4 * sample_rate):int(1.6 * sample_rate)] = 0.0
+    with wave.open(str(path), "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(sample_rate)
+        w.writeframes((samples * 32767).astype("<i2").tobytes())
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg not installed")
+def test_subtitle_split_decodes_once(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    _write_wav(tmp_path / "episode.wav")
+    decodes = []
+    decode_audio = whisper_audio_splitter.decode_audio
+
+    def counting_decode(*args, **kwargs):
+        decodes.append(args)
+        return decode_audio(*args, **kwargs)
+
+    monkeypatch.setattr(whisper_audio_splitter, "decode_audio", counting_decode)
+    monkeypatch.setattr("pydub.AudioSegment.from_file", lambda *a, **k: pytest.fail("decoded the source again"))
+    cues = iter([SubtitleCue(0.0, 1.5, "Erster Satz."), SubtitleCue(1.5, 3.0, "Zweiter Satz.")])
+    monkeypatch.setattr("ttml_subtitles.iter_cues", lambda source: cues)
+
+    count = whisper_audio_splitter.split_audio_from_subtitles("episode", "subs.xml", "episode.wav", offset=0.0,
+                                                              export_mode="serial", clip_settings=ClipSettings())
+    assert count == 2
+    assert len(decodes) == 1
+    assert sorted(p.name for p in (tmp_path / "output" / "episode").glob("sentence_*.mp3")) == [
+        "sentence_000.mp3", "sentence_001.mp3"]
+
+
+
+def _episode_with_script(tmp_path, script):
+    out = tmp_path / "output" / "episode"
+    out.mkdir(parents=True)
+    (out / "script.txt").write_text(script, encoding="utf-8")
+    return out
+
+
+def test_script_without_manifest_is_adopted(tmp_path):
+    out = _episode_with_script(tmp_path, "Alter Satz.\n")
+    manifest = whisper_audio_splitter.OutputManifest(str(out))
+    whisper_audio_splitter._write_script(str(out / "script.txt"), "Neuer Satz.\n", manifest)
+    assert (out / "script.txt").read_text(encoding="utf-8") == "Neuer Satz.\n"
+    assert not (out / "script.new.txt").exists()
+
+
+def test_hand_edited_script_is_kept(tmp_path):
+    out = _episode_with_script(tmp_path, "Von Hand korrigiert.\n")
+    manifest = whisper_audio_splitter.OutputManifest(str(out))
+    manifest.script_sha = whisper_audio_splitter.text_sha256("Alter Satz.\n")
+    whisper_audio_splitter._write_script(str(out / "script.txt"), "Neuer Satz.\n", manifest)
+    assert (out / "script.txt").read_text(encoding="utf-8") == "Von Hand korrigiert.\n"
+    assert (out / "script.new.txt").read_text(encoding="utf-8") == "Neuer Satz.\n"
+
+
+def test_sentence_source_typo_is_an_error():
+    config = configparser.ConfigParser()
+    config.read_string("[WHISPER]\nsentence_source = refrence\n")
+    with pytest.raises(ValueError, match="refrence"):
+        whisper_audio_splitter.sentence_source_from_config(config)
+    config["WHISPER"]["sentence_source"] = "reference"
+    assert whisper_audio_splitter.sentence_source_from_config(config) == "reference"
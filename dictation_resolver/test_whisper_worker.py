@@ -0,0 +1,48 @@
+import socket
+import threading
+import time
+
+import pytest
+from multiprocessing.connection import AuthenticationError, Client
+
+from whisper_worker import RemoteWhisperWorker, serve
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _start(authkey=b"right"):
+    address = ("127.0.0.1", _free_port())
+    threading.Thread(target=serve, args=(address, authkey, ()), daemon=True).start()
+    worker = RemoteWhisperWorker(address, authkey)
+    for _ in range(100):   # 待機が始まるまで
+        if worker.is_available():
+            break
+        time.sleep(0.05)
+    return address, worker
+
+
+def test_serve_survives_wrong_authkey():
+    address, worker = _start()
+    with pytest.raises(AuthenticationError):
+        Client(address, authkey=b"wrong")
+    assert not RemoteWhisperWorker(address, b"wrong").is_available()
+    assert worker.is_available()
+
+
+def test_serve_answers_malformed_jobs_with_an_error():
+    address, worker = _start()
+    for job in (["audio.mp3"], {"model": "base"}):
+        with Client(address, authkey=b"right") as conn:
+            conn.send(job)
+            status, message = conn.recv()
+        assert status == "error" and "ValueError" in message
+    assert worker.is_available()
+
+
+def test_serve_refuses_non_loopback_address():
+    with pytest.raises(ValueError):
+        serve(("0.0.0.0", _free_port()), b"right", ())
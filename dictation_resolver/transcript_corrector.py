@@ -0,0 +1,336 @@
+from __future__ import annotations
+
+import argparse
+import configparser
+import json
+import os
+import re
+from dataclasses import dataclass, field
+from typing import List, Optional, Sequence, Tuple
+
+import profiling
+
+WORDS_FILE = "words.json"
+CORRECTED_FILE = "corrected.json"
+CORRECTED_SCRIPT_FILE = "script_corrected.txt"
+REPORT_FILE = "diff_report.txt"
+
+_NON_WORD = re.compile(r"[\W_]+")
+_INVISIBLE = re.compile("[\u00ad\u200b\u200c\u200d\ufeff]")
+
+# 行ごとのコストを保持するときの「到達不能」
+_INF = 1 << 30
+_DIAG, _UP, _LEFT = 0, 1, 2
+
+
+def normalize_token(token: str) -> str:
+    """Comparison key: case, punctuation, soft hyphens and ß/ss differences are ignored."""
+    token = _INVISIBLE.sub("", token).lower().replace("ß", "ss")
+    return _NON_WORD.sub("", token)
+
+
+def _banded(a: Sequence[int], b: Sequence[int], k: int) -> Tuple[List[Tuple[Optional[int], Optional[int]]], bool]:
+    """
+    Edit-distance alignment restricted to a band of ±k cells around the diagonal
+    from (0, 0) to (n, m). Returns the path and whether it touched the band edge.
+    """
+    n, m = len(a), len(b)
+    k = max(k, -(-m // n) + 1)  # 行ごとの中心の移動より広くないと帯が途切れる
+    bounds = []
+    for i in range(n + 1):
+        center = i * m // n
+        bounds.append((max(0, center - k), min(m, center + k)))
+
+    back: List[bytearray] = []
+    lo, hi = bounds[0]
+    prev = list(range(lo, hi + 1))
+    prev_lo, prev_hi = lo, hi
+    back.append(bytearray([_LEFT]) * (hi - lo + 1))
+
+    for i in range(1, n + 1):
+        lo, hi = bounds[i]
+        ai = a[i - 1]
+        cur = [_INF] * (hi - lo + 1)
+        ptr = bytearray(hi - lo + 1)
+        for j in range(lo, hi + 1):
+            best, move = _INF, _DIAG
+            if prev_lo <= j - 1 <= prev_hi:
+                best = prev[j - 1 - prev_lo] + (ai != b[j - 1])
+            if prev_lo <= j <= prev_hi:
+                c = prev[j - prev_lo] + 1
+                if c < best:
+                    best, move = c, _UP
+            if j > lo:
+                c = cur[j - 1 - lo] + 1
+                if c < best:
+                    best, move = c, _LEFT
+            cur[j - lo] = best
+            ptr[j - lo] = move
+        back.append(ptr)
+        prev, prev_lo, prev_hi = cur, lo, hi
+
+    # --- traceback ---
+    path = []
+    touched = False
+    i, j = n, m
+    while i > 0 or j > 0:
+        lo, hi = bounds[i]
+        if (j == lo and lo > 0) or (j == hi and hi < m):
+            touched = True
+        move = back[i][j - lo] if i > 0 else _LEFT
+        if move == _DIAG:
+            path.append((i - 1, j - 1))
+            i, j = i - 1, j - 1
+        elif move == _UP:
+            path.append((i - 1, None))
+            i -= 1
+        else:
+            path.append((None, j - 1))
+            j -= 1
+    path.reverse()
+    return path, touched
+
+
+def align_tokens(a: Sequence[str], b: Sequence[str], band: int = 32) -> List[Tuple[Optional[int], Optional[int]]]:
+    """
+    Align two token sequences (already normalized) by edit distance.
+
+    Returns (i, j) pairs: both set = match or substitution, (i, None) = only in `a`,
+    (None, j) = only in `b`. Only a band around the diagonal is computed, so the cost
+    is O((n + m) * band); the band is doubled while the best path runs along its edge.
+    Common leading/trailing runs are matched without DP.
+    """
+    vocab: dict = {}
+    ia = [vocab.setdefault(t, len(vocab)) for t in a]
+    ib = [vocab.setdefault(t, len(vocab)) for t in b]
+
+    head = 0
+    while head < len(ia) and head < len(ib) and ia[head] == ib[head]:
+        head += 1
+    tail = 0
+    while tail < len(ia) - head and tail < len(ib) - head and ia[-1 - tail] == ib[-1 - tail]:
+        tail += 1
+    mid_a, mid_b = ia[head:len(ia) - tail], ib[head:len(ib) - tail]
+
+    pairs = [(x, x) for x in range(head)]
+    if not mid_a:
+        pairs += [(None, head + j) for j in range(len(mid_b))]
+    elif not mid_b:
+        pairs += [(head + i, None) for i in range(len(mid_a))]
+    else:
+        k = max(band, 1)
+        while True:
+            path, touched = _banded(mid_a, mid_b, k)
+            if not touched or k >= max(len(mid_a), len(mid_b)):
+                break
+            k *= 2
+        pairs += [(None if i is None else head + i, None if j is None else head + j) for i, j in path]
+    pairs += [(len(ia) - tail + x, len(ib) - tail + x) for x in range(tail)]
+    return pairs
+
+
+@dataclass
+class SentenceDiff:
+    index: int
+    reference: str
+    whisper: str
+    start: Optional[float]
+    end: Optional[float]
+    substitutions: int = 0
+    insertions: int = 0     # 公式にはあるが Whisper が聞き取れなかった語
+    deletions: int = 0      # Whisper にしかない語
+    diff: str = ""
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.substitutions or self.insertions or self.deletions)
+
+
+@dataclass
+class CorrectionResult:
+    result: dict                                  # Whisper と同じ形（segment = 公式の文）
+    sentences: List[SentenceDiff] = field(default_factory=list)
+
+    @property
+    def word_error_rate(self) -> float:
+        ref = sum(len(s.reference.split()) for s in self.sentences)
+        errors = sum(s.substitutions + s.insertions + s.deletions for s in self.sentences)
+        return errors / ref if ref else 0.0
+
+
+def _fill_missing_times(times: List[list]) -> None:
+    """Interpolate [start, end] for tokens Whisper did not hear, between their timed neighbours."""
+    n = len(times)
+    i = 0
+    while i < n:
+        if times[i][0] is not None:
+            i += 1
+            continue
+        j = i
+        while j < n and times[j][0] is None:
+            j += 1
+        left = times[i - 1][1] if i > 0 else (times[j][0] if j < n else 0.0)
+        right = times[j][0] if j < n else left
+        right = max(right, left)
+        step = (right - left) / (j - i)
+        for x in range(i, j):
+            times[x] = [round(left + step * (x - i), 3), round(left + step * (x - i + 1), 3)]
+        i = j
+
+
+def correct_transcript(words: Sequence[dict], reference_sentences: Sequence[str], band: int = 32) -> CorrectionResult:
+    """
+    Replace the Whisper wording with the official one while keeping Whisper's timing.
+
+    Every reference token takes the start/end of the Whisper word it is aligned to;
+    tokens Whisper missed are interpolated between their neighbours. The result has one
+    segment per reference sentence, so it can be fed to the clip exporter directly.
+    """
+    ref_tokens: List[str] = []
+    ref_sentence: List[int] = []
+    for s_idx, sentence in enumerate(reference_sentences):
+        for tok in sentence.split():
+            ref_tokens.append(tok)
+            ref_sentence.append(s_idx)
+    whisper_tokens = [w["word"].strip() for w in words]
+
+    with profiling.span("correct_align"):
+        pairs = align_tokens([normalize_token(t) for t in whisper_tokens],
+                             [normalize_token(t) for t in ref_tokens], band=band)
+
+    times: List[list] = [[None, None] for _ in ref_tokens]
+    probs = [0.0] * len(ref_tokens)
+    per_sentence: List[list] = [[] for _ in reference_sentences]   # (op, whisper_token, ref_token)
+    last_ref = None
+    last_op = None
+    for wi, rj in pairs:
+        if rj is not None:
+            s_idx = ref_sentence[rj]
+            if wi is not None:
+                w = words[wi]
+                times[rj] = [w["start"], w["end"]]
+                probs[rj] = w.get("probability", 0.0)
+                same = normalize_token(whisper_tokens[wi]) == normalize_token(ref_tokens[rj])
+                last_op = "equal" if same else "replace"
+                per_sentence[s_idx].append((last_op, whisper_tokens[wi], ref_tokens[rj]))
+            else:
+                last_op = "insert"
+                per_sentence[s_idx].append(("insert", None, ref_tokens[rj]))
+            last_ref = rj
+        else:
+            # Whisper にしかない語は直前の文に計上（先頭なら最初の文）
+            s_idx = ref_sentence[last_ref] if last_ref is not None else 0
+            if per_sentence:
+                per_sentence[s_idx].append(("delete", whisper_tokens[wi], None))
+            # "zum Beispiel" -> "z.B." のような置換の続きは、その語の終わりを延ばす
+            if last_op == "replace" and last_ref is not None and times[last_ref][1] is not None:
+                times[last_ref][1] = max(times[last_ref][1], words[wi]["end"])
+    _fill_missing_times(times)
+
+    segments = []
+    diffs = []
+    pos = 0
+    for s_idx, sentence in enumerate(reference_sentences):
+        n = len(sentence.split())
+        seg_words = [{"word": " " + ref_tokens[x], "start": times[x][0], "end": times[x][1],
+                      "probability": probs[x]} for x in range(pos, pos + n)]
+        pos += n
+        start = seg_words[0]["start"] if seg_words else None
+        end = seg_words[-1]["end"] if seg_words else None
+        segments.append({"id": s_idx, "start": start, "end": end, "text": " " + sentence.strip(), "words": seg_words})
+
+        ops = per_sentence[s_idx]
+        d = SentenceDiff(s_idx, sentence.strip(), " ".join(w for op, w, _ in ops if w is not None), start, end)
+        parts = []
+        for op, w, r in ops:
+            if op == "equal":
+                parts.append(r)
+            elif op == "replace":
+                d.substitutions += 1
+                parts.append(f"[-{w}-]{{+{r}+}}")
+            elif op == "insert":
+                d.insertions += 1
+                parts.append(f"{{+{r}+}}")
+            else:
+                d.deletions += 1
+                parts.append(f"[-{w}-]")
+        d.diff = " ".join(parts)
+        diffs.append(d)
+
+    text = "".join(seg["text"] for seg in segments)
+    return CorrectionResult({"text": text, "language": "de", "segments": segments}, diffs)
+
+
+def _clock(seconds: Optional[float]) -> str:
+    if seconds is None:
+        return "--:--.--"
+    return f"{int(seconds // 60):02d}:{seconds % 60:05.2f}"
+
+
+def format_report(correction: CorrectionResult) -> str:
+    changed = [s for s in correction.sentences if s.changed]
+    lines = [
+        f"文の数: {len(correction.sentences)} / 修正あり: {len(changed)} / WER: {correction.word_error_rate:.1%}",
+        "凡例: [-Whisper-]{+公式+}",
+        "",
+    ]
+    for s in changed:
+        lines.append(f"[{s.index:03d}] {_clock(s.start)}-{_clock(s.end)}  "
+                     f"置換 {s.substitutions} / 欠落 {s.insertions} / 余分 {s.deletions}")
+        lines.append(f"  Whisper: {s.whisper}")
+        lines.append(f"  公式   : {s.reference}")
+        lines.append(f"  差分   : {s.diff}")
+        lines.append("")
+    return "\n".join(lines)
+
+
+def read_reference(path: str) -> List[str]:
+    """One sentence per line, as written by subtitle_extractor."""
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def correct_episode(title_: str, reference_file: str, output_dir: str | None = None) -> CorrectionResult:
+    """
+    Correct output/{title}/words.json against the scraped reference and write
+    corrected.json, script_corrected.txt and diff_report.txt next to it.
+    """
+    output_dir = output_dir or f"output/{title_}"
+    with open(os.path.join(output_dir, WORDS_FILE), encoding="utf-8") as f:
+        result = json.load(f)
+    words = [w for seg in result["segments"] for w in seg.get("words", [])]
+
+    with profiling.span("correct"):
+        correction = correct_transcript(words, read_reference(reference_file))
+
+    with open(os.path.join(output_dir, CORRECTED_FILE), "w", encoding="utf-8") as f:
+        json.dump(correction.result, f, ensure_ascii=False)
+    with open(os.path.join(output_dir, CORRECTED_SCRIPT_FILE), "w", encoding="utf-8") as f:
+        for s in correction.sentences:
+            f.write(f"{s.reference}\n")
+    with open(os.path.join(output_dir, REPORT_FILE), "w", encoding="utf-8") as f:
+        f.write(format_report(correction))
+
+    changed = sum(1 for s in correction.sentences if s.changed)
+    print(f"📝 公式スクリプトで修正: {changed}/{len(correction.sentences)} 文 (WER {correction.word_error_rate:.1%}) "
+          f"→ {os.path.join(output_dir, REPORT_FILE)}")
+    return correction
+
+
+if __name__ == "__main__":
+    config = configparser.ConfigParser()
+    config.read('config.ini')
+
+    parser = argparse.ArgumentParser(description="Whisper のスクリプトを公式スクリプトと突き合わせて修正")
+    parser.add_argument("title", nargs="?", default=config.get("TOP_THEMA", "title", fallback=None))
+    parser.add_argument("--reference", help="公式スクリプト（省略時は input/reference/{title}.txt → input/reference.txt）")
+    args = parser.parse_args()
+    if not args.title:
+        parser.error("title を指定するか config.ini の [TOP_THEMA] title を設定してください")
+
+    reference = args.reference
+    if reference is None:
+        reference = f"input/reference/{args.title}.txt"
+        if not os.path.exists(reference):
+            reference = "input/reference.txt"
+    correct_episode(args.title, reference)
@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import time
+import zlib
+
+import profiling
+
+DEFAULT_CACHE_DIR = "cache/transcripts"
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024  # 256 MB
+CACHE_SUFFIX = ".json.z"
+
+# 後続処理で使うフィールドだけを保存する（tokens や avg_logprob などは捨てる）
+SEGMENT_KEYS = ("id", "start", "end", "text")
+WORD_KEYS = ("word", "start", "end", "probability")
+
+
+def file_sha256(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """Stream a file through SHA-256 without loading it into memory."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def compact_result(result: dict) -> dict:
+    """Strip a Whisper result down to text, language and word timestamps."""
+    segments = []
+    for seg in result.get("segments", []):
+        compact = {k: seg[k] for k in SEGMENT_KEYS if k in seg}
+        compact["words"] = [{k: w[k] for k in WORD_KEYS if k in w} for w in seg.get("words", [])]
+        segments.append(compact)
+    return {"text": result.get("text", ""), "language": result.get("language"), "segments": segments}
+
+
+class TranscriptionCache:
+    """
+    On-disk cache of Whisper results keyed by audio content + model + transcribe options.
+
+    Entries are zlib-compressed JSON; the directory is kept under `max_bytes`
+    by evicting the least recently used entries (mtime is refreshed on every hit).
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(audio_path: str, model_name: str, options: dict | None) -> str:
+        payload = json.dumps(
+            {"audio": file_sha256(audio_path), "model": model_name, "options": options or {}},
+            sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + CACHE_SUFFIX)
+
+    def get(self, key: str) -> dict | None:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        try:
+            result = json.loads(zlib.decompress(data))
+        except (zlib.error, ValueError):
+            # 壊れたエントリは捨てて再計算させる
+            os.remove(path)
+            return None
+        os.utime(path)  # LRU 用に最終利用時刻を更新
+        return result
+
+    def put(self, key: str, result: dict) -> None:
+        data = zlib.compress(json.dumps(compact_result(result), ensure_ascii=False).encode("utf-8"), 6)
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        self.evict()
+
+    def evict(self) -> None:
+        """Remove least recently used entries until the cache fits in max_bytes."""
+        entries = []
+        total = 0
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                if entry.is_file() and entry.name.endswith(CACHE_SUFFIX):
+                    st = entry.stat()
+                    entries.append((st.st_mtime, st.st_size, entry.path))
+                    total += st.st_size
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def transcribe(self, transcribe_fn, audio_path: str, model_name: str, options: dict | None = None) -> dict:
+        """Return a cached result, or call transcribe_fn(audio_path, model_name, options) and store it."""
+        key = self.make_key(audio_path, model_name, options)
+        cached = self.get(key)
+        if cached is not None:
+            profiling.count("transcript_cache_hits")
+            print(f"♻️ 文字起こしキャッシュを使用: {audio_path}")
+            return cached
+        profiling.count("transcript_cache_misses")
+        start = time.time()
+        result = transcribe_fn(audio_path, model_name, options)
+        self.put(key, result)
+        print(f"💾 文字起こし結果をキャッシュ ({time.time() - start:.1f}s)")
+        return result
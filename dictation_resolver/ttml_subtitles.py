@@ -0,0 +1,237 @@
+from __future__ import annotations
+
+import re
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass
+from typing import IO, Iterable, Iterator, List
+
+TTP_NS = "{http://www.w3.org/ns/ttml#parameter}"
+# 文の終わり（fetch_topthema_transcript と同じく . ? ! : の後で区切る）。ただし略語・序数の後は除く
+SENTENCE_END = re.compile(r"(?<=[.?!:])\s+")
+ABBREVIATIONS = {"dr", "prof", "nr", "bzw", "ca", "vgl", "usw", "etc", "st", "str", "mio", "mrd", "jh", "ggf", "inkl",
+                 "evtl"}
+# 1文字ずつの略語（"z.B." のほか "z. B." と空白を入れても同じ）
+DOTTED_ABBREVIATIONS = {"z.b.", "d.h.", "u.a.", "s.o.", "s.u.", "o.ä.", "u.ä.", "u.u.", "v.a.", "z.t."}
+MONTHS = {"januar", "jänner", "februar", "märz", "april", "mai", "juni", "juli", "august", "september", "oktober",
+          "november", "dezember"}
+CLOCK_TIME = re.compile(r"(\d+):(\d{2}):(\d{2})(?:(\.\d+)|:(\d+)(?:\.(\d+))?)?")
+OFFSET_TIME = re.compile(r"(\d+(?:\.\d+)?)(h|ms|m|s|f|t)")
+
+
+@dataclass
+class SubtitleCue:
+    begin: float
+    end: float
+    text: str
+
+
+@dataclass
+class TimedSentence:
+    index: int
+    text: str
+    start: float
+    end: float
+    start_exact: bool = True    # False: 字幕1行の途中から始まる（時刻は文字数で按分した推定値）
+    end_exact: bool = True
+
+
+@dataclass
+class _Timing:
+    frame_rate: float = 30.0
+    sub_frame_rate: int = 1
+    tick_rate: float = 1.0
+
+
+def parse_time(value: str, timing: _Timing | None = None) -> float:
+    """
+    TTML time expression -> seconds: "00:01:02.500", "00:01:02:12" (frames),
+    "62.5s", "1500ms", "75f", "900000t" (ticks), ...
+    """
+    timing = timing or _Timing()
+    value = value.strip()
+    m = CLOCK_TIME.fullmatch(value)
+    if m:
+        h, mi, s, fraction, frames, sub_frames = m.groups()
+        seconds = int(h) * 3600 + int(mi) * 60 + int(s) + (float(fraction) if fraction else 0.0)
+        if frames:
+            seconds += int(frames) / timing.frame_rate
+        if sub_frames:
+            seconds += int(sub_frames) / timing.sub_frame_rate / timing.frame_rate
+        return seconds
+    m = OFFSET_TIME.fullmatch(value)
+    if m:
+        n, unit = float(m.group(1)), m.group(2)
+        return {"h": n * 3600, "m": n * 60, "s": n, "ms": n / 1000,
+                "f": n / timing.frame_rate, "t": n / timing.tick_rate}[unit]
+    raise ValueError(f"unsupported TTML time expression: {value!r}")
+
+
+def _local(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+
+def _timing_from_root(attrib: dict) -> _Timing:
+    has_frame_rate = TTP_NS + "frameRate" in attrib
+    frame_rate = float(attrib.get(TTP_NS + "frameRate", 30))
+    multiplier = attrib.get(TTP_NS + "frameRateMultiplier")
+    if multiplier:
+        num, den = multiplier.split()
+        frame_rate = frame_rate * float(num) / float(den)
+    sub_frame_rate = int(attrib.get(TTP_NS + "subFrameRate", 1))
+    # TTML の既定: frameRate があれば 1 tick = 1 サブフレーム、なければ 1 tick = 1 秒
+    default_tick_rate = frame_rate * sub_frame_rate if has_frame_rate else 1.0
+    return _Timing(
+        frame_rate=frame_rate,
+        sub_frame_rate=sub_frame_rate,
+        tick_rate=float(attrib.get(TTP_NS + "tickRate", default_tick_rate)),
+    )
+
+
+def _collect_text(elem: ET.Element, parts: List[str]) -> None:
+    for child in elem:
+        parts.append(" " if _local(child.tag) == "br" else child.text or "")
+        _collect_text(child, parts)
+        parts.append(child.tail or "")
+
+
+def _cue_text(p: ET.Element) -> str:
+    """Text of a <p>, with <br/> (a new subtitle line) read as a space."""
+    parts = [p.text or ""]
+    _collect_text(p, parts)
+    text = "".join(parts).replace("\u00ad", "").replace("\u00a0", " ")
+    text = re.sub(r"\s+", " ", text).strip()
+    # 話者交代の「- 」を落とす
+    return re.sub(r"^-\s*", "", text)
+
+
+def iter_cues(source: str | IO[bytes]) -> Iterator[SubtitleCue]:
+    """
+    Stream the cues (<p begin=... end=...>) of an EBU-TT / TTML file with iterparse.
+
+    Every <p> is dropped from the tree once read, so memory stays constant however long
+    the broadcast is. Begin offsets on enclosing <body>/<div> elements are applied.
+    """
+    timing = _Timing()
+    stack: List[ET.Element] = []
+    offsets: List[float] = [0.0]
+    for event, elem in ET.iterparse(source, events=("start", "end")):
+        tag = _local(elem.tag)
+        if event == "start":
+            if tag == "tt":
+                timing = _timing_from_root(elem.attrib)
+            if tag in ("body", "div") and "begin" in elem.attrib:
+                offsets.append(offsets[-1] + parse_time(elem.attrib["begin"], timing))
+            else:
+                offsets.append(offsets[-1])
+            stack.append(elem)
+            continue
+
+        stack.pop()
+        offsets.pop()
+        if tag != "p":
+            continue
+        begin = elem.attrib.get("begin")
+        text = _cue_text(elem)
+        if begin is not None and text:
+            start = offsets[-1] + parse_time(begin, timing)
+            if "end" in elem.attrib:
+                end = offsets[-1] + parse_time(elem.attrib["end"], timing)
+            else:
+                end = start + parse_time(elem.attrib.get("dur", "0s"), timing)
+            yield SubtitleCue(round(start, 3), round(end, 3), text)
+        if stack:
+            stack[-1].remove(elem)   # 読み終えた字幕は木から外す（一定メモリ）
+        elem.clear()
+
+
+def _ends_sentence(text: str, following: str = "") -> bool:
+    """Whether `text` ends a sentence; `following` is the text after it (decides "am 3. Oktober" vs "im Jahr 2024.")."""
+    if not text.endswith((".", "?", "!", ":")):
+        return False
+    if not text.endswith("."):
+        return True
+    words = text[:-1].rsplit(None, 2)
+    token = words[-1] if words else ""
+    if f"{token}.".lower() in DOTTED_ABBREVIATIONS:
+        return False
+    last = token.rsplit(".", 1)[-1]
+    nxt = _next_word(following)
+    if last.isdigit():
+        # 1〜2桁で、次が小文字か月名なら序数（"am 3. Oktober", "der 2. große"）。年号などの後は文末
+        return not (len(last) <= 2 and (nxt[:1].islower() or nxt.lower() in MONTHS))
+    if last.lower() in ABBREVIATIONS:
+        return False
+    if len(last) == 1 and last.isalpha():
+        # "z. B." の各部分と、次が小文字の語なら略語。"Plan B." "Vitamin C." は文末
+        prev = words[-2] if len(words) > 1 else ""
+        if f"{prev}{last}.".lower() in DOTTED_ABBREVIATIONS or f"{last}.{nxt}".lower() in DOTTED_ABBREVIATIONS:
+            return False
+        return not nxt[:1].islower()
+    return True
+
+
+def _next_word(following: str) -> str:
+    return following.split(None, 1)[0].strip("\"'„“”‚‘’()[]«»") if following.strip() else ""
+
+
+def _split_sentences(text: str) -> List[str]:
+    """Split after . ? ! : unless the period belongs to an abbreviation or an ordinal number."""
+    pieces, start = [], 0
+    for m in SENTENCE_END.finditer(text):
+        if _ends_sentence(text[start:m.start()], text[m.end():]):
+            pieces.append(text[start:m.start()])
+            start = m.end()
+    pieces.append(text[start:])
+    return pieces
+
+
+def cues_to_sentences(cues: Iterable[SubtitleCue], offset: float | None = None) -> Iterator[TimedSentence]:
+    """
+    Merge subtitle lines into sentences. A sentence starts at the cue where its first
+    character is and ends at the cue where its last one is; inside a cue holding several
+    sentences the cue's time is shared out by character count.
+
+    `offset` is subtracted from every time; None strips whole hours when the first cue
+    starts after one hour (broadcast time code such as 10:00:00:00 at programme start).
+    """
+    index = 0
+    pending: List[tuple] = []   # (text, start, end, start_exact, end_exact) の断片（まだ文末が来ていない）
+
+    def flush():
+        nonlocal index
+        text = " ".join(p[0] for p in pending).strip()
+        if text:
+            yield TimedSentence(index, text, round(pending[0][1] - offset, 3), round(pending[-1][2] - offset, 3),
+                                pending[0][3], pending[-1][4])
+            index += 1
+        pending.clear()
+
+    for cue in cues:
+        if offset is None:
+            offset = float(int(cue.begin // 3600) * 3600)
+        # 前の字幕の最後の断片が文末かどうかは、次の語を見てから決める（"am 3." | "Oktober"）
+        if pending and _ends_sentence(pending[-1][0], cue.text):
+            yield from flush()
+        pieces = _split_sentences(cue.text)
+        total = sum(len(p) for p in pieces) or 1
+        t = cue.begin
+        for i, piece in enumerate(pieces):
+            span = (cue.end - cue.begin) * len(piece) / total
+            pending.append((piece, t, t + span, i == 0, i == len(pieces) - 1))
+            t += span
+            if i < len(pieces) - 1:
+                yield from flush()
+    yield from flush()
+
+
+def read_subtitle_sentences(source: str | IO[bytes], offset: float | None = None) -> List[TimedSentence]:
+    """Timed sentences of a subtitle file, URL or binary stream (see iter_cues / cues_to_sentences)."""
+    if isinstance(source, str) and source.startswith(("http://", "https://")):
+        import requests
+        # ダウンロードしながら解析する（ファイル全体をメモリに載せない）
+        with requests.get(source, stream=True, timeout=30) as response:
+            response.raise_for_status()
+            response.raw.decode_content = True
+            return list(cues_to_sentences(iter_cues(response.raw), offset))
+    return list(cues_to_sentences(iter_cues(source), offset))
+
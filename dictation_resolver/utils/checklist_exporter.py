@@ -0,0 +1,268 @@
+from __future__ import annotations
+
+import argparse
+import csv
+import glob
+import hashlib
+import importlib
+import json
+import os
+import shutil
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from typing import IO, Iterator, List, Optional, Tuple
+
+RESOLVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_OUTPUT_ROOT = os.path.join(RESOLVER_DIR, "output")
+DEFAULT_EXPORT_DIR = os.path.join(RESOLVER_DIR, "exports")
+STATE_FILE = "export_state.json"
+STATE_VERSION = 2
+FORMATS = ("notion", "anki", "tsv")
+EXTENSIONS = {"notion": ".md", "anki": ".csv", "tsv": ".tsv"}
+STATE_SAVE_EVERY = 50
+
+
+def _resolver_module(name: str):
+    """A module of dictation_resolver (output_manifest, clip_pack); its folder goes on sys.path on first use."""
+    if RESOLVER_DIR not in sys.path:
+        sys.path.insert(0, RESOLVER_DIR)
+    return importlib.import_module(name)
+
+
+def iter_sentences(script_path: str) -> Iterator[Tuple[int, str]]:
+    """(number, text) per sentence of script.txt, numbered like the clips and the vocabulary index."""
+    return _resolver_module("output_manifest").iter_script_sentences(script_path)
+
+
+def media_name(title: str, clip: str) -> str:
+    """Unique file name for a clip in Anki's media folder: {title}_sentence_XXX.mp3."""
+    if "#" in clip:   # clips.mp3#12（pack 形式）
+        return f"{title}_sentence_{int(clip.rsplit('#', 1)[1]):03d}.mp3"
+    return f"{title}_{os.path.basename(clip)}"
+
+
+@contextmanager
+def _atomic_output(path: str) -> Iterator[IO[str]]:
+    """Stream into a temp file next to `path` and rename it into place only if writing finished."""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    # mkstemp の 0600 ではなく、普通に open した時と同じ権限（0666 から umask を引いたもの）で作る。
+    # 名前はプロセスとスレッドごとに別なので、同じファイルを同時に書いても一時ファイルは衝突しない
+    tmp = os.path.join(directory, f".tmp-{os.getpid()}-{threading.get_ident()}-{os.path.basename(path)}")
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+            yield f
+        os.replace(tmp, path)
+    except BaseException:
+        os.remove(tmp)
+        raise
+
+
+# ---------- 形式ごとの書き出し（1行ずつ） ----------
+
+def write_notion(title: str, sentences: Iterator[Tuple[int, str]], f: IO[str], clips=None) -> int:
+    """Notion-flavoured Markdown: a page heading and one to-do per sentence."""
+    f.write(f"# {title}\n\n")
+    count = 0
+    for number, text in sentences:
+        f.write(f"- [ ] {number}. {text}\n")
+        count += 1
+    return count
+
+
+def write_anki(title: str, sentences: Iterator[Tuple[int, str]], f: IO[str], clips=None) -> int:
+    """Anki CSV (audio front, text back, episode tag) with the header lines Anki's importer reads."""
+    f.write("#separator:comma\n#html:false\n#tags column:3\n")
+    writer = csv.writer(f, lineterminator="\n")
+    count = 0
+    for (number, text), clip in zip(sentences, _pad(clips)):
+        writer.writerow([f"[sound:{media_name(title, clip)}]" if clip else "", text, title])
+        count += 1
+    return count
+
+
+def write_tsv(title: str, sentences: Iterator[Tuple[int, str]], f: IO[str], clips=None) -> int:
+    f.write("title\tnumber\tsentence\tclip\n")
+    count = 0
+    for (number, text), clip in zip(sentences, _pad(clips)):
+        f.write(f"{title}\t{number}\t{text}\t{os.path.basename(clip) if clip else ''}\n")
+        count += 1
+    return count
+
+
+WRITERS = {"notion": write_notion, "anki": write_anki, "tsv": write_tsv}
+
+
+def _pad(clips: Optional[List[str]]) -> Iterator[Optional[str]]:
+    yield from clips or ()
+    while True:
+        yield None
+
+
+# ---------- エピソード単位 ----------
+
+def file_fingerprint(path: str) -> str:
+    """Content hash of a file; "-" if it does not exist."""
+    digest = hashlib.sha256()
+    try:
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 16), b""):
+                digest.update(block)
+    except FileNotFoundError:
+        return "-"
+    return digest.hexdigest()[:20]
+
+
+def export_fingerprint(episode_dir: str, fmt: str, script_print: str, media_dir: str | None = None) -> str:
+    """
+    What an export depends on: the script, for anki/tsv also the clip list (manifest.json /
+    clips.json) and for anki the media folder the clips were copied to.
+    """
+    parts = [script_print]
+    if fmt in ("anki", "tsv"):
+        names = (_resolver_module("output_manifest").MANIFEST_FILE, _resolver_module("clip_pack").INDEX_FILE)
+        parts += [file_fingerprint(os.path.join(episode_dir, name)) for name in names]
+    if fmt == "anki" and media_dir:
+        parts.append(os.path.abspath(media_dir))
+    return hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()[:20]
+
+
+def copy_media(title: str, clips: List[str], media_dir: str) -> int:
+    """Copy the episode's clips into Anki's media folder under media_name(); clips in a pack are cut out."""
+    os.makedirs(media_dir, exist_ok=True)
+    copied = 0
+    pack = None
+    try:
+        for clip in clips:
+            target = os.path.join(media_dir, media_name(title, clip))
+            if "#" in clip:
+                if pack is None:
+                    pack = _resolver_module("clip_pack").ClipPack(os.path.dirname(clip))
+                pack.write_clip(int(clip.rsplit("#", 1)[1]), target)
+            elif os.path.exists(clip):
+                shutil.copyfile(clip, target)
+            else:
+                continue
+            copied += 1
+    finally:
+        if pack is not None:
+            pack.close()
+    return copied
+
+
+def export_episode(episode_dir: str, fmt: str, export_dir: str, media_dir: str | None = None) -> Tuple[str, int]:
+    """Write exports/{fmt}/{title}{ext} from output/{title}/script.txt; returns (path, sentences)."""
+    title = os.path.basename(os.path.normpath(episode_dir))
+    script_path = os.path.join(episode_dir, "script.txt")
+    clips = None
+    if fmt in ("anki", "tsv"):
+        # 文の番号と音声の対応は単語索引 (vocabulary_index) と同じものを使う
+        n_sentences = sum(1 for _ in iter_sentences(script_path))
+        clips = _resolver_module("output_manifest").sentence_clips(episode_dir, n_sentences)
+    out_path = os.path.join(export_dir, fmt, title + EXTENSIONS[fmt])
+    with _atomic_output(out_path) as f:
+        count = WRITERS[fmt](title, iter_sentences(script_path), f, clips)
+    if media_dir and fmt == "anki" and clips:
+        copy_media(title, clips[:count], media_dir)
+    return out_path, count
+
+
+# ---------- 全エピソード ----------
+
+class ExportState:
+    """exports/export_state.json: the export_fingerprint each (episode, format) was last exported from."""
+
+    def __init__(self, export_dir: str):
+        self.path = os.path.join(export_dir, STATE_FILE)
+        self.exported: dict = {}
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return
+        if data.get("version") == STATE_VERSION:
+            self.exported = data.get("exported", {})
+
+    def is_current(self, title: str, fmt: str, fingerprint: str, out_path: str) -> bool:
+        return self.exported.get(title, {}).get(fmt) == fingerprint and os.path.exists(out_path)
+
+    def mark(self, title: str, fmt: str, fingerprint: str) -> None:
+        self.exported.setdefault(title, {})[fmt] = fingerprint
+
+    def save(self) -> None:
+        with _atomic_output(self.path) as f:
+            json.dump({"version": STATE_VERSION, "exported": self.exported}, f, ensure_ascii=False, indent=1)
+
+
+def export_all(output_root: str = DEFAULT_OUTPUT_ROOT, formats=("notion",), export_dir: str = DEFAULT_EXPORT_DIR,
+               workers: int = 4, media_dir: str | None = None, force: bool = False,
+               titles: List[str] | None = None) -> Tuple[int, int, int]:
+    """
+    Export every output/*/script.txt in each format, skipping (episode, format) pairs whose
+    script and clips are unchanged since the last run (see export_fingerprint). Episodes are
+    streamed line by line on `workers` threads; the source scripts are only read.
+    Returns (exported, skipped, failed).
+    """
+    for fmt in formats:
+        if fmt not in WRITERS:
+            raise ValueError(f"unknown format: {fmt} (choose from {', '.join(FORMATS)})")
+    state = ExportState(export_dir)
+    jobs = []
+    skipped = 0
+    for script_path in sorted(glob.glob(os.path.join(output_root, "*", "script.txt"))):
+        episode_dir = os.path.dirname(script_path)
+        title = os.path.basename(episode_dir)
+        if titles and title not in titles:
+            continue
+        script_print = file_fingerprint(script_path)
+        for fmt in formats:
+            # 音声を切り直した・音声のコピー先を変えた時も書き出し直す
+            fingerprint = export_fingerprint(episode_dir, fmt, script_print, media_dir)
+            out_path = os.path.join(export_dir, fmt, title + EXTENSIONS[fmt])
+            if not force and state.is_current(title, fmt, fingerprint, out_path):
+                skipped += 1
+            else:
+                jobs.append((episode_dir, title, fmt, fingerprint))
+
+    exported = failed = 0
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            futures = {pool.submit(export_episode, episode_dir, fmt, export_dir, media_dir): (title, fmt, fingerprint)
+                       for episode_dir, title, fmt, fingerprint in jobs}
+            for future in as_completed(futures):
+                title, fmt, fingerprint = futures[future]
+                try:
+                    future.result()
+                except Exception as e:
+                    failed += 1
+                    print(f"❌ [{title}] {fmt}: {e}", file=sys.stderr)
+                    continue
+                state.mark(title, fmt, fingerprint)
+                exported += 1
+                if exported % STATE_SAVE_EVERY == 0:
+                    state.save()   # 途中で止めても、済んだ分は次回やり直さない
+    finally:
+        state.save()
+    print(f"📝 {exported} 件を書き出し、{skipped} 件は前回のまま" + (f"、{failed} 件失敗" if failed else ""),
+          file=sys.stderr)
+    return exported, skipped, failed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="全エピソードの script.txt をディクテーション用チェックリストに書き出す")
+    parser.add_argument("--format", nargs="+", choices=FORMATS, default=["notion"], dest="formats",
+                        help="notion: Notion 用 Markdown / anki: Anki 用 CSV / tsv: 表計算用")
+    parser.add_argument("--output-root", default=DEFAULT_OUTPUT_ROOT, help="エピソードのフォルダがある場所")
+    parser.add_argument("--out", default=DEFAULT_EXPORT_DIR, help="書き出し先（{out}/{format}/{title}.*）")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--anki-media", metavar="DIR", help="Anki の collection.media に音声もコピーする")
+    parser.add_argument("--title", nargs="+", dest="titles", help="このエピソードだけ")
+    parser.add_argument("--force", action="store_true", help="前回から変わっていなくても書き出す")
+    args = parser.parse_args()
+
+    _, _, failures = export_all(args.output_root, args.formats, args.out, args.workers, args.anki_media, args.force,
+                                args.titles)
+    raise SystemExit(1 if failures else 0)
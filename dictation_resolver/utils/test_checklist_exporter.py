@@ -0,0 +1,68 @@
+import json
+import os
+import stat
+
+from checklist_exporter import export_all, export_episode
+
+
+def _split(root, script, clips=(), title="folge-1"):
+    """An output/{title} as the splitter leaves it: script.txt and the clip names in manifest.json."""
+    out = root / "output" / title
+    out.mkdir(parents=True, exist_ok=True)
+    (out / "script.txt").write_text(script, encoding="utf-8")
+    (out / "manifest.json").write_text(json.dumps({"clips": {name: {} for name in clips}}), encoding="utf-8")
+    return out
+
+
+def _read(path):
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+
+def test_notion_numbers_sentences_without_old_checkboxes(tmp_path):
+    out = _split(tmp_path, "- [ ] 1. Eins.\n\nZwei.\n")
+    path, count = export_episode(str(out), "notion", str(tmp_path / "exports"))
+    assert count == 2
+    assert _read(path) == "# folge-1\n\n- [ ] 1. Eins.\n- [ ] 2. Zwei.\n"
+
+
+def test_anki_rows_name_clips_per_episode(tmp_path):
+    out = _split(tmp_path, "Eins.\n\nZwei.\n", ["sentence_000.mp3", "sentence_001.mp3"])
+    path, _ = export_episode(str(out), "anki", str(tmp_path / "exports"))
+    assert _read(path).splitlines()[3:] == ["[sound:folge-1_sentence_000.mp3],Eins.,folge-1",
+                                            "[sound:folge-1_sentence_001.mp3],Zwei.,folge-1"]
+
+
+def test_tsv_leaves_clips_out_when_counts_differ(tmp_path):
+    out = _split(tmp_path, "Eins.\nZwei.\nDrei.\n", ["sentence_000.mp3", "sentence_001.mp3"])
+    path, _ = export_episode(str(out), "tsv", str(tmp_path / "exports"))
+    assert [line.split("\t")[3] for line in _read(path).splitlines()[1:]] == ["", "", ""]
+
+
+def test_export_all_reexports_only_what_changed(tmp_path):
+    out = _split(tmp_path, "Eins.\nZwei.\n", ["sentence_000.mp3", "sentence_001.mp3"])
+    args = (str(tmp_path / "output"), ("notion", "tsv"), str(tmp_path / "exports"))
+    assert export_all(*args) == (2, 0, 0)
+    assert export_all(*args) == (0, 2, 0)
+    # 音声を切り直したら TSV だけ書き直す（Notion には音声が入らない）
+    _split(tmp_path, "Eins.\nZwei.\n", ["sentence_000.mp3", "sentence_002.mp3"])
+    assert export_all(*args) == (1, 1, 0)
+    (out / "script.txt").write_text("Eins.\nDrei.\n", encoding="utf-8")
+    assert export_all(*args) == (2, 0, 0)
+
+
+def test_anki_reexported_for_another_media_dir(tmp_path):
+    _split(tmp_path, "Eins.\n", ["sentence_000.mp3"])
+    args = (str(tmp_path / "output"), ("anki",), str(tmp_path / "exports"), 1)
+    assert export_all(*args, media_dir=str(tmp_path / "media-a")) == (1, 0, 0)
+    assert export_all(*args, media_dir=str(tmp_path / "media-a")) == (0, 1, 0)
+    assert export_all(*args, media_dir=str(tmp_path / "media-b")) == (1, 0, 0)
+
+
+def test_exports_get_the_mode_of_a_normally_created_file(tmp_path):
+    out = _split(tmp_path, "Eins.\n")
+    path, _ = export_episode(str(out), "notion", str(tmp_path / "exports"))
+    plain = tmp_path / "exports" / "plain.txt"
+    plain.write_text("", encoding="utf-8")
+    assert stat.S_IMODE(os.stat(path).st_mode) == stat.S_IMODE(os.stat(plain).st_mode)
+    assert os.listdir(os.path.dirname(path)) == ["folge-1.md"]
@@ -1,15 +1,19 @@
 import configparser
+import os
 
+from checklist_exporter import iter_sentences, write_notion
 
-def add_todo_for_notion(script_path):
-    # read script.txt
-    with open(script_path, "r", encoding="utf-8") as f:
-        lines = [line.strip() for line in f if line.strip()]
 
-    with open(script_path, "w", encoding="utf-8") as f:
-        for i, line in enumerate(lines, 1):
-            if line.strip() != '':
-                f.write(f"- [ ] {i}. {line.strip()}\n")
+def add_todo_for_notion(script_path, output_path=None):
+    """
+    Write script.txt as a Notion to-do list (script_notion.md next to it by default).
+    script.txt itself is left as it is, and running this again gives the same file.
+    """
+    output_path = output_path or os.path.join(os.path.dirname(script_path), "script_notion.md")
+    title = os.path.basename(os.path.dirname(os.path.abspath(script_path)))
+    with open(output_path, "w", encoding="utf-8") as f:
+        write_notion(title, iter_sentences(script_path), f)
+    return output_path
 
 
 if __name__ == "__main__":
@@ -19,4 +23,4 @@ if __name__ == "__main__":
     title = config['TOP_THEMA']['title']
 
     script_location = f"../output/{title}/script.txt"
-    add_todo_for_notion(script_location)
\ No newline at end of file
+    print(f"📝 {add_todo_for_notion(script_location)}")
@@ -0,0 +1,418 @@
+from __future__ import annotations
+
+import argparse
+import configparser
+import glob
+import hashlib
+import json
+import os
+import re
+import shutil
+import sqlite3
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Callable, List, Optional, Sequence, Tuple
+
+from output_manifest import iter_script_sentences, sentence_clips
+
+VOCABULARY_FILE = "vocabulary.sqlite3"
+DEFAULT_INDEX_PATH = os.path.join("output", VOCABULARY_FILE)
+REFERENCE_DIR = "input/reference"
+SOURCES = ("script", "reference")
+# 文中の単語（ハイフンでつないだ複合語も1語として扱う）
+WORD_PATTERN = re.compile(r"[^\W\d_]+(?:-[^\W\d_]+)*")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id          INTEGER PRIMARY KEY,
+    title       TEXT NOT NULL,
+    source      TEXT NOT NULL,
+    path        TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    indexed_at  TEXT NOT NULL,
+    UNIQUE (title, source)
+);
+CREATE TABLE IF NOT EXISTS sentences (
+    id          INTEGER PRIMARY KEY,
+    document_id INTEGER NOT NULL,
+    number      INTEGER NOT NULL,
+    text        TEXT NOT NULL,
+    clip        TEXT
+);
+CREATE INDEX IF NOT EXISTS sentences_document ON sentences (document_id);
+CREATE TABLE IF NOT EXISTS postings (
+    term        TEXT NOT NULL,
+    lemma       TEXT NOT NULL,
+    sentence_id INTEGER NOT NULL,
+    position    INTEGER NOT NULL,
+    PRIMARY KEY (term, sentence_id, position)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS postings_lemma ON postings (lemma, sentence_id);
+CREATE INDEX IF NOT EXISTS postings_sentence ON postings (sentence_id);
+CREATE TABLE IF NOT EXISTS term_stats (
+    kind        TEXT NOT NULL,
+    term        TEXT NOT NULL,
+    occurrences INTEGER NOT NULL,
+    sentences   INTEGER NOT NULL,
+    episodes    INTEGER NOT NULL,
+    PRIMARY KEY (kind, term)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS term_stats_rank ON term_stats (kind, occurrences DESC);
+"""
+
+
+@dataclass
+class SentenceHit:
+    title: str
+    source: str
+    number: int
+    text: str
+    clip: Optional[str]    # output/{title}/sentence_XXX.mp3、pack なら output/{title}/clips.mp3#XXX
+
+
+@dataclass
+class TermStats:
+    term: str
+    occurrences: int
+    sentences: int
+    episodes: int
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+def load_lemmatizer() -> Tuple[str, Callable[[str], str]]:
+    """(name, word -> lemma). simplemma if installed (hätte -> haben); otherwise the word itself."""
+    try:
+        import simplemma
+    except ImportError:
+        return "none", lambda word: word
+    return f"simplemma-{getattr(simplemma, '__version__', '')}", lambda word: simplemma.lemmatize(word, lang="de")
+
+
+def tokenize(text: str) -> List[str]:
+    return WORD_PATTERN.findall(text)
+
+
+# ---------- エピソードの読み込み ----------
+
+def read_episode(output_dir: str) -> List[Tuple[int, str, Optional[str]]]:
+    """
+    (number, text, clip) for every sentence of output/{title}/script.txt, numbered and paired
+    with its clip the same way as the checklist export (see output_manifest.sentence_clips).
+    """
+    sentences = list(iter_script_sentences(os.path.join(output_dir, "script.txt")))
+    clips = sentence_clips(output_dir, len(sentences)) or [None] * len(sentences)
+    return [(number, text, clip) for (number, text), clip in zip(sentences, clips)]
+
+
+def read_reference_sentences(path: str) -> List[Tuple[int, str, Optional[str]]]:
+    """Official script (one sentence per line, as written by subtitle_extractor); no clips."""
+    return [(number, text, None) for number, text in iter_script_sentences(path)]
+
+
+def _fingerprint(rows: Sequence[tuple], lemmatizer: str) -> str:
+    return hashlib.sha256(json.dumps([lemmatizer, rows], ensure_ascii=False).encode("utf-8")).hexdigest()[:20]
+
+
+# ---------- 索引 ----------
+
+class VocabularyIndex:
+    """
+    SQLite inverted index over every episode's sentences: word form and lemma -> sentence
+    (episode, number, text, clip), plus occurrence / sentence / episode counts per word.
+
+    Episodes are (re)indexed one at a time and only when their sentences changed, so the
+    update after a split touches that episode's rows only. Per-word counts are kept up to
+    date in term_stats, which makes frequency lists an index scan.
+    """
+
+    def __init__(self, path: str = DEFAULT_INDEX_PATH):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        # バッチ処理では複数のエピソードが同時に書き込むので、ロック待ちを長めにとる
+        self.conn = sqlite3.connect(path, timeout=60)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        self.lemmatizer_name, self._lemmatize = load_lemmatizer()
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self) -> "VocabularyIndex":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    # --- 更新 ---
+
+    def index_document(self, title: str, source: str, path: str, rows: Sequence[tuple]) -> bool:
+        """Replace the sentences of (title, source) with `rows` (number, text, clip); False if unchanged."""
+        if source not in SOURCES:
+            raise ValueError(f"unknown source: {source} (choose from {', '.join(SOURCES)})")
+        fingerprint = _fingerprint(rows, self.lemmatizer_name)
+        row = self.conn.execute("SELECT id, fingerprint FROM documents WHERE title = ? AND source = ?",
+                                (title, source)).fetchone()
+        if row is not None and row[1] == fingerprint:
+            return False
+
+        lemma_of = {}
+        postings = []
+        with self.conn:
+            # 書き込みロックを最初に取る（並行して更新する他のエピソードとは busy timeout で順番待ち）
+            self.conn.execute("BEGIN IMMEDIATE")
+            if row is not None:
+                self._delete_document(row[0], title)
+            cur = self.conn.execute(
+                "INSERT INTO documents (title, source, path, fingerprint, indexed_at) VALUES (?, ?, ?, ?, ?)",
+                (title, source, path, fingerprint, _now()))
+            document_id = cur.lastrowid
+            for number, text, clip in rows:
+                sentence_id = self.conn.execute(
+                    "INSERT INTO sentences (document_id, number, text, clip) VALUES (?, ?, ?, ?)",
+                    (document_id, number, text, clip)).lastrowid
+                for position, word in enumerate(tokenize(text)):
+                    if word not in lemma_of:
+                        lemma_of[word] = self._lemmatize(word).casefold()
+                    postings.append((word.casefold(), lemma_of[word], sentence_id, position))
+            self.conn.executemany("INSERT OR IGNORE INTO postings (term, lemma, sentence_id, position) "
+                                  "VALUES (?, ?, ?, ?)", postings)
+            self._add_stats(document_id, title, 1)
+        return True
+
+    def remove_document(self, title: str, source: str) -> bool:
+        row = self.conn.execute("SELECT id FROM documents WHERE title = ? AND source = ?", (title, source)).fetchone()
+        if row is None:
+            return False
+        with self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            self._delete_document(row[0], title)
+        return True
+
+    def _delete_document(self, document_id: int, title: str) -> None:
+        self._add_stats(document_id, title, -1)
+        sentence_ids = "SELECT id FROM sentences WHERE document_id = ?"
+        self.conn.execute(f"DELETE FROM postings WHERE sentence_id IN ({sentence_ids})", (document_id,))
+        self.conn.execute("DELETE FROM sentences WHERE document_id = ?", (document_id,))
+        self.conn.execute("DELETE FROM documents WHERE id = ?", (document_id,))
+
+    def _document_counts(self, document_id: int) -> dict:
+        """{(kind, word): (occurrences, sentences)} of one document."""
+        counts = {}
+        for kind in ("term", "lemma"):
+            for word, occurrences, sentences in self.conn.execute(
+                    f"SELECT {kind}, COUNT(*), COUNT(DISTINCT sentence_id) FROM postings "
+                    f"WHERE sentence_id IN (SELECT id FROM sentences WHERE document_id = ?) GROUP BY {kind}",
+                    (document_id,)):
+                counts[(kind, word)] = (occurrences, sentences)
+        return counts
+
+    def _add_stats(self, document_id: int, title: str, sign: int) -> None:
+        """
+        Add (sign=1) or subtract (sign=-1) one document's counts to term_stats. Only this
+        document's words are touched, so an update costs the same however large the corpus is.
+        A word counts once per episode even if both its script and its reference contain it.
+        """
+        in_siblings = set()
+        for (sibling,) in self.conn.execute("SELECT id FROM documents WHERE title = ? AND id != ?",
+                                            (title, document_id)).fetchall():
+            in_siblings.update(self._document_counts(sibling))
+        rows = [(kind, word, sign * occurrences, sign * sentences, 0 if (kind, word) in in_siblings else sign)
+                for (kind, word), (occurrences, sentences) in self._document_counts(document_id).items()]
+        self.conn.executemany(
+            "INSERT INTO term_stats (kind, term, occurrences, sentences, episodes) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (kind, term) DO UPDATE SET occurrences = occurrences + excluded.occurrences, "
+            "sentences = sentences + excluded.sentences, episodes = episodes + excluded.episodes", rows)
+        if sign < 0:
+            # 減らした語だけを主キーで見る（表全体は走査しない）
+            self.conn.executemany("DELETE FROM term_stats WHERE kind = ? AND term = ? AND occurrences <= 0",
+                                  [row[:2] for row in rows])
+
+    def update_episode(self, output_dir: str) -> bool:
+        """(Re)index output/{title}/script.txt with its clips; False if nothing changed."""
+        title = os.path.basename(os.path.normpath(output_dir))
+        if not os.path.exists(os.path.join(output_dir, "script.txt")):
+            return self.remove_document(title, "script")
+        return self.index_document(title, "script", os.path.join(output_dir, "script.txt"), read_episode(output_dir))
+
+    def update_reference(self, title: str, path: str) -> bool:
+        return self.index_document(title, "reference", path, read_reference_sentences(path))
+
+    def update_all(self, output_root: str = "output", reference_dir: str = REFERENCE_DIR,
+                   extra_references: Sequence[Tuple[str, str]] = ()) -> Tuple[int, int]:
+        """
+        Index every output/*/script.txt, input/reference/*.txt and the (title, path) pairs in
+        `extra_references`; drop episodes whose files are gone. Returns (documents updated, documents removed).
+        """
+        seen = set()
+        updated = 0
+        for script in sorted(glob.glob(os.path.join(output_root, "*", "script.txt"))):
+            output_dir = os.path.dirname(script)
+            seen.add((os.path.basename(output_dir), "script"))
+            updated += self.update_episode(output_dir)
+        references = [(os.path.splitext(os.path.basename(path))[0], path)
+                      for path in sorted(glob.glob(os.path.join(reference_dir, "*.txt")))]
+        for title, path in references + list(extra_references):
+            if (title, "reference") in seen:
+                continue
+            seen.add((title, "reference"))
+            updated += self.update_reference(title, path)
+        removed = 0
+        for title, source in self.conn.execute("SELECT title, source FROM documents").fetchall():
+            if (title, source) not in seen:
+                removed += self.remove_document(title, source)
+        return updated, removed
+
+    # --- 検索 ---
+
+    def search(self, words: Sequence[str], lemma: bool = False, match_all: bool = False,
+               source: str | None = None, limit: int | None = None) -> List[SentenceHit]:
+        """
+        Sentences containing the words (any of them; all of them with `match_all`).
+        A trailing * matches a prefix ("hätt*"); with `lemma` the words are lemmas
+        ("haben" finds hat, hatte, hätten, ...).
+        """
+        column = "lemma" if lemma else "term"
+        clauses, params = [], []
+        for word in words:
+            word = word.casefold()
+            if word.endswith("*"):
+                clauses.append(f"SELECT sentence_id FROM postings WHERE {column} GLOB ?")
+                params.append(re.sub(r"([\[\]?*])", r"[\1]", word[:-1]) + "*")
+            else:
+                clauses.append(f"SELECT sentence_id FROM postings WHERE {column} = ?")
+                params.append(word)
+        if not clauses:
+            return []
+        matching = (" INTERSECT " if match_all else " UNION ").join(clauses)
+        sql = (f"SELECT d.title, d.source, s.number, s.text, s.clip FROM sentences s "
+               f"JOIN documents d ON d.id = s.document_id WHERE s.id IN ({matching})")
+        if source:
+            sql += " AND d.source = ?"
+            params.append(source)
+        sql += " ORDER BY d.title, d.source DESC, s.number"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return [SentenceHit(*row) for row in self.conn.execute(sql, params)]
+
+    def forms(self, lemma: str) -> List[TermStats]:
+        """Word forms seen for a lemma, most frequent first."""
+        rows = self.conn.execute(
+            "SELECT p.term, COUNT(*), COUNT(DISTINCT p.sentence_id), COUNT(DISTINCT d.title) FROM postings p "
+            "JOIN sentences s ON s.id = p.sentence_id JOIN documents d ON d.id = s.document_id "
+            "WHERE p.lemma = ? GROUP BY p.term ORDER BY 2 DESC, 1", (lemma.casefold(),))
+        return [TermStats(*row) for row in rows]
+
+    def frequencies(self, lemma: bool = False, limit: int = 50, min_occurrences: int = 1) -> List[TermStats]:
+        rows = self.conn.execute(
+            "SELECT term, occurrences, sentences, episodes FROM term_stats WHERE kind = ? AND occurrences >= ? "
+            "ORDER BY occurrences DESC, term LIMIT ?", ("lemma" if lemma else "term", min_occurrences, limit))
+        return [TermStats(*row) for row in rows]
+
+    def stats(self, word: str, lemma: bool = False) -> TermStats | None:
+        row = self.conn.execute("SELECT term, occurrences, sentences, episodes FROM term_stats "
+                                "WHERE kind = ? AND term = ?", ("lemma" if lemma else "term", word.casefold())).fetchone()
+        return TermStats(*row) if row else None
+
+    def counts(self) -> dict:
+        return {
+            "episodes": self.conn.execute("SELECT COUNT(DISTINCT title) FROM documents").fetchone()[0],
+            "sentences": self.conn.execute("SELECT COUNT(*) FROM sentences").fetchone()[0],
+            "words": self.conn.execute("SELECT COUNT(*) FROM postings").fetchone()[0],
+            "distinct_words": self.conn.execute("SELECT COUNT(*) FROM term_stats WHERE kind = 'term'").fetchone()[0],
+            "lemmatizer": self.lemmatizer_name,
+        }
+
+
+def update_vocabulary_index(output_dir: str) -> bool:
+    """Re-index one episode after a split, in output/vocabulary.sqlite3 next to its folder."""
+    index_path = os.path.join(os.path.dirname(os.path.normpath(output_dir)), VOCABULARY_FILE)
+    with VocabularyIndex(index_path) as index:
+        return index.update_episode(output_dir)
+
+
+def export_drill(hits: Sequence[SentenceHit], out_dir: str) -> int:
+    """
+    Copy the clips of the hits into one folder (title_XXX.mp3, clips from a pack are cut
+    out of clips.mp3) with a script.txt in the same order. Returns the number of clips.
+    """
+    from clip_pack import ClipPack
+
+    os.makedirs(out_dir, exist_ok=True)
+    packs = {}
+    lines = []
+    try:
+        for hit in hits:
+            if not hit.clip:
+                continue
+            name = f"{hit.title}_{hit.number:03d}.mp3"
+            if "#" in hit.clip:
+                pack_file, number = hit.clip.rsplit("#", 1)
+                directory = os.path.dirname(pack_file)
+                if directory not in packs:
+                    packs[directory] = ClipPack(directory)
+                packs[directory].write_clip(int(number), os.path.join(out_dir, name))
+            elif os.path.exists(hit.clip):
+                shutil.copyfile(hit.clip, os.path.join(out_dir, name))
+            else:
+                continue
+            lines.append(f"{name}\t{hit.text}\n")
+    finally:
+        for pack in packs.values():
+            pack.close()
+    with open(os.path.join(out_dir, "script.txt"), "w", encoding="utf-8") as f:
+        f.writelines(lines)
+    return len(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="全エピソードの文を単語・見出し語で検索する索引")
+    parser.add_argument("--index", default=DEFAULT_INDEX_PATH, help="索引ファイル")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_update = sub.add_parser("update", help="output/*/script.txt と input/reference/*.txt を索引に反映（変わった分だけ）")
+    p_update.add_argument("--output-root", default="output")
+    p_update.add_argument("--reference-dir", default=REFERENCE_DIR)
+    p_search = sub.add_parser("search", help="単語を含む文を探す（末尾 * で前方一致）")
+    p_search.add_argument("words", nargs="+")
+    p_search.add_argument("--lemma", action="store_true", help="見出し語で探す（haben → hat, hätte, ...）")
+    p_search.add_argument("--all", action="store_true", help="すべての単語を含む文だけ")
+    p_search.add_argument("--source", choices=SOURCES)
+    p_search.add_argument("--limit", type=int)
+    p_search.add_argument("--drill", metavar="DIR", help="見つかった文の音声を DIR にまとめてコピー")
+    p_forms = sub.add_parser("forms", help="見出し語の変化形と出現回数")
+    p_forms.add_argument("lemma")
+    p_freq = sub.add_parser("freq", help="よく出る単語")
+    p_freq.add_argument("--lemma", action="store_true")
+    p_freq.add_argument("--limit", type=int, default=50)
+    sub.add_parser("stats", help="索引の件数")
+    args = parser.parse_args()
+
+    with VocabularyIndex(args.index) as vocabulary:
+        if args.command == "update":
+            # main.py の単発実行では公式スクリプトが input/reference.txt に置かれる（config.ini のタイトル）
+            config = configparser.ConfigParser()
+            config.read("config.ini")
+            title = config.get("TOP_THEMA", "title", fallback=None)
+            extra = [(title, "input/reference.txt")] if title and os.path.exists("input/reference.txt") else []
+            updated, removed = vocabulary.update_all(args.output_root, args.reference_dir, extra)
+            print(f"🔎 {updated} 件を索引に反映、{removed} 件を削除（{vocabulary.counts()['sentences']} 文）")
+        elif args.command == "search":
+            hits = vocabulary.search(args.words, lemma=args.lemma, match_all=args.all, source=args.source,
+                                     limit=args.limit)
+            for hit in hits:
+                print(f"{hit.title}\t{hit.source}\t{hit.number:03d}\t{hit.clip or ''}\t{hit.text}")
+            if args.drill:
+                print(f"🎧 {export_drill(hits, args.drill)} 文の音声を {args.drill} にコピー")
+        elif args.command == "forms":
+            for s in vocabulary.forms(args.lemma):
+                print(f"{s.term}\t{s.occurrences}\t{s.sentences}\t{s.episodes}")
+        elif args.command == "freq":
+            for s in vocabulary.frequencies(lemma=args.lemma, limit=args.limit):
+                print(f"{s.term}\t{s.occurrences}\t{s.sentences}\t{s.episodes}")
+        else:
+            for key, value in vocabulary.counts().items():
+                print(f"{key}\t{value}")
@@ -1,69 +1,406 @@
+from __future__ import annotations
+
 import configparser
+import json
 import os
 import shutil
-import whisper
-from pydub import AudioSegment
-import nltk
-from nltk.tokenize import sent_tokenize
+import sqlite3
+import tempfile
+
+import profiling
+from boundary_refiner import ClipSettings, padded_ranges, quietest_points, refine_cut_points
+from chunked_transcription import DEFAULT_CHUNK_SECONDS, transcribe_chunked
+from clip_exporter import ClipSpec, export_clips
+from clip_pack import INDEX_FILE, PACK_FILE
+from pcm_audio import CLIP_SAMPLE_RATE, WHISPER_SAMPLE_RATE, decode_audio
+from sentence_aligner import align_sentences
+from transcript_corrector import WORDS_FILE, correct_transcript, read_reference
+from output_manifest import (ENCODERS, MANAGED_FILE_PATTERN, OutputManifest, atomic_write_text, clip_fingerprint,
+                             text_sha256)
+from transcription_cache import TranscriptionCache, compact_result, file_sha256
+from vocabulary_index import update_vocabulary_index
+from whisper_worker import DEFAULT_MODEL, transcribe_local, worker_from_config
+
+# これ未満の confidence の文は警告を出す
+LOW_CONFIDENCE = 0.9
+# 字幕1行の途中にある文の境界（文字数で按分した推定値）は、この範囲で一番静かな所へ寄せる
+SUBTITLE_SNAP_MS = 800
+# 文の区切り: Whisper の文字起こしを NLTK で分割 / 公式スクリプト（reference.txt）の行
+SENTENCE_SOURCES = ("whisper", "reference")
+
+PUNKT_RESOURCE = "tokenizers/punkt_tab"
+
+
+def ensure_punkt() -> None:
+    """
+    Check (locally, without network access) that the NLTK sentence tokenizer is installed,
+    so a missing model fails before Whisper runs rather than after.
+    """
+    import nltk
+    try:
+        nltk.data.find(PUNKT_RESOURCE)
+    except LookupError:
+        raise RuntimeError(
+            "NLTK の文分割モデル punkt_tab が見つかりません。一度だけ次を実行してください:\n"
+            "    python -m nltk.downloader punkt_tab\n"
+            "（ネットワークに繋がらない環境では sentence_source = reference でも区切れます）"
+        ) from None
+
+
+def transcribe_audio(input_file: str, model_name: str, options: dict, worker=None,
+                     cache: TranscriptionCache | None = None, audio=None) -> dict:
+    """
+    Run Whisper through the worker (or in-process), consulting the on-disk cache first.
+
+    `audio` replaces what Whisper receives (decoded samples or a PCM descriptor);
+    the cache key is always computed from input_file.
+    """
+    payload = input_file if audio is None else audio
+
+    def run(_audio_path, model, opts):
+        if worker is not None:
+            # ワーカーは別の作業ディレクトリで動いている可能性があるので絶対パスで渡す
+            src = os.path.abspath(payload) if isinstance(payload, str) else payload
+            return worker.transcribe(src, model, opts)
+        return transcribe_local(payload, model, opts)
+
+    if cache is None:
+        return run(input_file, model_name, options)
+    return cache.transcribe(run, input_file, model_name, options)
+
+
+def transcribe_audio_chunked(input_file: str, model_name: str, options: dict, jobs: int,
+                             chunk_seconds: int = DEFAULT_CHUNK_SECONDS, cache: TranscriptionCache | None = None,
+                             pcm=None) -> dict:
+    """
+    Transcribe in chunks of at most `chunk_seconds`, cut at pauses, on `jobs` processes
+    (see chunked_transcription.py). The audio is only decoded on a cache miss.
+    """
+    def run(_audio_path, model, _opts):
+        audio = pcm
+        if audio is None:
+            with profiling.span("decode"):
+                audio = decode_audio(input_file)
+        try:
+            return transcribe_chunked(audio.samples, audio.sample_rate, model, options, jobs, chunk_seconds)
+        finally:
+            if pcm is None:
+                audio.close()
+
+    # チャンク長が変わると結果も変わるのでキャッシュキーに含める
+    opts = {**options, "chunk_seconds": chunk_seconds}
+    if cache is None:
+        return run(input_file, model_name, opts)
+    return cache.transcribe(run, input_file, model_name, opts)
 
 
-def split_audio_and_generate_transcript(title_: str):
-    nltk.download("punkt")
+def sentence_source_from_config(config: configparser.ConfigParser) -> str:
+    """`[WHISPER] sentence_source` from config.ini, checked against SENTENCE_SOURCES."""
+    source = config.get("WHISPER", "sentence_source", fallback="whisper").strip()
+    if source not in SENTENCE_SOURCES:
+        raise ValueError(f"unknown sentence_source: {source} (choose from {', '.join(SENTENCE_SOURCES)})")
+    return source
+
+
+def split_options_from_config(config: configparser.ConfigParser) -> dict:
+    """Keyword arguments for split_audio_and_generate_transcript from config.ini `[WHISPER]` / `[CLIPS]`."""
+    return {
+        "export_mode": config.get("WHISPER", "export_mode", fallback="pool"),
+        "shared_decode": config.getboolean("WHISPER", "shared_decode", fallback=False),
+        "clip_settings": ClipSettings.from_config(config),
+        "parallel_jobs": config.getint("WHISPER", "parallel_jobs", fallback=1),
+        "chunk_seconds": config.getint("WHISPER", "chunk_seconds", fallback=DEFAULT_CHUNK_SECONDS),
+        "incremental": config.getboolean("CLIPS", "incremental", fallback=True),
+    }
+
+
+def split_audio_and_generate_transcript(title_: str, worker=None, model_name: str = DEFAULT_MODEL,
+                                        use_cache: bool = True, export_mode: str = "pool",
+                                        shared_decode: bool = False, input_file: str | None = None,
+                                        reference_file: str | None = None, clip_settings: ClipSettings | None = None,
+                                        parallel_jobs: int = 1, chunk_seconds: int = DEFAULT_CHUNK_SECONDS,
+                                        incremental: bool = True):
+    """
+    Transcribe input/audio/{title}.mp3 and export one clip per sentence.
+
+    `worker` is anything with transcribe(audio, model_name, options) — a WhisperWorker or
+    RemoteWhisperWorker keeps the model warm across episodes. Without it the model is
+    loaded (once) into the current process.
+    Transcripts are cached under cache/transcripts, so re-splitting an unchanged MP3
+    skips Whisper entirely. `export_mode` is one of clip_exporter.EXPORT_MODES.
+    With `shared_decode` the MP3 is decoded once to 16 kHz mono PCM that feeds both
+    Whisper and the clip slicing (clips are then 16 kHz mono as well).
+    With `reference_file` the clips and script.txt follow the official sentences
+    (one per line, as written by subtitle_extractor) instead of NLTK's split of the
+    Whisper text, so sentence_XXX.mp3 lines up with line XXX of the reference.
+    `clip_settings` (config.ini `[CLIPS]`) controls padding and whether cut points are
+    snapped into the pauses next to the word timestamps.
+    With `parallel_jobs` > 1 long audio is split at pauses into chunks of at most
+    `chunk_seconds` and transcribed on that many processes (`worker` is not used then).
+    With `incremental` output/{title} is kept: only clips whose fingerprint in manifest.json
+    changed are re-encoded, stale clips are removed and a hand-edited script.txt is left alone
+    (the new script goes to script.new.txt). Without it the folder is wiped first.
+    Afterwards the episode's sentences are re-indexed in output/vocabulary.sqlite3 (see vocabulary_index).
+    """
+    reference_sentences = read_reference(reference_file) if reference_file else None
+    if reference_sentences is None:
+        ensure_punkt()
     # --- 設定 ---
     # 入力ファイル
-    input_file = f"input/audio/{title_}.mp3"
+    input_file = input_file or f"input/audio/{title_}.mp3"
     output_dir = f"output/{title_}"
     script_file = "script.txt"
-    silence_duration = 500  # 無音（ms）
+    clip_settings = clip_settings or ClipSettings()
 
-    # --- 出力ディレクトリ初期化 ---
-    if os.path.exists(output_dir):
+    # --- 出力ディレクトリ初期化（incremental なら消さずに差分だけ書き直す） ---
+    if not incremental and os.path.exists(output_dir):
         shutil.rmtree(output_dir)
     os.makedirs(output_dir, exist_ok=True)
 
     # --- モデル読み込み & 文字起こし ---
-    model = whisper.load_model("base")
-    result = model.transcribe(input_file, word_timestamps=True)
+    options = {"word_timestamps": True}
+    cache = TranscriptionCache() if use_cache else None
+    # 共有デコード: ワーカーが別プロセスなら memmap ファイル経由で渡す（コピーしない）
+    pcm = None
+    if shared_decode:
+        with profiling.span("decode"):
+            pcm = decode_audio(input_file, use_mmap=worker is not None and parallel_jobs <= 1)
+    try:
+        whisper_input = None if pcm is None else (pcm.descriptor() if pcm.path else pcm.samples)
+        with profiling.span("transcribe"):
+            if parallel_jobs > 1:
+                result = transcribe_audio_chunked(input_file, model_name, options, parallel_jobs, chunk_seconds,
+                                                  cache=cache, pcm=pcm)
+            else:
+                result = transcribe_audio(input_file, model_name, options, worker=worker, cache=cache,
+                                          audio=whisper_input)
+        _write_sentences_and_clips(result, input_file, output_dir, script_file, clip_settings, export_mode, pcm,
+                                   reference_sentences, OutputManifest(output_dir))
+    finally:
+        if pcm is not None:
+            pcm.close()
+
+
+def split_audio_from_subtitles(title_: str, subtitle_file, input_file: str | None = None,
+                               offset: float | None = None, export_mode: str = "pool", shared_decode: bool = False,
+                               clip_settings: ClipSettings | None = None, incremental: bool = True) -> int:
+    """
+    Export one clip per sentence of a timed subtitle file (EBU-TT / TTML, e.g. Tagesschau),
+    taking the times from the subtitles instead of Whisper. Returns the number of sentences.
+
+    `subtitle_file` is a path or a binary stream; see ttml_subtitles.cues_to_sentences for `offset`.
+    The clip options and output layout are those of split_audio_and_generate_transcript.
+    """
+    from ttml_subtitles import read_subtitle_sentences
+
+    input_file = input_file or f"input/audio/{title_}.mp3"
+    output_dir = f"output/{title_}"
+    clip_settings = clip_settings or ClipSettings()
+    if not incremental and os.path.exists(output_dir):
+        shutil.rmtree(output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+
+    with profiling.span("parse_subtitles"):
+        sentences = read_subtitle_sentences(subtitle_file, offset)
+    print(f"📜 字幕から {len(sentences)} 文を読み込み（Whisper は使いません）")
 
-    # --- 音声読み込み ---
-    audio = AudioSegment.from_file(input_file)
-    silence = AudioSegment.silent(duration=silence_duration)
+    # PCM は推定値の境界の補正・区切り位置の補正・切り出しで1回だけデコードして使い回す
+    estimated = any(not (s.start_exact and s.end_exact) for s in sentences)
+    pcm = None
+    if shared_decode or estimated or (clip_settings.refine and sentences):
+        with profiling.span("decode"):
+            pcm = decode_audio(input_file, WHISPER_SAMPLE_RATE if shared_decode else CLIP_SAMPLE_RATE, use_mmap=True)
+    try:
+        if pcm is not None and estimated:
+            with profiling.span("snap_subtitle_boundaries"):
+                _snap_estimated_boundaries(sentences, pcm)
+        # 字幕の文そのものなので confidence は 1
+        timed = [(s.index, s.text, s.start, s.end, 1.0) for s in sentences]
+        _export_timed_sentences(timed, input_file, output_dir, "script.txt", clip_settings, export_mode, pcm,
+                                OutputManifest(output_dir))
+    finally:
+        if pcm is not None:
+            pcm.close()
+    return len(timed)
 
+
+def _snap_estimated_boundaries(sentences: list, pcm) -> None:
+    """Move sentence boundaries that fall inside a subtitle line into the pause nearby."""
+    points = [(i, "start") for i, s in enumerate(sentences) if not s.start_exact]
+    points += [(i, "end") for i, s in enumerate(sentences) if not s.end_exact]
+    snapped = quietest_points(pcm.samples, pcm.sample_rate, [getattr(sentences[i], k) * 1000 for i, k in points],
+                              SUBTITLE_SNAP_MS)
+    for (i, key), ms in zip(points, snapped):
+        setattr(sentences[i], key, round(ms / 1000, 3))
+
+
+def _time_reference_sentences(words: list, reference_sentences: list) -> list:
+    """
+    (index, text, start, end, confidence) for each official sentence, from one alignment
+    pass over all words. confidence = share of the sentence's words Whisper actually heard.
+    """
+    correction = correct_transcript(words, reference_sentences)
+    timed = []
+    for seg, diff in zip(correction.result["segments"], correction.sentences):
+        if seg["start"] is None:
+            continue
+        n = len(seg["words"])
+        timed.append((seg["id"], diff.reference, seg["start"], seg["end"], round((n - diff.insertions) / n, 3)))
+    return timed
+
+
+def _cut_ranges(timed: list, settings: ClipSettings, pcm=None) -> list:
+    """(start_ms, end_ms) per sentence: snapped into pauses when `pcm` (decoded audio) is given, then padded."""
+    starts = [start * 1000 for _, _, start, _, _ in timed]
+    ends = [end * 1000 for _, _, _, end, _ in timed]
+    if pcm is None or not timed:
+        return padded_ranges(starts, ends, settings)
+    with profiling.span("refine_boundaries"):
+        starts, ends = refine_cut_points(pcm.samples, pcm.sample_rate, starts, ends, settings)
+        return padded_ranges(starts, ends, settings, pcm.duration_ms)
+
+
+def _write_sentences_and_clips(result: dict, input_file: str, output_dir: str, script_file: str,
+                               clip_settings: ClipSettings, export_mode: str, pcm=None,
+                               reference_sentences: list | None = None,
+                               manifest: OutputManifest | None = None) -> None:
+    """Split into sentences (Whisper's or the official ones), write script.txt and export one clip per sentence."""
     # --- 全単語と全文テキストの準備 ---
-    words = []
-    full_text = ""
-
-    for seg in result["segments"]:
-        for w in seg["words"]:
-            words.append(w)
-            full_text += w["word"]
-
-    # --- 文単位で分割 ---
-    sentences = sent_tokenize(full_text, language="german")
-
-    # --- 1文ずつ処理して、単語タイムスタンプとマッチング ---
-    with open(os.path.join(output_dir, script_file), "w", encoding="utf-8") as f_script:
-        word_index = 0
-        for i, sentence in enumerate(sentences):
-            # 文の先頭と末尾を探す
-            matched_words = []
-            while word_index < len(words) and len("".join([w["word"] for w in matched_words])) < len(sentence):
-                matched_words.append(words[word_index])
-                word_index += 1
-
-            # 音声切り出しのための時間取得
-            if not matched_words:
-                continue
-            start_ms = int(matched_words[0]["start"] * 1000)
-            end_ms = int(matched_words[-1]["end"] * 1000) + 300
-
-            # 音声切り出し + 無音追加
-            clip = silence + audio[start_ms:end_ms]
-            audio_filename = f"sentence_{i:03d}.mp3"
-            clip.export(os.path.join(output_dir, audio_filename), format="mp3")
-
-            # スクリプト出力
-            f_script.write(f"{sentence.strip()}\n")
+    words = [w for seg in result["segments"] for w in seg["words"]]
+    full_text = "".join(w["word"] for w in words)
+
+    profiling.count("words", len(words))
+
+    # 単語タイムスタンプを保存（transcript_corrector.py で公式スクリプトと突き合わせる）
+    atomic_write_text(os.path.join(output_dir, WORDS_FILE), json.dumps(compact_result(result), ensure_ascii=False))
+
+    if reference_sentences is None:
+        # --- 文単位で分割 ---
+        with profiling.span("sentence_split"):
+            from nltk.tokenize import sent_tokenize
+            sentences = sent_tokenize(full_text, language="german")
+
+        # --- 文と単語タイムスタンプの対応付け（1パス） ---
+        with profiling.span("align"):
+            aligned = align_sentences(words, sentences)
+        timed = [(s.index, s.text, s.start, s.end, s.confidence) for s in aligned if s.first_word is not None]
+    else:
+        # --- 公式スクリプトの文をそのまま使い、全単語を1回の対応付けで時刻に割り当てる ---
+        with profiling.span("align_reference"):
+            timed = _time_reference_sentences(words, reference_sentences)
+
+    _export_timed_sentences(timed, input_file, output_dir, script_file, clip_settings, export_mode, pcm, manifest)
+
+
+def _export_timed_sentences(timed: list, input_file: str, output_dir: str, script_file: str,
+                            clip_settings: ClipSettings, export_mode: str, pcm=None,
+                            manifest: OutputManifest | None = None) -> None:
+    """
+    Write script.txt and the clips for (index, text, start, end, confidence) sentences.
+    `pcm` is decoded audio for both the boundary refinement and the clips; without it and
+    with refinement on, the audio is decoded here once (CLIP_SAMPLE_RATE) for both.
+    """
+    own_pcm = None
+    if pcm is None and clip_settings.refine and timed:
+        with profiling.span("decode"):
+            pcm = own_pcm = decode_audio(input_file, CLIP_SAMPLE_RATE, use_mmap=True)
+    try:
+        _export_decoded(timed, input_file, output_dir, script_file, clip_settings, export_mode, pcm, manifest)
+    finally:
+        if own_pcm is not None:
+            own_pcm.close()
+
+
+def _export_decoded(timed: list, input_file: str, output_dir: str, script_file: str, clip_settings: ClipSettings,
+                    export_mode: str, pcm, manifest: OutputManifest | None) -> None:
+    # --- 音声切り出しのための時間（無音側へ寄せてから前後に余白） ---
+    ranges = _cut_ranges(timed, clip_settings, pcm if clip_settings.refine else None)
+
+    clips = []
+    for (index, text, _, _, confidence), (start_ms, end_ms) in zip(timed, ranges):
+        if confidence < LOW_CONFIDENCE:
+            print(f"⚠️ 文 {index:03d} の対応付けが不確か (confidence={confidence}): {text.strip()}")
+        clips.append(ClipSpec(index, start_ms, end_ms, text.strip()))
+
+    manifest = manifest or OutputManifest(output_dir)
+    # スクリプト出力
+    _write_script(os.path.join(output_dir, script_file), "".join(f"{c.text}\n" for c in clips), manifest)
+
+    # --- 音声切り出し + 無音追加（変わった文だけまとめて書き出し） ---
+    with profiling.span(f"export_{export_mode}"):
+        encoded = _export_changed_clips(input_file, clips, output_dir, export_mode, clip_settings.lead_silence_ms,
+                                        pcm, manifest)
+    manifest.save()
+    profiling.count("clips_encoded", encoded)
+    profiling.count("clips_reused", len(clips) - encoded)
+
+    # 全エピソード横断の単語索引 (output/vocabulary.sqlite3) のうち、このエピソードの分だけ更新
+    with profiling.span("vocabulary_index"):
+        try:
+            update_vocabulary_index(output_dir)
+        except sqlite3.Error as e:   # 索引が壊れている・ロックされていても、クリップの書き出しは済んでいる
+            print(f"⚠️ 単語索引を更新できません ({e})。`python vocabulary_index.py update` で後から反映できます")
+
+
+def _write_script(path: str, text: str, manifest: OutputManifest) -> None:
+    """
+    Write script.txt unless it was edited by hand since we last wrote it. Without a recorded
+    hash (output from before manifest.json existed) the old script is replaced.
+    """
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            current = f.read()
+        if current == text:
+            manifest.script_sha = text_sha256(text)
+            return
+        if manifest.script_sha is not None and text_sha256(current) != manifest.script_sha:
+            new_path = os.path.splitext(path)[0] + ".new.txt"
+            atomic_write_text(new_path, text)
+            print(f"✋ {path} は手で編集されているので上書きしません（新しいスクリプト: {new_path}）")
+            return
+    atomic_write_text(path, text)
+    manifest.script_sha = text_sha256(text)
+
+
+def _export_changed_clips(input_file: str, clips: list, output_dir: str, export_mode: str, lead_silence_ms: int,
+                          pcm, manifest: OutputManifest) -> int:
+    """
+    Encode only the clips whose fingerprint changed (into a temp folder, then renamed into
+    place), delete clips that are no longer produced and record the new fingerprints.
+    Returns the number of clips encoded.
+    """
+    source = file_sha256(input_file)
+    decode = f"pcm{pcm.sample_rate}" if pcm is not None else "source"
+    prints = {c.filename: clip_fingerprint(source, c.start_ms, c.end_ms, lead_silence_ms, ENCODERS[export_mode],
+                                           decode) for c in clips}
+    if export_mode == "pack":
+        # 1ファイルにまとめるので、1文でも変われば全体を書き直す（索引の文も含めて比較）
+        pack_print = text_sha256(json.dumps([[c.filename, prints[c.filename], c.text] for c in clips]))
+        current = all(manifest.is_current(name, pack_print, output_dir) for name in (PACK_FILE, INDEX_FILE))
+        dirty = [] if current else clips
+        entries = {name: {"fingerprint": pack_print} for name in (PACK_FILE, INDEX_FILE)}
+    else:
+        dirty = [c for c in clips if not manifest.is_current(c.filename, prints[c.filename], output_dir)]
+        entries = {c.filename: {"fingerprint": prints[c.filename], "start_ms": c.start_ms, "end_ms": c.end_ms}
+                   for c in clips}
+
+    if dirty:
+        tmp_dir = tempfile.mkdtemp(prefix=".export-", dir=output_dir)
+        try:
+            paths = export_clips(input_file, dirty, tmp_dir, mode=export_mode, lead_silence_ms=lead_silence_ms,
+                                 pcm=pcm)
+            for path in paths:
+                os.replace(path, os.path.join(output_dir, os.path.basename(path)))
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    # もう作られない文（文の数が減った・書き出し形式を変えた）のファイルを消す
+    for name in os.listdir(output_dir):
+        if MANAGED_FILE_PATTERN.fullmatch(name) and name not in entries:
+            os.remove(os.path.join(output_dir, name))
+    manifest.clips = entries
+    print(f"🎧 {len(dirty)}/{len(clips)} 文を書き出し（残りは前回のまま）")
+    return len(dirty)
 
 
 if __name__ == "__main__":
@@ -72,4 +409,12 @@ if __name__ == "__main__":
     config.read('config.ini')
     title = config['TOP_THEMA']['title']
 
-    split_audio_and_generate_transcript(title)
\ No newline at end of file
+    # sentence_source = reference なら公式スクリプトの文で区切る
+    reference = None
+    if sentence_source_from_config(config) == "reference":
+        reference = f"input/reference/{title}.txt"
+        if not os.path.exists(reference):
+            reference = "input/reference.txt"
+    # `python whisper_worker.py` で常駐ワーカーを起動していればそれを使う
+    split_audio_and_generate_transcript(title, worker=worker_from_config(config), reference_file=reference,
+                                        **split_options_from_config(config))
@@ -0,0 +1,263 @@
+from __future__ import annotations
+
+import argparse
+import configparser
+import ipaddress
+import multiprocessing as mp
+import os
+import secrets
+import threading
+from multiprocessing.connection import AuthenticationError, Client, Listener
+
+DEFAULT_MODEL = "base"
+DEFAULT_ADDRESS = ("127.0.0.1", 50781)
+# 接続はジョブを pickle で受け取るので、鍵はリポジトリに置かず各マシンで生成する
+AUTHKEY_FILE = "whisper_worker.key"
+
+# プロセス内で読み込み済みのモデル（モデル名 -> whisper model）
+_models = {}
+
+
+def get_model(model_name: str = DEFAULT_MODEL):
+    """Return a loaded Whisper model, loading it only on first use in this process."""
+    if model_name not in _models:
+        import whisper
+        print(f"🧠 Whisper モデル読み込み中: {model_name}")
+        _models[model_name] = whisper.load_model(model_name)
+    return _models[model_name]
+
+
+def run_job(job: dict) -> dict:
+    """
+    Transcribe one job ({"audio", "model", "options"}) with a cached model.
+
+    "audio" is a file path, a NumPy array, or a PcmAudio.descriptor() dict that is
+    memory-mapped here instead of being decoded again.
+    """
+    model = get_model(job.get("model", DEFAULT_MODEL))
+    options = dict(job.get("options") or {})
+    options.setdefault("word_timestamps", True)
+    audio = job["audio"]
+    if isinstance(audio, dict):
+        from pcm_audio import open_descriptor
+        audio = open_descriptor(audio)
+    return model.transcribe(audio, **options)
+
+
+def transcribe_local(audio, model_name: str = DEFAULT_MODEL, options: dict | None = None) -> dict:
+    """In-process transcription; the model stays cached for later calls in the same process."""
+    return run_job({"audio": audio, "model": model_name, "options": options})
+
+
+def _answer(job: dict) -> tuple:
+    try:
+        return "ok", run_job(job)
+    except Exception as e:  # ワーカーは落とさず、エラーを呼び出し側へ返す
+        return "error", f"{type(e).__name__}: {e}"
+
+
+def _unwrap(reply: tuple) -> dict:
+    status, payload = reply
+    if status != "ok":
+        raise RuntimeError(f"Whisper ワーカーでエラー: {payload}")
+    return payload
+
+
+def _worker_loop(conn, preload) -> None:
+    for name in preload:
+        get_model(name)
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            break
+        if job is None:
+            break
+        conn.send(_answer(job))
+    conn.close()
+
+
+class WhisperWorker:
+    """
+    Long-lived child process that keeps Whisper models loaded between jobs.
+
+    Use as a context manager; every call to transcribe() reuses the same warm model,
+    so a batch of episodes pays the model load only once.
+    """
+
+    def __init__(self, preload=(DEFAULT_MODEL,)):
+        self.preload = tuple(preload)
+        self._conn = None
+        self._process = None
+        self._lock = threading.Lock()
+
+    def start(self) -> "WhisperWorker":
+        if self._process is not None:
+            return self
+        # torch と fork の相性が悪いので spawn を使う
+        ctx = mp.get_context("spawn")
+        parent_conn, child_conn = ctx.Pipe()
+        self._process = ctx.Process(target=_worker_loop, args=(child_conn, self.preload), daemon=True)
+        self._process.start()
+        child_conn.close()
+        self._conn = parent_conn
+        return self
+
+    def transcribe(self, audio, model_name: str = DEFAULT_MODEL, options: dict | None = None) -> dict:
+        self.start()
+        job = {"audio": audio, "model": model_name, "options": options}
+        with self._lock:
+            self._conn.send(job)
+            return _unwrap(self._conn.recv())
+
+    def close(self) -> None:
+        if self._process is None:
+            return
+        try:
+            self._conn.send(None)
+            self._conn.close()
+        except (OSError, EOFError):
+            pass
+        self._process.join(timeout=10)
+        if self._process.is_alive():
+            self._process.terminate()
+        self._process = None
+        self._conn = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class RemoteWhisperWorker:
+    """Client for a worker started with `python whisper_worker.py` (same interface as WhisperWorker)."""
+
+    def __init__(self, address, authkey: bytes):
+        self.address = tuple(address)
+        self.authkey = authkey
+
+    def is_available(self) -> bool:
+        try:
+            with Client(self.address, authkey=self.authkey) as conn:
+                conn.send({"ping": True})
+                return conn.recv() == ("ok", "pong")
+        except (OSError, EOFError, AuthenticationError):
+            return False
+
+    def transcribe(self, audio, model_name: str = DEFAULT_MODEL, options: dict | None = None) -> dict:
+        with Client(self.address, authkey=self.authkey) as conn:
+            conn.send({"audio": audio, "model": model_name, "options": options})
+            return _unwrap(conn.recv())
+
+
+def _is_loopback(host: str) -> bool:
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def _job_source(job) -> str:
+    """What a transcription job will read, for the log; ValueError if the job is malformed."""
+    if not isinstance(job, dict) or "audio" not in job:
+        raise ValueError(f"ジョブの形式が不正です: {type(job).__name__}")
+    audio = job["audio"]
+    return str(audio.get("pcm") if isinstance(audio, dict) else audio)
+
+
+def serve(address, authkey: bytes, preload=(DEFAULT_MODEL,)) -> None:
+    """
+    Run the worker as a local socket server; jobs are handled one at a time.
+    Only loopback addresses are accepted: jobs arrive pickled, so the port must not be reachable
+    from other machines.
+    """
+    if not _is_loopback(address[0]):
+        raise ValueError(f"Whisper ワーカーはループバックアドレスでのみ待機できます: {address[0]}")
+    for name in preload:
+        get_model(name)
+    with Listener(tuple(address), authkey=authkey) as listener:
+        print(f"🟢 Whisper ワーカー待機中: {address[0]}:{address[1]}")
+        while True:
+            try:
+                conn = listener.accept()
+            except (AuthenticationError, EOFError, ConnectionError) as e:
+                # 認証キーが違う・握手の途中で切れた接続は断って、待機を続ける
+                print(f"⚠️ 接続を拒否しました: {type(e).__name__}: {e}")
+                continue
+            with conn:
+                try:
+                    job = conn.recv()
+                    if isinstance(job, dict) and job.get("ping"):
+                        reply = ("ok", "pong")
+                    else:
+                        print(f"🎙️ 文字起こし: {_job_source(job)} ({job.get('model', DEFAULT_MODEL)})")
+                        reply = _answer(job)
+                except EOFError:
+                    continue
+                except Exception as e:  # 不正なジョブでもワーカーは落とさない
+                    reply = ("error", f"{type(e).__name__}: {e}")
+                try:
+                    conn.send(reply)
+                except OSError:
+                    # クライアントが先に切断した場合は次のジョブへ
+                    continue
+
+
+def address_from_config(config: configparser.ConfigParser):
+    """Read `[WHISPER] worker = host:port` from config.ini, or None if not set."""
+    if not config.has_option("WHISPER", "worker"):
+        return None
+    host, port = config["WHISPER"]["worker"].rsplit(":", 1)
+    return host, int(port)
+
+
+def authkey_from_config(config: configparser.ConfigParser, create: bool = False) -> bytes | None:
+    """
+    Read `[WHISPER] worker_authkey` from config.ini, or else the key in AUTHKEY_FILE.
+    With `create`, a random key is written to AUTHKEY_FILE (owner-only) when neither exists.
+    """
+    if config.has_option("WHISPER", "worker_authkey"):
+        return config["WHISPER"]["worker_authkey"].encode("utf-8")
+    if os.path.exists(AUTHKEY_FILE):
+        with open(AUTHKEY_FILE, "r", encoding="utf-8") as f:
+            return f.read().strip().encode("utf-8")
+    if not create:
+        return None
+    key = secrets.token_hex(32)
+    fd = os.open(AUTHKEY_FILE, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with open(fd, "w", encoding="utf-8") as f:
+        f.write(key + "\n")
+    print(f"🔑 ワーカーの認証キーを作成しました: {AUTHKEY_FILE}")
+    return key.encode("utf-8")
+
+
+def worker_from_config(config: configparser.ConfigParser):
+    """Return a RemoteWhisperWorker if one is configured and running, otherwise None."""
+    address = address_from_config(config)
+    if address is None:
+        return None
+    authkey = authkey_from_config(config)
+    if authkey is None:
+        print(f"⚠️ Whisper ワーカーの認証キーがありません（{AUTHKEY_FILE} または [WHISPER] worker_authkey）。"
+              f"このプロセスでモデルを読み込みます。")
+        return None
+    remote = RemoteWhisperWorker(address, authkey)
+    if not remote.is_available():
+        print(f"⚠️ Whisper ワーカーに接続できません ({address[0]}:{address[1]})。このプロセスでモデルを読み込みます。")
+        return None
+    return remote
+
+
+if __name__ == "__main__":
+    config = configparser.ConfigParser()
+    config.read('config.ini')
+
+    parser = argparse.ArgumentParser(description="Whisper のモデルを読み込んだまま常駐する文字起こしワーカー")
+    parser.add_argument("--models", nargs="+", default=[DEFAULT_MODEL], help="起動時に読み込むモデル")
+    args = parser.parse_args()
+
+    serve(address_from_config(config) or DEFAULT_ADDRESS, authkey_from_config(config, create=True), preload=args.models)
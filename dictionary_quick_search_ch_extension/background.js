@@ -39,3 +39,17 @@ chrome.runtime.onMessage.addListener((message, sender, sendResponse) => {
     return true; // 👈 非同期で sendResponse を使う場合、true を返す
   }
 });
+
+// オフライン辞書 (offline_dictionary/dictionary_server.py) への問い合わせ。
+// content script からはページのオリジンになるので、localhost への fetch は background で行う
+const OFFLINE_DICTIONARY_URL = "http://127.0.0.1:8765";
+
+chrome.runtime.onMessage.addListener((message, sender, sendResponse) => {
+  if (message.type === "offlineLookup") {
+    fetch(`${OFFLINE_DICTIONARY_URL}/lookup?q=${encodeURIComponent(message.query)}`)
+      .then((response) => response.json())
+      .then((result) => sendResponse({ ok: true, result }))
+      .catch((error) => sendResponse({ ok: false, error: String(error) }));
+    return true;
+  }
+});
@@ -16,6 +16,42 @@ async function isEnabled() {
 }
 
 
+// オフライン辞書の結果をページ上に小さく表示（新しいタブは開かない）
+function showOfflineResult(query, response) {
+  document.getElementById("offline-dictionary-popup")?.remove();
+  const popup = document.createElement("div");
+  popup.id = "offline-dictionary-popup";
+  Object.assign(popup.style, {
+    position: "fixed", right: "16px", bottom: "16px", zIndex: 2147483647, maxWidth: "360px",
+    padding: "10px 14px", background: "#fff", color: "#222", border: "1px solid #ccc",
+    borderRadius: "6px", boxShadow: "0 2px 8px rgba(0,0,0,.2)", font: "14px/1.4 sans-serif"
+  });
+
+  const title = document.createElement("div");
+  title.style.fontWeight = "bold";
+  title.textContent = query;
+  popup.appendChild(title);
+
+  let lines;
+  if (!response || !response.ok) {
+    lines = ["オフライン辞書に接続できません（python dictionary_server.py を起動してください）"];
+  } else if (response.result.entries.length === 0) {
+    lines = ["見つかりませんでした"];
+  } else {
+    lines = response.result.entries.map((e) =>
+      `${e.lemma}${e.pos ? ` (${e.pos})` : ""}: ${e.glosses.slice(0, 3).join("; ")}`);
+  }
+  for (const line of lines) {
+    const div = document.createElement("div");
+    div.textContent = line;
+    popup.appendChild(div);
+  }
+
+  popup.addEventListener("click", () => popup.remove());
+  document.body.appendChild(popup);
+  setTimeout(() => popup.remove(), 8000);
+}
+
 // テキスト選択取得
 document.addEventListener("mouseup", () => {
   const selection = window.getSelection().toString().trim();
@@ -24,8 +60,10 @@ document.addEventListener("mouseup", () => {
   }
 });
 
-// Control + L/D/W で辞書検索
+// Control + L/D/J で辞書検索、Control + O でオフライン辞書
 document.addEventListener("keydown", async (event) => {
+  // ブラウザの Ctrl + O（ファイルを開く）は await の前に止めないと効かない
+  if (event.ctrlKey && event.key.toLowerCase() === "o" && selectedText) event.preventDefault();
   if (!await isEnabled() || !selectedText) return;
   if (event.ctrlKey) {
     const query = encodeURIComponent(selectedText);
@@ -41,6 +79,14 @@ document.addEventListener("keydown", async (event) => {
       case "j":
         url = dictionaryURLs.wadoku(query);
         break;
+      case "o": {
+        const word = selectedText;
+        selectedText = ""; // reset
+        chrome.runtime.sendMessage({ type: "offlineLookup", query: word }, (response) => {
+          showOfflineResult(word, response);
+        });
+        return;
+      }
     }
 
     if (url) {
@@ -0,0 +1,281 @@
+from __future__ import annotations
+
+import argparse
+import json
+import mmap
+import os
+import re
+import struct
+import sys
+import unicodedata
+from itertools import accumulate
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+DEFAULT_INDEX_PATH = "dictionary.idx"
+MAGIC = b"GLDX"
+VERSION = 1
+# magic, version, 見出し数, キー数, 各セクションの開始位置
+HEADER = struct.Struct("<4sIIIQQQQ")
+# キー表の1行: キー本体の位置, 長さ, 種類 (0=見出し語 1=変化形), 見出し番号。キーのバイト列順に並ぶ
+KEY_ROW = struct.Struct("<IHBxI")
+OFFSET = struct.Struct("<Q")
+KIND_LEMMA, KIND_FORM = 0, 1
+KINDS = ("lemma", "form")
+
+
+def normalize_key(word: str) -> str:
+    """Lookup key: NFC, case-folded, without surrounding punctuation ("Häuser," -> "häuser")."""
+    word = unicodedata.normalize("NFC", word).strip().strip(".,;:!?\"'„“”‚‘’()[]«»")
+    return word.casefold()
+
+
+# ---------- 辞書データの読み込み ----------
+
+def read_tsv(path: str) -> Iterator[dict]:
+    """
+    lemma <TAB> gloss [<TAB> pos [<TAB> form,form,...]] per line; lines starting with # are skipped.
+    Several lines for the same lemma + pos are merged.
+    """
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip() or line.startswith("#"):
+                continue
+            cols = line.rstrip("\n").split("\t")
+            yield {
+                "lemma": cols[0].strip(),
+                "glosses": [g.strip() for g in cols[1].split(";") if g.strip()] if len(cols) > 1 else [],
+                "pos": cols[2].strip() if len(cols) > 2 else "",
+                "forms": [x.strip() for x in cols[3].split(",") if x.strip()] if len(cols) > 3 else [],
+            }
+
+
+ARTICLES = {"der", "die", "das", "des", "dem", "den"}
+# 変化表の見出しやテンプレート名（"de-noun" など）で、語形ではない forms の行
+SKIP_FORM_TAGS = {"table-tags", "inflection-template"}
+
+
+def _bare_form(form: str) -> str:
+    """Wiktionary lists noun forms with their article ("des Hauses"); keep the word itself."""
+    parts = form.split()
+    return parts[-1] if len(parts) == 2 and parts[0].lower() in ARTICLES else form
+
+
+def read_wiktionary_jsonl(path: str) -> Iterator[dict]:
+    """Wiktionary dump as one JSON object per line (kaikki.org / wiktextract format)."""
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            obj = json.loads(line)
+            glosses = [g for sense in obj.get("senses", []) for g in sense.get("glosses", [])[:1]]
+            yield {
+                "lemma": obj.get("word", ""),
+                "glosses": glosses,
+                "pos": obj.get("pos", ""),
+                "forms": [_bare_form(f["form"]) for f in obj.get("forms", [])
+                          if f.get("form") and not SKIP_FORM_TAGS.intersection(f.get("tags", ()))],
+            }
+
+
+READERS = {".tsv": read_tsv, ".txt": read_tsv, ".jsonl": read_wiktionary_jsonl, ".json": read_wiktionary_jsonl}
+
+
+def _merge(records: Iterable[dict]) -> List[dict]:
+    merged: Dict[Tuple[str, str], dict] = {}
+    for r in records:
+        if not r["lemma"]:
+            continue
+        entry = merged.setdefault((r["lemma"], r["pos"]), {"lemma": r["lemma"], "pos": r["pos"], "glosses": [],
+                                                          "forms": set()})
+        entry["glosses"].extend(g for g in r["glosses"] if g not in entry["glosses"])
+        entry["forms"].update(r["forms"])
+    return list(merged.values())
+
+
+# ---------- 索引の作成 ----------
+
+def build_index(records: Iterable[dict], out_path: str = DEFAULT_INDEX_PATH) -> Tuple[int, int]:
+    """
+    Write the binary index and return (entries, keys).
+
+    Layout: header | entry offsets (u64) | entries (UTF-8 JSON each) | key rows | key bytes.
+    Every lemma and inflected form is a key pointing at its entry; keys are sorted by their
+    UTF-8 bytes, so exact and prefix lookups are binary searches straight on the mmap.
+    """
+    entries = _merge(records)
+    blobs, keys = [], []
+    for entry_id, e in enumerate(entries):
+        blobs.append(json.dumps({"lemma": e["lemma"], "pos": e["pos"], "glosses": e["glosses"]},
+                                ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+        lemma_key = normalize_key(e["lemma"])
+        keys.append((lemma_key.encode("utf-8"), KIND_LEMMA, entry_id))
+        for form in e["forms"]:
+            form_key = normalize_key(form)
+            if form_key and form_key != lemma_key:
+                keys.append((form_key.encode("utf-8"), KIND_FORM, entry_id))
+    keys = sorted(set(keys))
+
+    offsets_start = HEADER.size
+    blobs_start = offsets_start + OFFSET.size * (len(blobs) + 1)
+    blobs_size = sum(len(b) for b in blobs)
+    rows_start = blobs_start + blobs_size
+    key_bytes_start = rows_start + KEY_ROW.size * len(keys)
+
+    tmp_path = out_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(blobs), len(keys), offsets_start, blobs_start, rows_start,
+                            key_bytes_start))
+        # セクションごとにまとめて書く（1行ずつ write すると作成時間の大半がそこに消える）
+        f.write(struct.pack(f"<{len(blobs) + 1}Q", 0, *accumulate(len(b) for b in blobs)))
+        f.write(b"".join(blobs))
+        key_offsets = accumulate((len(k) for k, _, _ in keys), initial=0)
+        f.write(b"".join(KEY_ROW.pack(pos, len(key), kind, entry_id)
+                         for pos, (key, kind, entry_id) in zip(key_offsets, keys)))
+        f.write(b"".join(k for k, _, _ in keys))
+    os.replace(tmp_path, out_path)
+    return len(blobs), len(keys)
+
+
+# ---------- 検索 ----------
+
+class DictionaryIndex:
+    """
+    Read-only view of an index file. Opening only maps the file and reads the header,
+    so a cold start costs no parsing; each lookup touches O(log n) key rows plus the
+    entries it returns.
+    """
+
+    def __init__(self, path: str = DEFAULT_INDEX_PATH):
+        self.path = path
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, self.n_entries, self.n_keys, self._offsets, self._blobs, self._rows,
+         self._key_bytes) = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"{path} is not a dictionary index (version {VERSION})")
+
+    def close(self) -> None:
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self) -> "DictionaryIndex":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __len__(self) -> int:
+        return self.n_entries
+
+    def _row(self, i: int) -> Tuple[bytes, int, int]:
+        start, length, kind, entry_id = KEY_ROW.unpack_from(self._map, self._rows + i * KEY_ROW.size)
+        start += self._key_bytes
+        return self._map[start:start + length], kind, entry_id
+
+    def _lower_bound(self, key: bytes) -> int:
+        lo, hi = 0, self.n_keys
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._row(mid)[0] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def entry(self, entry_id: int) -> dict:
+        start, end = struct.unpack_from("<QQ", self._map, self._offsets + entry_id * OFFSET.size)
+        return json.loads(self._map[self._blobs + start:self._blobs + end])
+
+    def lookup(self, word: str) -> List[dict]:
+        """Entries for a lemma or an inflected form ("Häuser" -> Haus); exact lemma matches first."""
+        key = normalize_key(word).encode("utf-8")
+        if not key:
+            return []
+        hits = []
+        i = self._lower_bound(key)
+        while i < self.n_keys:
+            k, kind, entry_id = self._row(i)
+            if k != key:
+                break
+            hits.append((kind, entry_id))
+            i += 1
+        return [{**self.entry(entry_id), "match": KINDS[kind]} for kind, entry_id in sorted(hits)]
+
+    def lemmatize(self, word: str) -> List[str]:
+        """Lemmas a word form belongs to (itself if it is a lemma)."""
+        seen = []
+        for e in self.lookup(word):
+            if e["lemma"] not in seen:
+                seen.append(e["lemma"])
+        return seen
+
+    def prefix(self, prefix: str, limit: int = 20) -> List[dict]:
+        """Entries whose lemma starts with `prefix`, in key order (for autocomplete)."""
+        key = normalize_key(prefix).encode("utf-8")
+        results, seen = [], set()
+        i = self._lower_bound(key)
+        while i < self.n_keys and len(results) < limit:
+            k, kind, entry_id = self._row(i)
+            if not k.startswith(key):
+                break
+            if kind == KIND_LEMMA and entry_id not in seen:
+                seen.add(entry_id)
+                results.append(self.entry(entry_id))
+            i += 1
+        return results
+
+
+# 文中の単語（ハイフンでつないだ複合語も1語として扱う）
+WORD_PATTERN = re.compile(r"[^\W\d_]+(?:-[^\W\d_]+)*")
+
+
+def lookup_text(index: DictionaryIndex, text: str, lookup=None) -> List[dict]:
+    """
+    Look up every word of a text (e.g. a line of script.txt). Hyphenated compounds
+    fall back to their last part. `lookup` can replace index.lookup (e.g. a cached one).
+    """
+    lookup = lookup or index.lookup
+    results = []
+    for m in WORD_PATTERN.finditer(text):
+        word = m.group()
+        entries = lookup(word)
+        if not entries and "-" in word:
+            entries = lookup(word.rsplit("-", 1)[-1])
+        results.append({"word": word, "start": m.start(), "entries": entries})
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="オフライン辞書の索引の作成・検索")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_build = sub.add_parser("build", help="辞書データ (TSV / Wiktionary JSONL) から索引を作る")
+    p_build.add_argument("sources", nargs="+", help=".tsv / .txt / .jsonl")
+    p_build.add_argument("-o", "--output", default=DEFAULT_INDEX_PATH)
+    p_lookup = sub.add_parser("lookup", help="単語を引く")
+    p_lookup.add_argument("words", nargs="+")
+    p_lookup.add_argument("--index", default=DEFAULT_INDEX_PATH)
+    p_prefix = sub.add_parser("prefix", help="前方一致で見出し語を列挙")
+    p_prefix.add_argument("prefix")
+    p_prefix.add_argument("--limit", type=int, default=20)
+    p_prefix.add_argument("--index", default=DEFAULT_INDEX_PATH)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        def records():
+            for src in args.sources:
+                reader = READERS.get(os.path.splitext(src)[1].lower())
+                if reader is None:
+                    raise SystemExit(f"❌ 対応していない形式です: {src}（{', '.join(READERS)}）")
+                yield from reader(src)
+        n_entries, n_keys = build_index(records(), args.output)
+        print(f"📚 {n_entries} 見出し / {n_keys} キー → {args.output} ({os.path.getsize(args.output) / 1e6:.1f} MB)",
+              file=sys.stderr)
+    else:
+        with DictionaryIndex(args.index) as index:
+            if args.command == "lookup":
+                for word in args.words:
+                    print(json.dumps({"word": word, "entries": index.lookup(word)}, ensure_ascii=False))
+            else:
+                for e in index.prefix(args.prefix, args.limit):
+                    print(f"{e['lemma']}\t{e['pos']}\t{'; '.join(e['glosses'])}")
@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from dictionary_index import DEFAULT_INDEX_PATH, DictionaryIndex, lookup_text
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+CACHE_SIZE = 4096
+MAX_BODY_BYTES = 1 << 20
+MAX_PREFIX_LIMIT = 100
+
+
+class DictionaryService:
+    """
+    Lookups with an LRU cache in front of the index. Cached values are the encoded JSON
+    responses, so a repeated word costs a dict hit and a socket write.
+    """
+
+    def __init__(self, index: DictionaryIndex, cache_size: int = CACHE_SIZE):
+        self.index = index
+        self.lookup = lru_cache(maxsize=cache_size)(self._lookup)
+        self.lookup_json = lru_cache(maxsize=cache_size)(self._lookup_json)
+
+    def _lookup(self, word: str) -> list:
+        return self.index.lookup(word)
+
+    def _lookup_json(self, word: str) -> bytes:
+        return _encode({"word": word, "entries": self.lookup(word)})
+
+    def prefix_json(self, prefix: str, limit: int) -> bytes:
+        return _encode({"prefix": prefix, "entries": self.index.prefix(prefix, limit)})
+
+    def bulk(self, text: str = "", words: list | None = None) -> list:
+        """Whole sentences (`text`) are split into words; `words` are looked up as given."""
+        if words is not None:
+            return [{"word": w, "entries": self.lookup(w)} for w in words]
+        return lookup_text(self.index, text, lookup=self.lookup)
+
+
+def _encode(obj) -> bytes:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def make_server(service: DictionaryService, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT) -> ThreadingHTTPServer:
+    """
+    GET  /lookup?q=Häuser           -> {"word", "entries": [{lemma, pos, glosses, match}]}
+    GET  /prefix?q=Haus&limit=20    -> {"prefix", "entries"}
+    POST /bulk {"text": "..."} or {"words": [...]} -> {"results": [{word, start?, entries}]}
+    GET  /health                    -> {"entries": n}
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"   # 拡張機能からの連続した検索で接続を使い回す
+        disable_nagle_algorithm = True  # ヘッダと本文の別送で 40ms 待たされないように
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status: int, body: bytes) -> None:
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            # 拡張機能（content script 経由のページ）からも呼べるように
+            self.send_header("Access-Control-Allow-Origin", "*")
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _error(self, status: int, message: str) -> None:
+            self._send(status, _encode({"error": message}))
+
+        def do_OPTIONS(self):
+            self.send_response(204)
+            self.send_header("Access-Control-Allow-Origin", "*")
+            self.send_header("Access-Control-Allow-Methods", "GET, POST, OPTIONS")
+            self.send_header("Access-Control-Allow-Headers", "Content-Type")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def do_GET(self):
+            url = urlsplit(self.path)
+            params = parse_qs(url.query)
+            q = params.get("q", [""])[0].strip()
+            if url.path == "/health":
+                self._send(200, _encode({"entries": len(service.index)}))
+            elif url.path == "/lookup":
+                if not q:
+                    self._error(400, "missing q")
+                    return
+                self._send(200, service.lookup_json(q))
+            elif url.path == "/prefix":
+                try:
+                    limit = min(int(params.get("limit", ["20"])[0]), MAX_PREFIX_LIMIT)
+                except ValueError:
+                    self._error(400, "limit must be an integer")
+                    return
+                if not q:
+                    self._error(400, "missing q")
+                    return
+                self._send(200, service.prefix_json(q, limit))
+            else:
+                self._error(404, "not found")
+
+        def do_POST(self):
+            if urlsplit(self.path).path != "/bulk":
+                self._error(404, "not found")
+                return
+            try:
+                length = int(self.headers.get("Content-Length") or 0)
+            except ValueError:
+                length = -1
+            if not 0 <= length <= MAX_BODY_BYTES:
+                # 本文を読まずに返すので、この接続は使い回さない
+                self.close_connection = True
+                if length < 0:
+                    self._error(400, "invalid Content-Length")
+                else:
+                    self._error(413, "request body too large")
+                return
+            try:
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                words = payload.get("words")
+                if words is not None and not all(isinstance(w, str) for w in words):
+                    raise ValueError
+                results = service.bulk(payload.get("text", ""), words)
+            except (ValueError, AttributeError, TypeError):
+                self._error(400, 'expected {"text": "..."} or {"words": [...]}')
+                return
+            self._send(200, _encode({"results": results}))
+
+    return ThreadingHTTPServer((host, port), Handler)
+
+
+def lookup_script(service: DictionaryService, script_path: str) -> None:
+    """Print every sentence of a script.txt with the lemma and first gloss of each word (one JSON per line)."""
+    with open(script_path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            words = [{"word": r["word"],
+                      "lemma": r["entries"][0]["lemma"] if r["entries"] else None,
+                      "gloss": (r["entries"][0]["glosses"] or [None])[0] if r["entries"] else None}
+                     for r in service.bulk(line)]
+            print(json.dumps({"sentence": line, "words": words}, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="オフライン辞書をローカル HTTP で提供（Chrome 拡張機能用）")
+    parser.add_argument("--index", default=DEFAULT_INDEX_PATH, help="dictionary_index.py build で作った索引")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--cache-size", type=int, default=CACHE_SIZE, help="LRU キャッシュする単語数")
+    parser.add_argument("--script", metavar="SCRIPT_TXT",
+                        help="サーバーを起動せず、script.txt の全文の単語をまとめて引いて表示する")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    try:
+        index = DictionaryIndex(args.index)
+    except FileNotFoundError:
+        raise SystemExit(f"❌ {args.index} がありません。先に `python dictionary_index.py build 辞書.tsv` を実行してください")
+    service = DictionaryService(index, args.cache_size)
+
+    if args.script:
+        lookup_script(service, args.script)
+        raise SystemExit(0)
+
+    httpd = make_server(service, args.host, args.port)
+    print(f"📖 {len(index)} 見出しを読み込み ({(time.perf_counter() - started) * 1000:.1f} ms)。"
+          f"http://{args.host}:{httpd.server_port} で待機中（Ctrl+C で終了）", file=sys.stderr)
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+        index.close()
@@ -0,0 +1,24 @@
+import json
+
+from dictionary_index import DictionaryIndex, build_index, read_wiktionary_jsonl
+
+
+def test_wiktionary_forms_skip_table_rows(tmp_path):
+    source = tmp_path / "de.jsonl"
+    source.write_text(json.dumps({
+        "word": "Haus", "pos": "noun", "senses": [{"glosses": ["house"]}],
+        "forms": [
+            {"form": "de-noun", "tags": ["table-tags"]},
+            {"form": "n", "tags": ["inflection-template"]},
+            {"form": "des Hauses", "tags": ["genitive", "singular"]},
+            {"form": "Häuser", "tags": ["nominative", "plural"]},
+        ],
+    }) + "\n", encoding="utf-8")
+    records = list(read_wiktionary_jsonl(str(source)))
+    assert records[0]["forms"] == ["Hauses", "Häuser"]
+
+    index_path = str(tmp_path / "dictionary.idx")
+    build_index(records, index_path)
+    with DictionaryIndex(index_path) as index:
+        assert index.lemmatize("Häuser") == ["Haus"]
+        assert index.lookup("de-noun") == []
@@ -0,0 +1,52 @@
+import http.client
+import json
+import threading
+
+import pytest
+
+from dictionary_index import DictionaryIndex, build_index
+from dictionary_server import MAX_BODY_BYTES, DictionaryService, make_server
+
+
+@pytest.fixture
+def server(tmp_path):
+    index_path = str(tmp_path / "dictionary.idx")
+    build_index([{"lemma": "Haus", "pos": "noun", "glosses": ["house"], "forms": ["Häuser"]}], index_path)
+    index = DictionaryIndex(index_path)
+    httpd = make_server(DictionaryService(index), port=0)
+    threading.Thread(target=httpd.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True).start()
+    yield httpd.server_port
+    httpd.shutdown()
+    httpd.server_close()
+    index.close()
+
+
+def _post_bulk(port, content_length, body=b""):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+    conn.putrequest("POST", "/bulk")
+    conn.putheader("Content-Length", content_length)
+    conn.endheaders(body)
+    response = conn.getresponse()
+    result = response.status, json.loads(response.read())
+    conn.close()
+    return result
+
+
+def test_bulk_lookup(server):
+    body = json.dumps({"words": ["Häuser"]}).encode("utf-8")
+    status, payload = _post_bulk(server, str(len(body)), body)
+    assert status == 200
+    assert payload["results"][0]["entries"][0]["lemma"] == "Haus"
+
+
+def test_non_integer_content_length_is_rejected(server):
+    assert _post_bulk(server, "zehn")[0] == 400
+
+
+def test_negative_content_length_is_rejected(server):
+    # 以前は rfile.read(-1) が接続が閉じられるまで待ち続けた
+    assert _post_bulk(server, "-1")[0] == 400
+
+
+def test_oversized_content_length_is_rejected(server):
+    assert _post_bulk(server, str(MAX_BODY_BYTES + 1))[0] == 413